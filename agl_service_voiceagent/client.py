@@ -50,73 +50,83 @@ def run_client(server_address, server_port, action, mode, nlu_engine, recording_
                     break
         
         elif action == 'ExecuteVoiceCommand':
+            stub = voice_agent_pb2_grpc.VoiceAgentServiceStub(channel)
             if mode == 'auto':
-                raise ValueError("[-] Auto mode is not implemented yet.")
+                print("[+] Recording voice command in auto mode, recording stops once you stop speaking...")
+                record_start_request = voice_agent_pb2.RecognizeVoiceControl(action=voice_agent_pb2.START, nlu_model=nlu_engine, record_mode=voice_agent_pb2.AUTO)
+                record_requests = iter([record_start_request])
 
-            elif mode == 'manual':
-                stub = voice_agent_pb2_grpc.VoiceAgentServiceStub(channel)
+            else:
                 print("[+] Recording voice command in manual mode...")
-                record_start_request = voice_agent_pb2.RecognizeVoiceControl(action=voice_agent_pb2.START, nlu_model=nlu_engine, record_mode=voice_agent_pb2.MANUAL)
-                response = stub.RecognizeVoiceCommand(iter([record_start_request]))
-                stream_id = response.stream_id
-
-                time.sleep(recording_time) # pause here for the number of seconds passed by user or default 5 seconds
-
-                record_stop_request = voice_agent_pb2.RecognizeVoiceControl(action=voice_agent_pb2.STOP, nlu_model=nlu_engine, record_mode=voice_agent_pb2.MANUAL, stream_id=stream_id)
-                record_result = stub.RecognizeVoiceCommand(iter([record_stop_request]))
-                print("[+] Voice command recording ended!")
-                
-                status = "Uh oh! Status is unknown."
-                if record_result.status == voice_agent_pb2.REC_SUCCESS:
-                    status = "Yay! Status is success."
-                elif record_result.status == voice_agent_pb2.VOICE_NOT_RECOGNIZED:
-                    status = "Voice not recognized."
-                elif record_result.status == voice_agent_pb2.INTENT_NOT_RECOGNIZED:
-                    status = "Intent not recognized."
-
-                # Process the response
-                print("Status:", status)
-                print("Command:", record_result.command)
-                print("Intent:", record_result.intent)
-                intent_slots = []
-                for slot in record_result.intent_slots:
-                    print("Slot Name:", slot.name)
-                    print("Slot Value:", slot.value)
-                    i_slot = voice_agent_pb2.IntentSlot(name=slot.name, value=slot.value)
-                    intent_slots.append(i_slot)
-                
-                if record_result.status == voice_agent_pb2.REC_SUCCESS:
-                    print("[+] Executing voice command...")
-                    exec_voice_command_request = voice_agent_pb2.ExecuteInput(intent=record_result.intent, intent_slots=intent_slots)
-                    response = stub.ExecuteCommand(exec_voice_command_request)
+                record_requests = manual_recording_requests(nlu_engine, recording_time)
+
+            # the server records, recognizes and executes the command, and reports each stage as it completes
+            for stage_result in stub.RecognizeVoiceAndExecute(record_requests):
+                print_stage_result(stage_result)
 
         elif action == 'ExecuteTextCommand':
             text_input = input("[+] Enter text command: ")
             
             stub = voice_agent_pb2_grpc.VoiceAgentServiceStub(channel)
             recognize_text_request = voice_agent_pb2.RecognizeTextControl(text_command=text_input, nlu_model=nlu_engine)
-            response = stub.RecognizeTextCommand(recognize_text_request)
-
-            status = "Uh oh! Status is unknown."
-            if response.status == voice_agent_pb2.REC_SUCCESS:
-                status = "Yay! Status is success."
-            elif response.status == voice_agent_pb2.NLU_MODEL_NOT_SUPPORTED:
-                status = "NLU model not supported."
-            elif response.status == voice_agent_pb2.INTENT_NOT_RECOGNIZED:
-                status = "Intent not recognized."
-
-            # Process the response
-            print("Status:", status)
-            print("Command:", response.command)
-            print("Intent:", response.intent)
-            intent_slots = []
-            for slot in response.intent_slots:
-                print("Slot Name:", slot.name)
-                print("Slot Value:", slot.value)
-                i_slot = voice_agent_pb2.IntentSlot(name=slot.name, value=slot.value)
-                intent_slots.append(i_slot)
-
-            if response.status == voice_agent_pb2.REC_SUCCESS:
-                    print("[+] Executing voice command...")
-                    exec_text_command_request = voice_agent_pb2.ExecuteInput(intent=response.intent, intent_slots=intent_slots)
-                    response = stub.ExecuteCommand(exec_text_command_request)
\ No newline at end of file
+            for stage_result in stub.RecognizeTextAndExecute(recognize_text_request):
+                print_stage_result(stage_result)
+
+
+def manual_recording_requests(nlu_engine, recording_time):
+    """
+    Yield the requests of a manual recording: START, then STOP once the recording time has passed. The STOP request
+    leaves out the stream ID, the server takes it from the START request of the same stream.
+
+    Args:
+        nlu_engine (NLUModel): The NLU model to use.
+        recording_time (int): The number of seconds to record.
+
+    Yields:
+        RecognizeVoiceControl: The START and STOP requests.
+    """
+    yield voice_agent_pb2.RecognizeVoiceControl(action=voice_agent_pb2.START, nlu_model=nlu_engine, record_mode=voice_agent_pb2.MANUAL)
+    time.sleep(recording_time) # pause here for the number of seconds passed by user or default 5 seconds
+    yield voice_agent_pb2.RecognizeVoiceControl(action=voice_agent_pb2.STOP, nlu_model=nlu_engine, record_mode=voice_agent_pb2.MANUAL)
+
+
+def print_stage_result(stage_result):
+    """
+    Print the result of a stage of a RecognizeVoiceAndExecute or RecognizeTextAndExecute call.
+
+    Args:
+        stage_result (RecognizeExecuteResult): The stage result.
+    """
+    recognize_result = stage_result.recognize_result
+    if stage_result.stage == voice_agent_pb2.RECORDING:
+        print("[+] Recording started, stream ID:", recognize_result.stream_id)
+        return
+
+    if stage_result.stage == voice_agent_pb2.TRANSCRIPT:
+        print("[+] Voice command recording ended!")
+        print("Command:", recognize_result.command)
+        if recognize_result.status == voice_agent_pb2.VOICE_NOT_RECOGNIZED:
+            print("Status: Voice not recognized.")
+        return
+
+    if stage_result.stage == voice_agent_pb2.INTENT:
+        status = "Uh oh! Status is unknown."
+        if recognize_result.status == voice_agent_pb2.REC_SUCCESS:
+            status = "Yay! Status is success."
+        elif recognize_result.status == voice_agent_pb2.NLU_MODEL_NOT_SUPPORTED:
+            status = "NLU model not supported."
+        elif recognize_result.status == voice_agent_pb2.INTENT_NOT_RECOGNIZED:
+            status = "Intent not recognized."
+
+        print("Status:", status)
+        print("Command:", recognize_result.command)
+        print("Intent:", recognize_result.intent)
+        for slot in recognize_result.intent_slots:
+            print("Slot Name:", slot.name)
+            print("Slot Value:", slot.value)
+        if recognize_result.status == voice_agent_pb2.REC_SUCCESS:
+            print("[+] Executing voice command...")
+        return
+
+    print("Response:", stage_result.execute_result.response)
+    print("Execution status:", voice_agent_pb2.ExecuteStatusType.Name(stage_result.execute_result.status))
@@ -38,6 +38,13 @@ class ExecuteStatusType(int, metaclass=_enum_type_wrapper.EnumTypeWrapper):
     KUKSA_CONN_ERROR: _ClassVar[ExecuteStatusType]
     INTENT_NOT_SUPPORTED: _ClassVar[ExecuteStatusType]
     INTENT_SLOTS_INCOMPLETE: _ClassVar[ExecuteStatusType]
+
+class PipelineStage(int, metaclass=_enum_type_wrapper.EnumTypeWrapper):
+    __slots__ = []
+    RECORDING: _ClassVar[PipelineStage]
+    TRANSCRIPT: _ClassVar[PipelineStage]
+    INTENT: _ClassVar[PipelineStage]
+    EXECUTION: _ClassVar[PipelineStage]
 START: RecordAction
 STOP: RecordAction
 SNIPS: NLUModel
@@ -56,6 +63,10 @@ EXEC_SUCCESS: ExecuteStatusType
 KUKSA_CONN_ERROR: ExecuteStatusType
 INTENT_NOT_SUPPORTED: ExecuteStatusType
 INTENT_SLOTS_INCOMPLETE: ExecuteStatusType
+RECORDING: PipelineStage
+TRANSCRIPT: PipelineStage
+INTENT: PipelineStage
+EXECUTION: PipelineStage
 
 class Empty(_message.Message):
     __slots__ = []
@@ -156,3 +167,13 @@ class ExecuteResult(_message.Message):
     response: str
     status: ExecuteStatusType
     def __init__(self, response: _Optional[str] = ..., status: _Optional[_Union[ExecuteStatusType, str]] = ...) -> None: ...
+
+class RecognizeExecuteResult(_message.Message):
+    __slots__ = ["stage", "recognize_result", "execute_result"]
+    STAGE_FIELD_NUMBER: _ClassVar[int]
+    RECOGNIZE_RESULT_FIELD_NUMBER: _ClassVar[int]
+    EXECUTE_RESULT_FIELD_NUMBER: _ClassVar[int]
+    stage: PipelineStage
+    recognize_result: RecognizeResult
+    execute_result: ExecuteResult
+    def __init__(self, stage: _Optional[_Union[PipelineStage, str]] = ..., recognize_result: _Optional[_Union[RecognizeResult, _Mapping]] = ..., execute_result: _Optional[_Union[ExecuteResult, _Mapping]] = ...) -> None: ...
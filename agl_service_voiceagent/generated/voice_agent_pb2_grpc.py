@@ -44,11 +44,26 @@ class VoiceAgentServiceStub(object):
                 request_serializer=voice__agent__pb2.RecognizeTextControl.SerializeToString,
                 response_deserializer=voice__agent__pb2.RecognizeResult.FromString,
                 )
+        self.S_RecognizeTextCommand = channel.stream_stream(
+                '/VoiceAgentService/S_RecognizeTextCommand',
+                request_serializer=voice__agent__pb2.RecognizeTextControl.SerializeToString,
+                response_deserializer=voice__agent__pb2.RecognizeResult.FromString,
+                )
         self.ExecuteCommand = channel.unary_unary(
                 '/VoiceAgentService/ExecuteCommand',
                 request_serializer=voice__agent__pb2.ExecuteInput.SerializeToString,
                 response_deserializer=voice__agent__pb2.ExecuteResult.FromString,
                 )
+        self.RecognizeVoiceAndExecute = channel.stream_stream(
+                '/VoiceAgentService/RecognizeVoiceAndExecute',
+                request_serializer=voice__agent__pb2.RecognizeVoiceControl.SerializeToString,
+                response_deserializer=voice__agent__pb2.RecognizeExecuteResult.FromString,
+                )
+        self.RecognizeTextAndExecute = channel.unary_stream(
+                '/VoiceAgentService/RecognizeTextAndExecute',
+                request_serializer=voice__agent__pb2.RecognizeTextControl.SerializeToString,
+                response_deserializer=voice__agent__pb2.RecognizeExecuteResult.FromString,
+                )
 
 
 class VoiceAgentServiceServicer(object):
@@ -92,12 +107,33 @@ class VoiceAgentServiceServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def S_RecognizeTextCommand(self, request_iterator, context):
+        """Stream version of RecognizeTextCommand for bulk jobs, results are returned in the order of the commands
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
     def ExecuteCommand(self, request, context):
         """Missing associated documentation comment in .proto file."""
         context.set_code(grpc.StatusCode.UNIMPLEMENTED)
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def RecognizeVoiceAndExecute(self, request_iterator, context):
+        """Records, recognizes and executes a voice command in one call, the result of each stage is streamed back as it completes
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def RecognizeTextAndExecute(self, request, context):
+        """Recognizes and executes a text command in one call
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
 
 def add_VoiceAgentServiceServicer_to_server(servicer, server):
     rpc_method_handlers = {
@@ -131,11 +167,26 @@ def add_VoiceAgentServiceServicer_to_server(servicer, server):
                     request_deserializer=voice__agent__pb2.RecognizeTextControl.FromString,
                     response_serializer=voice__agent__pb2.RecognizeResult.SerializeToString,
             ),
+            'S_RecognizeTextCommand': grpc.stream_stream_rpc_method_handler(
+                    servicer.S_RecognizeTextCommand,
+                    request_deserializer=voice__agent__pb2.RecognizeTextControl.FromString,
+                    response_serializer=voice__agent__pb2.RecognizeResult.SerializeToString,
+            ),
             'ExecuteCommand': grpc.unary_unary_rpc_method_handler(
                     servicer.ExecuteCommand,
                     request_deserializer=voice__agent__pb2.ExecuteInput.FromString,
                     response_serializer=voice__agent__pb2.ExecuteResult.SerializeToString,
             ),
+            'RecognizeVoiceAndExecute': grpc.stream_stream_rpc_method_handler(
+                    servicer.RecognizeVoiceAndExecute,
+                    request_deserializer=voice__agent__pb2.RecognizeVoiceControl.FromString,
+                    response_serializer=voice__agent__pb2.RecognizeExecuteResult.SerializeToString,
+            ),
+            'RecognizeTextAndExecute': grpc.unary_stream_rpc_method_handler(
+                    servicer.RecognizeTextAndExecute,
+                    request_deserializer=voice__agent__pb2.RecognizeTextControl.FromString,
+                    response_serializer=voice__agent__pb2.RecognizeExecuteResult.SerializeToString,
+            ),
     }
     generic_handler = grpc.method_handlers_generic_handler(
             'VoiceAgentService', rpc_method_handlers)
@@ -248,6 +299,23 @@ class VoiceAgentService(object):
             options, channel_credentials,
             insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
 
+    @staticmethod
+    def S_RecognizeTextCommand(request_iterator,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.stream_stream(request_iterator, target, '/VoiceAgentService/S_RecognizeTextCommand',
+            voice__agent__pb2.RecognizeTextControl.SerializeToString,
+            voice__agent__pb2.RecognizeResult.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
     @staticmethod
     def ExecuteCommand(request,
             target,
@@ -264,3 +332,37 @@ class VoiceAgentService(object):
             voice__agent__pb2.ExecuteResult.FromString,
             options, channel_credentials,
             insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
+    @staticmethod
+    def RecognizeVoiceAndExecute(request_iterator,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.stream_stream(request_iterator, target, '/VoiceAgentService/RecognizeVoiceAndExecute',
+            voice__agent__pb2.RecognizeVoiceControl.SerializeToString,
+            voice__agent__pb2.RecognizeExecuteResult.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
+    @staticmethod
+    def RecognizeTextAndExecute(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(request, target, '/VoiceAgentService/RecognizeTextAndExecute',
+            voice__agent__pb2.RecognizeTextControl.SerializeToString,
+            voice__agent__pb2.RecognizeExecuteResult.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
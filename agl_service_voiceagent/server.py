@@ -15,18 +15,32 @@
 # limitations under the License.
 
 import grpc
+import asyncio
 from concurrent import futures
 from agl_service_voiceagent.generated import voice_agent_pb2_grpc
 from agl_service_voiceagent.servicers.voice_agent_servicer import VoiceAgentServicer
+from agl_service_voiceagent.servicers.async_voice_agent_servicer import AsyncVoiceAgentServicer
 from agl_service_voiceagent.utils.config import get_config_value, get_logger
 
+SERVER_MODES = ("sync", "async")
+
 def run_server():
     logger = get_logger()
     SERVER_URL = get_config_value('SERVER_ADDRESS') + ":" + str(get_config_value('SERVER_PORT'))
+    server_mode = get_config_value('MODE', 'Server', fallback='sync')
+    if server_mode not in SERVER_MODES:
+        raise ValueError(f"Unknown server mode '{server_mode}', expected one of {', '.join(SERVER_MODES)}.")
+
     print("Starting Voice Agent Service...")
     print(f"STT Model Path: {get_config_value('STT_MODEL_PATH')}")
     print(f"Audio Store Directory: {get_config_value('BASE_AUDIO_DIR')}")
-    server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
+    print(f"Server Mode: {server_mode}")
+    if server_mode == "async":
+        asyncio.run(run_async_server(SERVER_URL, logger))
+        return
+
+    max_workers = int(get_config_value('MAX_WORKERS', 'Server', fallback='10'))
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=max_workers))
     voice_agent_pb2_grpc.add_VoiceAgentServiceServicer_to_server(VoiceAgentServicer(), server)
     server.add_insecure_port(SERVER_URL)
     print("Press Ctrl+C to stop the server.")
@@ -34,4 +48,25 @@ def run_server():
     print(f"Server running at URL: {SERVER_URL}")
     logger.info(f"Voice Agent Service started in server mode! Server running at URL: {SERVER_URL}")
     server.start()
-    server.wait_for_termination()
\ No newline at end of file
+    server.wait_for_termination()
+
+async def run_async_server(SERVER_URL, logger):
+    # streams are coroutines on the event loop, only blocking calls take a thread from the sized executors
+    servicer = AsyncVoiceAgentServicer(
+        stt_workers=int(get_config_value('STT_WORKERS', 'Server', fallback='4')),
+        nlu_workers=int(get_config_value('NLU_WORKERS', 'Server', fallback='4')),
+        audio_workers=int(get_config_value('AUDIO_WORKERS', 'Server', fallback='2')),
+    )
+    server = grpc.aio.server()
+    voice_agent_pb2_grpc.add_VoiceAgentServiceServicer_to_server(servicer, server)
+    server.add_insecure_port(SERVER_URL)
+    print("Press Ctrl+C to stop the server.")
+    print("Voice Agent Server started!")
+    print(f"Server running at URL: {SERVER_URL}")
+    logger.info(f"Voice Agent Service started in async server mode! Server running at URL: {SERVER_URL}")
+    await server.start()
+    try:
+        await server.wait_for_termination()
+    finally:
+        await server.stop(None)
+        servicer.shutdown()
@@ -106,6 +106,7 @@ def main():
             
             # Get the values provided by the user
             stt_path = args.stt_model_path
+            ww_path = args.ww_model_path or stt_path
             snips_model_path = args.snips_model_path
             rasa_model_path = args.rasa_model_path
             intents_vss_map_path = args.intents_vss_map_path
@@ -113,6 +114,7 @@ def main():
             
             # Convert to an absolute path if it's a relative path
             stt_path = add_trailing_slash(os.path.abspath(stt_path)) if not os.path.isabs(stt_path) else stt_path
+            ww_path = add_trailing_slash(os.path.abspath(ww_path)) if not os.path.isabs(ww_path) else ww_path
             snips_model_path = add_trailing_slash(os.path.abspath(snips_model_path)) if not os.path.isabs(snips_model_path) else snips_model_path
             rasa_model_path = add_trailing_slash(os.path.abspath(rasa_model_path)) if not os.path.isabs(rasa_model_path) else rasa_model_path
             intents_vss_map_path = os.path.abspath(intents_vss_map_path) if not os.path.isabs(intents_vss_map_path) else intents_vss_map_path
@@ -120,6 +122,7 @@ def main():
             
             # Also update the config.ini file
             update_config_value(stt_path, 'STT_MODEL_PATH')
+            update_config_value(ww_path, 'WAKE_WORD_MODEL_PATH')
             update_config_value(snips_model_path, 'SNIPS_MODEL_PATH')
             update_config_value(rasa_model_path, 'RASA_MODEL_PATH')
             update_config_value(intents_vss_map_path, 'INTENTS_VSS_MAP')
@@ -0,0 +1,575 @@
+# SPDX-License-Identifier: Apache-2.0
+#
+# Copyright (c) 2023 Malik Talha
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import grpc
+import json
+import time
+import asyncio
+import inspect
+import functools
+from agl_service_voiceagent.generated import voice_agent_pb2
+from agl_service_voiceagent.generated import voice_agent_pb2_grpc
+from agl_service_voiceagent.servicers.voice_agent_servicer import VoiceAgentServicer
+from agl_service_voiceagent.utils.admission import AdmissionRejected
+from agl_service_voiceagent.utils.recognizer_pool import RecognizerPoolExhausted
+from agl_service_voiceagent.utils.scheduler import Scheduler
+from agl_service_voiceagent.utils.wake_word import WakeWordDetector
+from agl_service_voiceagent.utils.wake_word_broadcast import WakeWordBroadcast
+from agl_service_voiceagent.utils.wake_word_engine import WakeWordEngine
+from agl_service_voiceagent.utils.common import generate_unique_uuid
+
+
+def abort_on_rejection(rpc):
+    """
+    Decorator for async RPCs, it ends the RPC with RESOURCE_EXHAUSTED if one of its stages rejected the request
+    because the service is overloaded, or if no recognizer could be leased in time. Responses a streaming RPC sent
+    before the rejection are kept.
+
+    Args:
+        rpc (callable): The RPC coroutine function or async generator function.
+
+    Returns:
+        callable: The wrapped RPC.
+    """
+    async def reject(self, context, e):
+        self.logger.warning(f"Client {context.peer()} was rejected by {rpc.__name__}: {e}")
+        await context.abort(grpc.StatusCode.RESOURCE_EXHAUSTED, str(e))
+
+    if inspect.isasyncgenfunction(rpc):
+        @functools.wraps(rpc)
+        async def stream_wrapper(self, request, context):
+            try:
+                async for response in rpc(self, request, context):
+                    yield response
+            except (AdmissionRejected, RecognizerPoolExhausted) as e:
+                await reject(self, context, e)
+        return stream_wrapper
+
+    @functools.wraps(rpc)
+    async def wrapper(self, request, context):
+        try:
+            return await rpc(self, request, context)
+        except (AdmissionRejected, RecognizerPoolExhausted) as e:
+            await reject(self, context, e)
+    return wrapper
+
+
+class AsyncVoiceAgentServicer(voice_agent_pb2_grpc.VoiceAgentServiceServicer):
+    """
+    Voice Agent Servicer for the `grpc.aio` server. Streams are handled as coroutines, so an open stream only holds a
+    thread while one of its blocking calls runs. Those calls go to sized realtime executors: `stt` for Vosk, `nlu` for
+    Snips and RASA, and `audio` for recordings made on the server, which block until the recording ends. Text commands
+    and command execution go to the batch thread pool of the scheduler. The service logic itself is shared with the
+    synchronous VoiceAgentServicer.
+    """
+
+    def __init__(self, stt_workers=4, nlu_workers=4, audio_workers=2):
+        """
+        Constructor for AsyncVoiceAgentServicer class.
+
+        Args:
+            stt_workers (int, optional): The number of threads decoding audio (default is 4).
+            nlu_workers (int, optional): The number of threads running the NLU engines for voice commands (default
+                is 4).
+            audio_workers (int, optional): The number of recordings made on the server at the same time (default is 2).
+        """
+        self.servicer = VoiceAgentServicer()
+        self.logger = self.servicer.logger
+        # the executors serve the voice RPCs, text commands and command execution run in the batch thread pool
+        scheduler = Scheduler()
+        self.stt_executor = scheduler.create_executor("realtime", stt_workers, "stt-worker")
+        self.nlu_executor = scheduler.create_executor("realtime", nlu_workers, "nlu-worker")
+        self.audio_executor = scheduler.create_executor("realtime", audio_workers, "audio-worker")
+        self.batch_executor = scheduler.batch_executor
+        # every DetectWakeWord client waits on the same detector
+        self.wake_word_broadcast = WakeWordBroadcast(self.create_wake_word_detector, self.audio_executor,
+                                                     on_stopped=self.log_wake_word_stats)
+
+
+    async def run_in_executor(self, executor, func, *args):
+        """
+        Run a blocking call in an executor and wait for it without blocking the event loop.
+
+        Args:
+            executor (concurrent.futures.Executor): The executor to run the call in, None for the default executor of
+                the event loop.
+            func (callable): The blocking function.
+            *args: The arguments of the function.
+
+        Returns:
+            object: The return value of the function.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, functools.partial(func, *args))
+
+
+    async def admit(self, stage):
+        """
+        Wait for a slot in an admission stage without blocking the event loop. Every successful call must be matched
+        by a call to `stage.release`.
+
+        Args:
+            stage (AdmissionStage): The stage to enter.
+
+        Raises:
+            AdmissionRejected: If the wait queue of the stage is full or the wait timed out.
+        """
+        loop = asyncio.get_running_loop()
+        admission = loop.run_in_executor(None, stage.acquire)
+        try:
+            await asyncio.shield(admission)
+        except asyncio.CancelledError:
+            # the wait goes on in the executor, a slot granted after the RPC was cancelled is given back right away
+            admission.add_done_callback(lambda f: f.cancelled() or f.exception() is not None or stage.release())
+            raise
+
+
+    async def run_batch(self, func, *args):
+        """
+        Run a blocking call in the batch thread pool once the batch stage admitted it, like `Scheduler.run_batch`,
+        without blocking the event loop.
+
+        Args:
+            func (callable): The blocking function.
+            *args: The arguments of the function.
+
+        Returns:
+            object: The return value of the function.
+
+        Raises:
+            AdmissionRejected: If too many batch calls are in flight.
+        """
+        batch_stage = self.servicer.scheduler.batch_stage
+        await self.admit(batch_stage)
+        call = self.batch_executor.submit(func, *args)
+        try:
+            return await asyncio.wrap_future(call)
+        finally:
+            # the slot is held until the call has finished, even if the RPC was cancelled while it runs
+            self.when_idle(call, batch_stage.release)
+
+
+    def when_idle(self, future, cleanup):
+        """
+        Call a cleanup function once an executor call has finished. A call that is already running when its RPC is
+        cancelled keeps running, so whatever it uses, e.g. a leased recognizer, may only be released after it.
+
+        Args:
+            future (concurrent.futures.Future): The last call submitted to the executor, or None.
+            cleanup (callable): Called without arguments, right away if the call is done or was never made, otherwise
+                in the thread that finishes the call.
+        """
+        if future is None:
+            cleanup()
+        else:
+            # also called right away if the call is done, or was cancelled before it started
+            future.add_done_callback(lambda _: cleanup())
+
+
+    def create_cancel_callback_adder(self, context):
+        """
+        Create the function `recognize_voice_request` registers its cancel callbacks with.
+
+        Args:
+            context (grpc.aio.ServicerContext): The context of the RPC.
+
+        Returns:
+            callable: Registers a function to be called without arguments once the RPC ends. Safe to call from any
+                thread.
+        """
+        loop = asyncio.get_running_loop()
+
+        def add_cancel_callback(callback):
+            # called from the audio executor, the context belongs to the event loop
+            loop.call_soon_threadsafe(context.add_done_callback, lambda _: callback())
+
+        return add_cancel_callback
+
+
+    def create_wake_word_detector(self):
+        """
+        Create the detector shared by the DetectWakeWord clients. Runs in the audio executor.
+
+        Returns:
+            WakeWordDetector: The detector, with its pipeline created.
+        """
+        servicer = self.servicer
+        wake_word_detector = WakeWordDetector(servicer.wake_word, servicer.stt_wake_word_model, servicer.channels,
+                                              servicer.sample_rate, servicer.bits_per_sample,
+                                              audio_source=servicer.audio_source,
+                                              vad=servicer.create_wake_word_vad(servicer.sample_rate),
+                                              **servicer.wake_word_engine_config)
+        wake_word_detector.create_pipeline()
+        return wake_word_detector
+
+
+    def log_wake_word_stats(self, wake_word_detector):
+        """
+        Log the statistics of a stopped wake word detector.
+
+        Args:
+            wake_word_detector (WakeWordDetector): The detector.
+        """
+        vad_stats = wake_word_detector.engine.get_vad_stats()
+        if vad_stats is not None:
+            self.logger.info(f"Wake word VAD stats: {json.dumps(vad_stats)}")
+        self.logger.info(f"Wake word capture queue stats: {json.dumps(wake_word_detector.get_queue_stats())}")
+        self.logger.debug(f"Wake word broadcast stats: {json.dumps(self.wake_word_broadcast.get_stats())}")
+
+
+    async def CheckServiceStatus(self, request, context):
+        """
+        Check the status of the Voice Agent service including the version.
+        """
+        return self.servicer.CheckServiceStatus(request, context)
+
+
+    @abort_on_rejection
+    async def DetectWakeWord(self, request, context):
+        """
+        Detect the wake word using the wake word detection model. This method records voice on server side. All
+        clients waiting at the same time share one detector, and a waiting client holds no thread.
+        """
+        # Log the unique request ID, client's IP address, and the endpoint
+        request_id = generate_unique_uuid(8)
+        client_ip = context.peer()
+        self.logger.info(f"[ReqID#{request_id}] Client {client_ip} made a request to DetectWakeWord end-point.")
+
+        # the wait is cancelled with the RPC if the client disconnects or cancels
+        status, wake_word_detector = await self.wake_word_broadcast.wait()
+        if status:
+            # every client that gets the detection can continue from it with a voice command of its own
+            self.servicer.set_wake_word_handoff(wake_word_detector, client_ip)
+        yield voice_agent_pb2.WakeWordStatus(status=status)
+        if status:
+            latency = (time.monotonic() - wake_word_detector.get_detection_time()) * 1000
+            self.logger.info(f"[ReqID#{request_id}] Wake word status sent to client {client_ip} {latency:.1f} ms after detection.")
+
+
+    @abort_on_rejection
+    async def S_DetectWakeWord(self, request_iterator, context):
+        """
+        Detect the wake word in audio streamed by the client. Each stream gets its own WakeWordEngine, audio is fed
+        into it in the STT executor as it arrives. Audio is expected to be 16-bit mono PCM.
+        """
+        # Log the unique request ID, client's IP address, and the endpoint
+        request_id = generate_unique_uuid(8)
+        client_ip = context.peer()
+        self.logger.info(f"[ReqID#{request_id}] Client {client_ip} made a request to S_DetectWakeWord end-point.")
+
+        servicer = self.servicer
+        engine = None
+        # the executor call in flight, the engine is only closed once it has finished
+        in_flight = None
+        detected = False
+
+        def close_engine():
+            current = engine
+            if current is None and in_flight is not None and not in_flight.cancelled() and in_flight.exception() is None:
+                # the RPC ended while the engine was being built
+                current = in_flight.result()
+            if current is not None:
+                current.close()
+                vad_stats = current.get_vad_stats()
+                if vad_stats is not None:
+                    self.logger.info(f"[ReqID#{request_id}] Wake word VAD stats: {json.dumps(vad_stats)}")
+
+        try:
+            async for request in request_iterator:
+                if engine is None:
+                    sample_rate = servicer.get_stream_sample_rate(request.sample_rate)
+                    if sample_rate is None:
+                        await context.abort(grpc.StatusCode.INVALID_ARGUMENT,
+                                            servicer.unsupported_sample_rate(request_id, client_ip, request.sample_rate))
+                    # leasing the recognizer may wait for the pool, so the engine is built off the event loop
+                    in_flight = self.stt_executor.submit(functools.partial(
+                        WakeWordEngine, servicer.wake_word, servicer.stt_wake_word_model, sample_rate,
+                        vad=servicer.create_wake_word_vad(sample_rate), **servicer.wake_word_engine_config))
+                    engine = await asyncio.wrap_future(in_flight)
+
+                if request.audio_chunk:
+                    in_flight = self.stt_executor.submit(engine.feed, request.audio_chunk)
+                    if await asyncio.wrap_future(in_flight):
+                        detected = True
+                        break
+
+        finally:
+            self.when_idle(in_flight, close_engine)
+
+        yield voice_agent_pb2.WakeWordStatus(status=detected)
+        if detected:
+            latency = (time.monotonic() - engine.detected_at) * 1000
+            self.logger.info(f"[ReqID#{request_id}] Wake word status sent to client {client_ip} {latency:.1f} ms after detection.")
+        else:
+            self.logger.info(f"[ReqID#{request_id}] Client {client_ip} ended the S_DetectWakeWord stream without a wake word.")
+
+
+    @abort_on_rejection
+    async def RecognizeVoiceCommand(self, request_iterator, context):
+        """
+        Recognize the voice command recorded on server side. Each START or STOP request is handled in the audio
+        executor, an AUTO recording is cancelled if the client goes away.
+        """
+        client_ip = context.peer()
+        result = None
+        action = None
+
+        add_cancel_callback = self.create_cancel_callback_adder(context)
+
+        async for request in request_iterator:
+            result = await self.run_in_executor(self.audio_executor, self.servicer.recognize_voice_request,
+                                                request, client_ip, add_cancel_callback) or result
+            action = request.action
+
+        if result is None:
+            # the stream held no request that is valid in its mode
+            result = (generate_unique_uuid(8), "", "", [], [], voice_agent_pb2.VOICE_NOT_RECOGNIZED)
+
+        return self.servicer.build_recognize_result(*result, client_ip, "RecognizeVoiceCommand", action)
+
+
+    @abort_on_rejection
+    async def S_RecognizeVoiceCommand(self, request_iterator, context):
+        """
+        Recognize the voice command from audio streamed by the client and extract the intent using the NLU model. Each
+        audio chunk is decoded in the STT executor as soon as it arrives. Audio is expected to be 16-bit mono PCM.
+        """
+        servicer = self.servicer
+        stt_model = servicer.stt_model
+        stt = ""
+        intent = ""
+        intent_slots = []
+        log_intent_slots = []
+        status = voice_agent_pb2.REC_SUCCESS
+        stream_uuid = generate_unique_uuid(8)
+        stream_state = {"nlu_model": voice_agent_pb2.SNIPS, "truncated": False, "received_bytes": 0}
+
+        # Log the unique request ID, client's IP address, and the endpoint
+        client_ip = context.peer()
+        self.logger.info(f"[ReqID#{stream_uuid}] Client {client_ip} made a request to S_RecognizeVoiceCommand end-point.")
+
+        recognizer_uuid = None
+        # the executor call in flight, the recognizer is only returned once it has finished
+        in_flight = None
+        texts = []
+        audio_received = False
+
+        def release():
+            uuid = recognizer_uuid
+            if uuid is None and in_flight is not None and not in_flight.cancelled() and in_flight.exception() is None:
+                # the RPC ended while the recognizer was being leased
+                uuid = in_flight.result()
+            if uuid is not None:
+                stt_model.cleanup_recognizer(uuid)
+
+        try:
+            async for request in request_iterator:
+                if recognizer_uuid is None:
+                    stream_uuid = request.stream_id or stream_uuid
+                    sample_rate = servicer.get_stream_sample_rate(request.audio_stream.sample_rate)
+                    if sample_rate is None:
+                        await context.abort(grpc.StatusCode.INVALID_ARGUMENT,
+                                            servicer.unsupported_sample_rate(stream_uuid, client_ip, request.audio_stream.sample_rate))
+                    in_flight = self.stt_executor.submit(stt_model.setup_recognizer, sample_rate)
+                    recognizer_uuid = await asyncio.wrap_future(in_flight)
+
+                for chunk in servicer.split_stream_audio(request, sample_rate, stream_state):
+                    audio_received = True
+                    # a STT slot is taken per chunk, so a stream waiting for its client holds none
+                    in_flight = self.stt_executor.submit(servicer.decode_stream_chunk, recognizer_uuid, chunk)
+                    text = await asyncio.wrap_future(in_flight)
+                    if text is not None:
+                        texts.append(text)
+
+            if audio_received:
+                in_flight = self.stt_executor.submit(servicer.finish_stream_decoding, recognizer_uuid, texts)
+                stt = await asyncio.wrap_future(in_flight)
+
+        finally:
+            self.when_idle(in_flight, release)
+
+        if stream_state["truncated"]:
+            self.logger.warning(f"[ReqID#{stream_uuid}] Voice command exceeded {servicer.max_stream_audio_seconds} seconds, remaining audio was ignored.")
+
+        if stt:
+            intent, intent_slots, log_intent_slots, status = await self.run_in_executor(
+                self.nlu_executor, servicer.process_nlu, stt, stream_state["nlu_model"])
+
+        else:
+            status = voice_agent_pb2.VOICE_NOT_RECOGNIZED
+
+        return servicer.build_recognize_result(stream_uuid, stt, intent, intent_slots, log_intent_slots, status,
+                                               client_ip, "S_RecognizeVoiceCommand")
+
+
+    @abort_on_rejection
+    async def RecognizeTextCommand(self, request, context):
+        """
+        Recognize the text command using the STT model and extract the intent using the NLU model.
+        """
+        return await self.run_batch(self.servicer.RecognizeTextCommand, request, context)
+
+
+    @abort_on_rejection
+    async def S_RecognizeTextCommand(self, request_iterator, context):
+        """
+        Recognize a stream of text commands and extract their intents, for bulk jobs. The commands are recognized in
+        the text worker pool of the scheduler, and the results are sent in the order of the commands as they complete.
+        """
+        servicer = self.servicer
+        scheduler = servicer.scheduler
+        stream_uuid = generate_unique_uuid(8)
+
+        # Log the unique request ID, client's IP address, and the endpoint
+        client_ip = context.peer()
+        self.logger.info(f"[ReqID#{stream_uuid}] Client {client_ip} made a request to S_RecognizeTextCommand end-point.")
+
+        loop = asyncio.get_running_loop()
+        # the pending commands in order, the queue bounds how many are in flight
+        pending = asyncio.Queue(maxsize=scheduler.text_window)
+        await self.admit(scheduler.stream_stage)
+
+        async def read():
+            try:
+                async for request in request_iterator:
+                    await pending.put(loop.run_in_executor(scheduler.text_executor, servicer.recognize_text,
+                                                           stream_uuid, request))
+            except Exception as e:
+                # the error is raised in order, after the results of the commands read before it
+                failed = loop.create_future()
+                failed.set_exception(e)
+                await pending.put(failed)
+            await pending.put(None)
+
+        reader = loop.create_task(read())
+        started_at = time.monotonic()
+        status_counts = {}
+        try:
+            while (future := await pending.get()) is not None:
+                response = await future
+                status_counts[response.status] = status_counts.get(response.status, 0) + 1
+                yield response
+
+        finally:
+            reader.cancel()
+            scheduler.stream_stage.release()
+            servicer.log_text_stream_stats(stream_uuid, client_ip, status_counts, time.monotonic() - started_at)
+
+
+    @abort_on_rejection
+    async def ExecuteCommand(self, request, context):
+        """
+        Execute the voice command by sending the intent to Kuksa.
+        """
+        return await self.run_batch(self.servicer.ExecuteCommand, request, context)
+
+
+    async def interpret_and_execute(self, stream_uuid, command, nlu_model, client_ip, endpoint, executor):
+        """
+        Extract the intent of a command and execute it, yielding the result of each stage. The command is only
+        executed if its intent was recognized.
+
+        Args:
+            stream_uuid (str): The unique ID of the request.
+            command (str): The text command.
+            nlu_model (NLUModel): The NLU model to use.
+            client_ip (str): The peer address of the client, for logging.
+            endpoint (str): The name of the RPC, for logging.
+            executor (concurrent.futures.Executor): Runs the NLU engine and the Kuksa writes.
+
+        Yields:
+            RecognizeExecuteResult: The INTENT stage, then the EXECUTION stage.
+
+        Raises:
+            AdmissionRejected: If the NLU or the Kuksa stage is overloaded.
+        """
+        servicer = self.servicer
+        intent, intent_slots, log_intent_slots, status = await self.run_in_executor(
+            executor, servicer.process_nlu, command, nlu_model)
+        recognition = (stream_uuid, command, intent, intent_slots, log_intent_slots, status)
+        yield servicer.build_stage_result(voice_agent_pb2.INTENT, recognition, client_ip, endpoint)
+
+        if status == voice_agent_pb2.REC_SUCCESS:
+            execution = await self.run_in_executor(executor, servicer.execute_intent, stream_uuid, intent, log_intent_slots)
+            yield servicer.build_stage_result(voice_agent_pb2.EXECUTION, recognition, client_ip, endpoint, execution)
+
+
+    @abort_on_rejection
+    async def RecognizeVoiceAndExecute(self, request_iterator, context):
+        """
+        Record a voice command on server side, recognize it, extract its intent and execute it in a single call. The
+        recording runs in the audio executor, the intent extraction and the execution in the NLU executor, and the
+        result of each stage is sent as soon as it completes.
+        """
+        servicer = self.servicer
+        client_ip = context.peer()
+        add_cancel_callback = self.create_cancel_callback_adder(context)
+        started_uuid = None
+
+        try:
+            async for request in request_iterator:
+                request = servicer.with_stream_id(request, started_uuid)
+                recognition = await self.run_in_executor(self.audio_executor, servicer.recognize_voice_request,
+                                                         request, client_ip, add_cancel_callback, True)
+                if recognition is None:
+                    continue
+
+                stream_uuid, stt, _, _, _, status = recognition
+                if status == voice_agent_pb2.REC_PROCESSING:
+                    started_uuid = stream_uuid
+                    yield servicer.build_stage_result(voice_agent_pb2.RECORDING, recognition, client_ip, "RecognizeVoiceAndExecute")
+                    continue
+
+                yield servicer.build_stage_result(voice_agent_pb2.TRANSCRIPT, recognition, client_ip, "RecognizeVoiceAndExecute")
+                if status == voice_agent_pb2.REC_SUCCESS:
+                    async for response in self.interpret_and_execute(stream_uuid, stt, request.nlu_model, client_ip,
+                                                                     "RecognizeVoiceAndExecute", self.nlu_executor):
+                        yield response
+                return
+
+        finally:
+            # the recording can't be stopped anymore once its stream is gone, the RPC may be cancelled so it isn't awaited
+            if started_uuid is not None:
+                self.audio_executor.submit(servicer.abandon_voice_recording, started_uuid)
+
+
+    @abort_on_rejection
+    async def RecognizeTextAndExecute(self, request, context):
+        """
+        Extract the intent of a text command and execute it in a single call, in the batch thread pool.
+        """
+        stream_uuid = generate_unique_uuid(8)
+
+        # Log the unique request ID, client's IP address, and the endpoint
+        client_ip = context.peer()
+        self.logger.info(f"[ReqID#{stream_uuid}] Client {client_ip} made a request to RecognizeTextAndExecute end-point.")
+
+        stream_stage = self.servicer.scheduler.stream_stage
+        await self.admit(stream_stage)
+        try:
+            async for response in self.interpret_and_execute(stream_uuid, request.text_command, request.nlu_model,
+                                                             client_ip, "RecognizeTextAndExecute", self.batch_executor):
+                yield response
+        finally:
+            stream_stage.release()
+
+
+    def shutdown(self):
+        """
+        Stop the executors once the server has stopped.
+        """
+        for executor in (self.stt_executor, self.nlu_executor, self.audio_executor):
+            executor.shutdown(wait=False, cancel_futures=True)
@@ -14,22 +14,117 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import grpc
 import json
 import time
+import inspect
+import functools
+import itertools
 import threading
 from agl_service_voiceagent.generated import voice_agent_pb2
 from agl_service_voiceagent.generated import voice_agent_pb2_grpc
+from agl_service_voiceagent.utils.admission import AdmissionController, AdmissionRejected
 from agl_service_voiceagent.utils.audio_recorder import AudioRecorder
+from agl_service_voiceagent.utils.audio_source import SharedAudioSource
+from agl_service_voiceagent.utils.audio_store import AudioStore
+from agl_service_voiceagent.utils.audio_archiver import AudioArchiver
+from agl_service_voiceagent.utils.pipeline_manager import PipelineManager
+from agl_service_voiceagent.utils.pipeline_pool import PipelinePool
+from agl_service_voiceagent.utils.recognizer_pool import RecognizerPoolExhausted
+from agl_service_voiceagent.utils.scheduler import Scheduler
+from agl_service_voiceagent.utils.session_registry import SessionRegistry
 from agl_service_voiceagent.utils.wake_word import WakeWordDetector
-from agl_service_voiceagent.utils.stt_model import STTModel
+from agl_service_voiceagent.utils.wake_word_engine import WakeWordEngine
+from agl_service_voiceagent.utils.vad import EnergyVAD
+from agl_service_voiceagent.utils.model_registry import ModelRegistry
+from agl_service_voiceagent.utils.ordered_map import ordered_map
 from agl_service_voiceagent.utils.kuksa_interface import KuksaInterface
 from agl_service_voiceagent.utils.mapper import Intent2VSSMapper
 from agl_service_voiceagent.utils.config import get_config_value, get_logger
-from agl_service_voiceagent.utils.common import generate_unique_uuid, delete_file
+from agl_service_voiceagent.utils.common import generate_unique_uuid
 from agl_service_voiceagent.nlu.snips_interface import SnipsInterface
 from agl_service_voiceagent.nlu.rasa_interface import RASAInterface
 
 
+def abort_on_rejection(rpc):
+    """
+    Decorator for RPCs, it ends the RPC with RESOURCE_EXHAUSTED if one of its stages rejected the request because the
+    service is overloaded, or if no recognizer could be leased in time. Responses a streaming RPC sent before the
+    rejection are kept.
+
+    Args:
+        rpc (callable): The RPC method.
+
+    Returns:
+        callable: The wrapped RPC method.
+    """
+    def reject(self, context, e):
+        self.logger.warning(f"Client {context.peer()} was rejected by {rpc.__name__}: {e}")
+        if not isinstance(context, grpc.ServicerContext):
+            # called by the async servicer, which aborts the RPC on its event loop
+            raise
+        context.abort(grpc.StatusCode.RESOURCE_EXHAUSTED, str(e))
+
+    if inspect.isgeneratorfunction(rpc):
+        @functools.wraps(rpc)
+        def stream_wrapper(self, request, context):
+            try:
+                yield from rpc(self, request, context)
+            except (AdmissionRejected, RecognizerPoolExhausted) as e:
+                reject(self, context, e)
+        return stream_wrapper
+
+    @functools.wraps(rpc)
+    def wrapper(self, request, context):
+        try:
+            return rpc(self, request, context)
+        except (AdmissionRejected, RecognizerPoolExhausted) as e:
+            reject(self, context, e)
+    return wrapper
+
+
+def scheduled(rpc):
+    """
+    Decorator that runs an RPC in its priority class. Batch RPCs run in the batch thread pool, or hold a slot of the
+    batch stream stage if they stream their responses, realtime RPCs stay in the thread that received them, pinned to the realtime CPUs
+    while they run. RPCs already called from a thread of their class, e.g. by the async servicer, run as they are.
+
+    Args:
+        rpc (callable): The RPC method.
+
+    Returns:
+        callable: The wrapped RPC method.
+    """
+    if inspect.isgeneratorfunction(rpc):
+        @functools.wraps(rpc)
+        def stream_wrapper(self, request, context):
+            class_name = self.scheduler.get_class(rpc.__name__)
+            if self.scheduler.get_current_class() == class_name:
+                yield from rpc(self, request, context)
+                return
+            if class_name == "batch":
+                # a stream can't be handed to the batch thread pool, and may stay open for as long as its client
+                # wants, so it is admitted by a stage of its own instead of taking a slot of the batch thread pool
+                with self.scheduler.stream_stage.slot(), self.scheduler.pinned(class_name):
+                    yield from rpc(self, request, context)
+                return
+            # a synchronous stream is served by the same thread from start to end
+            with self.scheduler.pinned(class_name):
+                yield from rpc(self, request, context)
+        return stream_wrapper
+
+    @functools.wraps(rpc)
+    def wrapper(self, request, context):
+        class_name = self.scheduler.get_class(rpc.__name__)
+        if self.scheduler.get_current_class() == class_name:
+            return rpc(self, request, context)
+        if class_name == "batch":
+            return self.scheduler.run_batch(rpc, self, request, context)
+        with self.scheduler.pinned(class_name):
+            return rpc(self, request, context)
+    return wrapper
+
+
 class VoiceAgentServicer(voice_agent_pb2_grpc.VoiceAgentServiceServicer):
     """
     Voice Agent Servicer class that implements the gRPC service defined in voice_agent.proto.
@@ -48,20 +143,83 @@ class VoiceAgentServicer(voice_agent_pb2_grpc.VoiceAgentServiceServicer):
         self.bits_per_sample = int(get_config_value('BITS_PER_SAMPLE'))
         self.stt_model_path = get_config_value('STT_MODEL_PATH')
         self.wake_word_model_path = get_config_value('WAKE_WORD_MODEL_PATH')
+        self.language = get_config_value('LANGUAGE', fallback='en-US')
         self.snips_model_path = get_config_value('SNIPS_MODEL_PATH')
         self.rasa_model_path = get_config_value('RASA_MODEL_PATH')
         self.rasa_server_port = int(get_config_value('RASA_SERVER_PORT'))
         self.rasa_detached_mode = bool(int(get_config_value('RASA_DETACHED_MODE')))
         self.base_log_dir = get_config_value('BASE_LOG_DIR')
         self.store_voice_command = bool(int(get_config_value('STORE_VOICE_COMMANDS')))
+        self.capture_mode = get_config_value('CAPTURE_MODE', 'Audio', fallback='stream')
+        self.max_stream_chunk_bytes = int(get_config_value('MAX_STREAM_CHUNK_BYTES', 'Audio', fallback='8192'))
+        self.max_stream_audio_seconds = int(get_config_value('MAX_STREAM_AUDIO_SECONDS', 'Audio', fallback='30'))
+        # every sample rate gets recognizer pools of its own, so clients may only pick from a few
+        self.stream_sample_rates = {self.sample_rate} | {int(rate) for rate in get_config_value('STREAM_SAMPLE_RATES', 'Audio', fallback='8000,16000,48000').split(',') if rate.strip()}
+        self.shared_capture = bool(int(get_config_value('SHARED_CAPTURE', 'Audio', fallback='0')))
+        self.subscriber_queue_ms = int(get_config_value('SUBSCRIBER_QUEUE_MS', 'Audio', fallback='2000'))
+        self.handoff = bool(int(get_config_value('HANDOFF', 'Audio', fallback='0')))
+        self.handoff_preroll_ms = int(get_config_value('HANDOFF_PREROLL_MS', 'Audio', fallback='300'))
+        self.handoff_window_ms = int(get_config_value('HANDOFF_WINDOW_MS', 'Audio', fallback='3000'))
+        self.auto_max_seconds = float(get_config_value('AUTO_MAX_SECONDS', 'Audio', fallback='10'))
+        self.auto_no_speech_timeout = float(get_config_value('AUTO_NO_SPEECH_TIMEOUT', 'Audio', fallback='5'))
+        self.auto_hangover_ms = int(get_config_value('AUTO_HANGOVER_MS', 'Audio', fallback='700'))
+        self.ambient_calibration_ms = int(get_config_value('AMBIENT_CALIBRATION_MS', 'Audio', fallback='1000'))
+        self.scratch_storage = get_config_value('SCRATCH_STORAGE', 'Audio', fallback='memfd')
+        self.scratch_dir = get_config_value('SCRATCH_DIR', 'Audio', fallback='')
+        self.archive_config = {
+            "audio_format": get_config_value('FORMAT', 'Archive', fallback='flac'),
+            "max_size_mb": float(get_config_value('MAX_SIZE_MB', 'Archive', fallback='0')),
+            "max_age_days": float(get_config_value('MAX_AGE_DAYS', 'Archive', fallback='0')),
+            "workers": int(get_config_value('WORKERS', 'Archive', fallback='1')),
+        }
+        self.session_max_seconds = float(get_config_value('SESSION_MAX_SECONDS', 'Audio', fallback='60'))
+        self.wake_word_engine_config = {
+            "segment_ms": int(get_config_value('SEGMENT_MS', 'WakeWord', fallback='500')),
+            "hop_ms": int(get_config_value('HOP_MS', 'WakeWord', fallback='500')),
+            "variants": [variant.strip() for variant in get_config_value('VARIANTS', 'WakeWord', fallback='').split(',') if variant.strip()],
+            "use_grammar": bool(int(get_config_value('GRAMMAR', 'WakeWord', fallback='1'))),
+            "check_partial": bool(int(get_config_value('CHECK_PARTIAL', 'WakeWord', fallback='1'))),
+        }
+        self.wake_word_vad = bool(int(get_config_value('VAD', 'WakeWord', fallback='1')))
+        self.vad_config = {
+            "threshold_ratio": float(get_config_value('VAD_THRESHOLD_RATIO', 'WakeWord', fallback='3.0')),
+            "min_rms": float(get_config_value('VAD_MIN_RMS', 'WakeWord', fallback='150')),
+            "hangover_ms": int(get_config_value('VAD_HANGOVER_MS', 'WakeWord', fallback='300')),
+            "preroll_ms": int(get_config_value('VAD_PREROLL_MS', 'WakeWord', fallback='300')),
+        }
+        self.recognizer_pool_config = {
+            "pool_min_size": int(get_config_value('RECOGNIZER_POOL_MIN_SIZE', 'STT', fallback='1')),
+            "pool_max_size": int(get_config_value('RECOGNIZER_POOL_MAX_SIZE', 'STT', fallback='4')),
+            "pool_idle_timeout": float(get_config_value('RECOGNIZER_POOL_IDLE_TIMEOUT', 'STT', fallback='60')),
+            "pool_acquire_timeout": float(get_config_value('RECOGNIZER_POOL_ACQUIRE_TIMEOUT', 'STT', fallback='5')),
+        }
+        self.wake_word_pool_config = {
+            "max_size": int(get_config_value('RECOGNIZER_POOL_MAX_SIZE', 'WakeWord', fallback='16')),
+            "idle_timeout": float(get_config_value('RECOGNIZER_POOL_IDLE_TIMEOUT', 'WakeWord', fallback='60')),
+            "acquire_timeout": float(get_config_value('RECOGNIZER_POOL_ACQUIRE_TIMEOUT', 'WakeWord', fallback='1')),
+        }
         self.logger = get_logger()
+        # realtime and batch RPCs are kept apart, before any pipeline or worker thread is started
+        self.scheduler = Scheduler()
 
         # Initialize class methods
+        # Models are shared through the registry, so a wake word model path pointing at the STT model does not load it twice
         self.logger.info("Loading Speech to Text and Wake Word Model...")
-        self.stt_model = STTModel(self.stt_model_path, self.sample_rate)
-        self.stt_wake_word_model = STTModel(self.wake_word_model_path, self.sample_rate)
+        self.model_registry = ModelRegistry()
+        self.stt_model = self.model_registry.acquire_model(self.stt_model_path, self.sample_rate, self.language, **self.recognizer_pool_config)
+        # the wake word path only leases from the 'wake_word' pools, so a dedicated model prewarms no open vocabulary recognizers
+        self.stt_wake_word_model = self.model_registry.acquire_model(self.wake_word_model_path, self.sample_rate, self.language,
+                                                                     **dict(self.recognizer_pool_config, pool_min_size=0))
+        # wake word streams lease their recognizers from pools of their own, so they can't starve voice commands
+        self.stt_wake_word_model.configure_pool("wake_word", **self.wake_word_pool_config)
         self.logger.info("Speech to Text and Wake Word Model loaded successfully.")
 
+        if self.stt_wake_word_model is self.stt_model:
+            memory_saved = self.model_registry.get_memory_saved() / (1024 * 1024)
+            self.logger.info(f"Wake Word model shares the Speech to Text model, saved ~{memory_saved:.1f} MB of memory.")
+        else:
+            self.logger.info(f"Using dedicated Wake Word model at path '{self.wake_word_model_path}'.")
+
         self.logger.info("Starting SNIPS intent engine...")
         self.snips_interface = SnipsInterface(self.snips_model_path)
         self.logger.info("SNIPS intent engine started successfully!")
@@ -77,7 +235,46 @@ class VoiceAgentServicer(voice_agent_pb2_grpc.VoiceAgentServiceServicer):
         else:
             self.logger.info(f"RASA intent engine detached mode detected! Assuming RASA server is running at URL: 127.0.0.1:{self.rasa_server_port}")
 
-        self.rvc_stream_uuids = {}
+        # a single capture pipeline is shared by all local wake word detectors and command recorders
+        # every GStreamer pipeline is driven from the pipeline manager's single GLib main loop thread
+        self.pipeline_manager = PipelineManager()
+        self.pipeline_pool = PipelinePool()
+
+        # with the wake word handoff, the source keeps enough history to replay everything since the detection
+        self.audio_source = None
+        self.wake_word_handoffs = {}
+        self.handoff_lock = threading.Lock()
+        if self.shared_capture:
+            self.logger.info("Starting shared audio capture pipeline...")
+            history_ms = self.handoff_preroll_ms + self.handoff_window_ms + 1000 if self.handoff else 0
+            self.audio_source = SharedAudioSource(self.channels, self.sample_rate, self.bits_per_sample,
+                                                  subscriber_queue_ms=self.subscriber_queue_ms, history_ms=history_ms,
+                                                  backpressure=self.pipeline_pool.backpressure)
+            self.audio_source.start()
+            self.logger.info("Shared audio capture pipeline started successfully!")
+
+        # the voice activity thresholds start out from the ambient cabin noise instead of the first audio frame
+        self.ambient_noise_floor = None
+        if self.ambient_calibration_ms > 0:
+            self.ambient_noise_floor = self.calibrate_ambient_noise(self.ambient_calibration_ms)
+
+        if not self.shared_capture:
+            # per-request pipelines are built ahead of time and parked, so START does not pay for building them. Parked
+            # pipelines hold the audio device, so this has to wait until the calibration has released it.
+            self.pipeline_pool.prewarm(self.pipeline_pool.get_layout(self.channels, self.sample_rate, with_appsink=True))
+            self.pipeline_pool.prewarm(self.pipeline_pool.get_layout(self.channels, self.sample_rate,
+                                                                     self.capture_mode == "stream", self.store_voice_command or self.capture_mode == "file"))
+
+        # recordings are only written to block storage if they are kept, everything else stays in memory
+        self.audio_store = AudioStore(self.base_audio_dir, self.scratch_storage, self.scratch_dir)
+        # stored voice commands are recorded to scratch storage too, and encoded into the archive in the background
+        self.audio_archiver = AudioArchiver(self.audio_store, self.base_audio_dir, **self.archive_config)
+
+        # manual recordings whose client never sends STOP are evicted, so they can't capture and fill the disk forever
+        self.rvc_sessions = SessionRegistry(self.session_max_seconds, on_evict=self.evict_voice_recording)
+        # CPU-heavy stages are capped, requests over the caps wait in a bounded queue or are rejected
+        self.admission = AdmissionController()
+
         self.kuksa_client = KuksaInterface()
         self.kuksa_client.connect_kuksa_client()
         self.kuksa_client.authorize_kuksa_client()
@@ -87,6 +284,180 @@ class VoiceAgentServicer(voice_agent_pb2_grpc.VoiceAgentServiceServicer):
         self.logger.info(f"Successfully loaded and parsed mapping files.")
 
 
+    def process_nlu(self, text, nlu_model, wait=False):
+        """
+        Extract the intent and intent slots from a text command using the requested NLU model.
+
+        Args:
+            text (str): The text command.
+            nlu_model (NLUModel): The NLU model to use.
+            wait (bool, optional): Wait for the NLU engine however long it takes instead of being rejected when it is
+                overloaded, for callers that bound their own concurrency (default is False).
+
+        Returns:
+            tuple: The intent (str), the intent slots (list of IntentSlot), the intent slots for logging (list of dict)
+                and the recognition status (RecognizeStatusType).
+        """
+        intent = ""
+        intent_slots = []
+        log_intent_slots = []
+        status = voice_agent_pb2.REC_SUCCESS
+
+        if nlu_model == voice_agent_pb2.SNIPS:
+            with self.admission.slot("snips", wait):
+                extracted_intent = self.snips_interface.extract_intent(text)
+            intent, intent_actions = self.snips_interface.process_intent(extracted_intent)
+
+        elif nlu_model == voice_agent_pb2.RASA:
+            with self.admission.slot("rasa", wait):
+                extracted_intent = self.rasa_interface.extract_intent(text)
+            intent, intent_actions = self.rasa_interface.process_intent(extracted_intent)
+
+        else:
+            return intent, intent_slots, log_intent_slots, voice_agent_pb2.NLU_MODEL_NOT_SUPPORTED
+
+        if not intent or intent == "":
+            intent = ""
+            status = voice_agent_pb2.INTENT_NOT_RECOGNIZED
+
+        else:
+            for action, value in intent_actions.items():
+                intent_slots.append(voice_agent_pb2.IntentSlot(name=action, value=value))
+                log_intent_slots.append({"name": action, "value": value})
+
+        return intent, intent_slots, log_intent_slots, status
+
+
+    def create_wake_word_vad(self, sample_rate):
+        """
+        Create the voice activity gate placed in front of the wake word recognizer, if enabled.
+
+        Args:
+            sample_rate (int): The sample rate of the audio to gate.
+
+        Returns:
+            EnergyVAD: A new gate, or None if gating is disabled in the config.
+        """
+        if not self.wake_word_vad:
+            return None
+        return EnergyVAD(sample_rate, noise_floor=self.ambient_noise_floor, **self.vad_config)
+
+
+    def calibrate_ambient_noise(self, duration_ms):
+        """
+        Record a short sample of the ambient noise and measure its level. Uses the shared audio source if there is
+        one, otherwise a capture pipeline is started just for the calibration, which needs the audio device to itself
+        and so has to run before any capture pipeline is prewarmed.
+
+        Args:
+            duration_ms (int): How much audio to record, in milliseconds.
+
+        Returns:
+            float: The RMS noise floor, or None if no audio could be recorded.
+        """
+        self.logger.info(f"Calibrating voice activity detection on {duration_ms} ms of ambient noise...")
+        audio_source = self.audio_source or SharedAudioSource(self.channels, self.sample_rate, self.bits_per_sample,
+                                                              subscriber_queue_ms=duration_ms)
+        audio_source.start()
+        subscription = audio_source.subscribe()
+        audio_data = bytearray()
+        deadline = time.monotonic() + duration_ms * 2 / 1000
+        while len(audio_data) < audio_source.ms_to_bytes(duration_ms) and time.monotonic() < deadline:
+            audio_data.extend(subscription.read(0.1) or b"")
+        subscription.close()
+        if audio_source is not self.audio_source:
+            audio_source.stop()
+
+        vad = EnergyVAD(self.sample_rate, **self.vad_config)
+        vad.calibrate(audio_data)
+        if vad.noise_floor is None:
+            self.logger.warning("Ambient noise calibration failed, no audio was recorded.")
+        else:
+            self.logger.info(f"Ambient noise calibration finished, noise floor RMS: {vad.noise_floor:.1f}")
+        return vad.noise_floor
+
+
+    def get_stream_sample_rate(self, sample_rate):
+        """
+        Get the sample rate of audio streamed by a client, if it is one of the supported rates.
+
+        Args:
+            sample_rate (int): The sample rate sent by the client, 0 for the configured sample rate.
+
+        Returns:
+            int: The sample rate, or None if it is not supported.
+        """
+        sample_rate = sample_rate or self.sample_rate
+        return sample_rate if sample_rate in self.stream_sample_rates else None
+
+
+    def unsupported_sample_rate(self, request_id, client_ip, sample_rate):
+        """
+        Log a stream rejected because of its sample rate and build the error message for the client.
+
+        Args:
+            request_id (str): The unique ID of the request, used for logging.
+            client_ip (str): The peer address of the client, for logging.
+            sample_rate (int): The sample rate sent by the client.
+
+        Returns:
+            str: The error message the RPC is aborted with.
+        """
+        supported = ", ".join(str(rate) for rate in sorted(self.stream_sample_rates))
+        self.logger.warning(f"[ReqID#{request_id}] Client {client_ip} sent audio with unsupported sample rate {sample_rate}.")
+        return f"Unsupported sample rate {sample_rate} Hz, expected one of {supported}."
+
+
+    def set_wake_word_handoff(self, wake_word_detector, client_ip):
+        """
+        Remember where in the shared audio stream the wake word was detected for a client, so a voice command the
+        same client starts shortly after can pick up the audio from there.
+
+        Handoffs are kept per client, so detections sent to different clients don't race for a single handoff. A
+        client is identified by the peer address of its channel, so it has to send the voice command on the channel
+        it received the detection on.
+
+        Args:
+            wake_word_detector (WakeWordDetector): The detector that detected the wake word.
+            client_ip (str): The peer address of the client the detection was sent to.
+        """
+        position = wake_word_detector.get_detection_position()
+        if not self.handoff or position is None:
+            return
+
+        now = time.monotonic()
+        with self.handoff_lock:
+            # drop the handoffs that were never taken
+            for key, handoff in list(self.wake_word_handoffs.items()):
+                if (now - handoff["detected_at"]) * 1000 > self.handoff_window_ms:
+                    del self.wake_word_handoffs[key]
+            self.wake_word_handoffs[client_ip] = {
+                "position": max(0, position - self.audio_source.ms_to_bytes(self.handoff_preroll_ms)),
+                "detected_at": wake_word_detector.get_detection_time(),
+                "engine": wake_word_detector.engine,
+            }
+
+
+    def take_wake_word_handoff(self, client_ip):
+        """
+        Take the pending wake word handoff of a client if the wake word was detected within the handoff window. A
+        handoff can only be taken once.
+
+        Args:
+            client_ip (str): The peer address of the client.
+
+        Returns:
+            dict: The stream position to start recording from, the detection time and the wake word engine, or None
+                if there is no recent detection for the client.
+        """
+        with self.handoff_lock:
+            handoff = self.wake_word_handoffs.pop(client_ip, None)
+
+        if handoff is None or (time.monotonic() - handoff["detected_at"]) * 1000 > self.handoff_window_ms:
+            return None
+        return handoff
+
+
     def CheckServiceStatus(self, request, context):
         """
         Check the status of the Voice Agent service including the version.
@@ -114,6 +485,8 @@ class VoiceAgentServicer(voice_agent_pb2_grpc.VoiceAgentServiceServicer):
         return response
 
 
+    @abort_on_rejection
+    @scheduled
     def DetectWakeWord(self, request, context):
         """
         Detect the wake word using the wake word detection model. This method records voice on server side. If your client 
@@ -124,112 +497,363 @@ class VoiceAgentServicer(voice_agent_pb2_grpc.VoiceAgentServiceServicer):
         client_ip = context.peer()
         self.logger.info(f"[ReqID#{request_id}] Client {client_ip} made a request to DetectWakeWord end-point.")
 
-        wake_word_detector = WakeWordDetector(self.wake_word, self.stt_model, self.channels, self.sample_rate, self.bits_per_sample)
+        wake_word_detector = WakeWordDetector(self.wake_word, self.stt_wake_word_model, self.channels, self.sample_rate, self.bits_per_sample,
+                                              audio_source=self.audio_source, vad=self.create_wake_word_vad(self.sample_rate),
+                                              **self.wake_word_engine_config)
         wake_word_detector.create_pipeline()
-        detection_thread = threading.Thread(target=wake_word_detector.start_listening)
-        detection_thread.start()
-        while True:
-            status = wake_word_detector.get_wake_word_status()
-            time.sleep(0.5)
-            if not context.is_active():
-                wake_word_detector.send_eos()
-                break
-            yield voice_agent_pb2.WakeWordStatus(status=status)
+
+        # stop listening as soon as the client disconnects or cancels, instead of polling context.is_active()
+        context.add_callback(wake_word_detector.send_eos)
+
+        try:
+            # the pipeline runs on the pipeline manager's main loop, this worker only waits for the detection
+            wake_word_detector.start_listening()
+            status = wake_word_detector.wait_for_wake_word()
             if status:
-                break
+                self.set_wake_word_handoff(wake_word_detector, client_ip)
+                yield voice_agent_pb2.WakeWordStatus(status=True)
+                latency = (time.monotonic() - wake_word_detector.get_detection_time()) * 1000
+                self.logger.info(f"[ReqID#{request_id}] Wake word status sent to client {client_ip} {latency:.1f} ms after detection.")
+
+            elif context.is_active():
+                # listening stopped without a detection, e.g. because of a pipeline error
+                yield voice_agent_pb2.WakeWordStatus(status=False)
+
+        finally:
+            wake_word_detector.stop_listening()
+            self.logger.debug(f"[ReqID#{request_id}] Pipeline manager stats: {json.dumps(self.pipeline_manager.get_stats())}")
 
-        detection_thread.join()
+        vad_stats = wake_word_detector.engine.get_vad_stats()
+        if vad_stats is not None:
+            self.logger.info(f"[ReqID#{request_id}] Wake word VAD stats: {json.dumps(vad_stats)}")
+        self.logger.info(f"[ReqID#{request_id}] Wake word capture queue stats: {json.dumps(wake_word_detector.get_queue_stats())}")
     
     
+    @abort_on_rejection
+    @scheduled
+    def S_DetectWakeWord(self, requests, context):
+        """
+        Detect the wake word in audio streamed by the client. Each stream gets its own WakeWordEngine, so many remote
+        audio sources can be served at once without running a GStreamer pipeline per client, up to the size of the
+        wake word recognizer pool. A status of True is sent as soon as the wake word is detected, a status of False is
+        sent if the client ends the stream without it. Audio is expected to be 16-bit mono PCM.
+        """
+        # Log the unique request ID, client's IP address, and the endpoint
+        request_id = generate_unique_uuid(8)
+        client_ip = context.peer()
+        self.logger.info(f"[ReqID#{request_id}] Client {client_ip} made a request to S_DetectWakeWord end-point.")
+
+        engine = None
+        detected = False
+        try:
+            for request in requests:
+                if engine is None:
+                    sample_rate = self.get_stream_sample_rate(request.sample_rate)
+                    if sample_rate is None:
+                        context.abort(grpc.StatusCode.INVALID_ARGUMENT,
+                                      self.unsupported_sample_rate(request_id, client_ip, request.sample_rate))
+                    engine = WakeWordEngine(self.wake_word, self.stt_wake_word_model, sample_rate,
+                                            vad=self.create_wake_word_vad(sample_rate), **self.wake_word_engine_config)
+
+                if request.audio_chunk and engine.feed(request.audio_chunk):
+                    detected = True
+                    break
+
+        finally:
+            if engine is not None:
+                engine.close()
+                vad_stats = engine.get_vad_stats()
+                if vad_stats is not None:
+                    self.logger.info(f"[ReqID#{request_id}] Wake word VAD stats: {json.dumps(vad_stats)}")
+
+        yield voice_agent_pb2.WakeWordStatus(status=detected)
+        if detected:
+            latency = (time.monotonic() - engine.detected_at) * 1000
+            self.logger.info(f"[ReqID#{request_id}] Wake word status sent to client {client_ip} {latency:.1f} ms after detection.")
+        else:
+            self.logger.info(f"[ReqID#{request_id}] Client {client_ip} ended the S_DetectWakeWord stream without a wake word.")
+
+
+    def start_voice_recording(self, stream_uuid, mode, capture_mode, client_ip):
+        """
+        Create an audio recorder for a voice command and start recording.
+
+        Args:
+            stream_uuid (str): The unique ID of the voice command, used for logging.
+            mode (str): The recording mode ('auto' or 'manual').
+            capture_mode (str): 'stream' to decode while recording, or 'file' to decode the recorded file afterwards.
+            client_ip (str): The peer address of the client, whose wake word handoff the recording continues from.
+
+        Returns:
+            tuple: The recorder (AudioRecorder), the name of the recorded audio file (str, or None) and the wake word
+                handoff the recording continues from (dict, or None).
+        """
+        recorder = AudioRecorder(self.stt_model, self.audio_store, self.channels, self.sample_rate, self.bits_per_sample,
+                                 capture_mode=capture_mode, store_audio=self.store_voice_command,
+                                 audio_source=self.audio_source)
+        recorder.set_pipeline_mode(mode)
+        if mode == "auto":
+            vad = EnergyVAD(self.sample_rate, noise_floor=self.ambient_noise_floor,
+                            **dict(self.vad_config, hangover_ms=self.auto_hangover_ms))
+            recorder.set_endpointing(vad, self.auto_max_seconds, self.auto_no_speech_timeout)
+        audio_file = recorder.create_pipeline()
+
+        # continue from the audio captured right before the wake word detection, so nothing spoken in between is lost
+        handoff = self.take_wake_word_handoff(client_ip) if self.audio_source is not None else None
+        if handoff is not None:
+            gap = (time.monotonic() - handoff["detected_at"]) * 1000
+            self.logger.info(f"[ReqID#{stream_uuid}] Continuing from the wake word detected {gap:.0f} ms ago.")
+            recorder.start_recording(handoff["position"])
+        else:
+            recorder.start_recording()
+
+        return recorder, audio_file, handoff
+
+
+    def finish_voice_recording(self, stream_uuid, recorder, audio_file, handoff, nlu_model):
+        """
+        Stop recording a voice command, get its text and extract the intent using the NLU model.
+
+        Args:
+            stream_uuid (str): The unique ID of the voice command, used for logging.
+            recorder (AudioRecorder): The recorder returned by `start_voice_recording`.
+            audio_file (str): The name of the recorded audio file, or None.
+            handoff (dict): The wake word handoff the recording continued from, or None.
+            nlu_model (NLUModel): The NLU model to use, or None to only get the text.
+
+        Returns:
+            tuple: The recognized text (str), the intent (str), the intent slots (list of IntentSlot), the intent slots
+                for logging (list of dict) and the recognition status (RecognizeStatusType).
+
+        Raises:
+            AdmissionRejected: If the speech to text or NLU stage is overloaded. The recording is still released.
+        """
+        stop_time = time.monotonic()
+        recorder.stop_recording()
+        try:
+            return self.recognize_voice_recording(stream_uuid, recorder, audio_file, handoff, nlu_model, stop_time)
+
+        finally:
+            # archive or delete the audio file, both happen in the background
+            if audio_file and self.store_voice_command:
+                self.audio_archiver.archive(audio_file)
+            elif audio_file:
+                self.audio_archiver.release(audio_file)
+
+
+    def recognize_voice_recording(self, stream_uuid, recorder, audio_file, handoff, nlu_model, stop_time):
+        """
+        Get the text of a stopped recording and extract the intent using the NLU model.
+
+        Args:
+            stream_uuid (str): The unique ID of the voice command, used for logging.
+            recorder (AudioRecorder): The stopped recorder.
+            audio_file (str): The name of the recorded audio file, or None.
+            handoff (dict): The wake word handoff the recording continued from, or None.
+            nlu_model (NLUModel): The NLU model to use, or None to only get the text.
+            stop_time (float): The `time.monotonic()` timestamp of the STOP, used for logging.
+
+        Returns:
+            tuple: The recognized text (str), the intent (str), the intent slots (list of IntentSlot), the intent slots
+                for logging (list of dict) and the recognition status (RecognizeStatusType).
+        """
+        intent = ""
+        intent_slots = []
+        log_intent_slots = []
+
+        if recorder.capture_mode == "stream":
+            # audio was decoded while recording, only the final result has to be flushed, which is not worth queueing
+            stt = recorder.finish_recognition()
+        else:
+            with self.admission.slot("stt"):
+                recognizer_uuid = self.stt_model.setup_recognizer()
+                try:
+                    stt = self.stt_model.recognize_from_file(recognizer_uuid, audio_file)
+                finally:
+                    # a broken or truncated recording must not keep the recognizer leased
+                    self.stt_model.cleanup_recognizer(recognizer_uuid)
+        self.logger.info(f"[ReqID#{stream_uuid}] Speech to text finished {(time.monotonic() - stop_time) * 1000:.0f} ms after STOP in {recorder.capture_mode} capture mode.")
+
+        if handoff is not None:
+            # the recording starts before the detection, so it contains the wake word itself
+            stt = handoff["engine"].strip_wake_word(stt)
+
+        if stt in ["FILE_NOT_FOUND", "FILE_FORMAT_INVALID", "VOICE_NOT_RECOGNIZED", ""]:
+            stt = ""
+            status = voice_agent_pb2.VOICE_NOT_RECOGNIZED
+
+        elif nlu_model is None:
+            status = voice_agent_pb2.REC_SUCCESS
+
+        else:
+            intent, intent_slots, log_intent_slots, status = self.process_nlu(stt, nlu_model)
+
+        self.logger.debug(f"[ReqID#{stream_uuid}] Capture queue stats: {json.dumps(recorder.get_queue_stats())}")
+        self.logger.debug(f"[ReqID#{stream_uuid}] STT recognizer pool stats: {json.dumps(self.stt_model.get_pool_stats())}")
+        self.logger.debug(f"[ReqID#{stream_uuid}] Pipeline manager stats: {json.dumps(self.pipeline_manager.get_stats())}")
+        self.logger.debug(f"[ReqID#{stream_uuid}] Pipeline pool stats: {json.dumps(self.pipeline_pool.get_stats())}")
+        self.logger.debug(f"[ReqID#{stream_uuid}] Audio store stats: {json.dumps(self.audio_store.get_stats())}")
+        self.logger.debug(f"[ReqID#{stream_uuid}] Audio archive stats: {json.dumps(self.audio_archiver.get_stats())}")
+        self.logger.debug(f"[ReqID#{stream_uuid}] Voice recording session stats: {json.dumps(self.rvc_sessions.get_stats())}")
+        self.logger.debug(f"[ReqID#{stream_uuid}] Admission stats: {json.dumps(self.admission.get_stats())}")
+
+        return stt, intent, intent_slots, log_intent_slots, status
+
+
+    def evict_voice_recording(self, stream_uuid, session, reason):
+        """
+        Release everything held by a manual recording that was never stopped by its client: stop the capture, return
+        the recognizer to the STT model and delete the orphaned audio file. Called from the session reaper thread.
+
+        Args:
+            stream_uuid (str): The unique ID of the voice command.
+            session (dict): The recorder, audio file and wake word handoff of the recording.
+            reason (str): Why the session was evicted, 'max_duration' or 'stream_closed'.
+        """
+        recorder = session["recorder"]
+        self.logger.warning(f"[ReqID#{stream_uuid}] Evicting manual recording without a STOP request after "
+                            f"{time.monotonic() - recorder.recording_started_at:.1f} seconds, reason: {reason}.")
+        recorder.stop_recording()
+        recorder.finish_recognition()
+
+        # nobody is going to process the recording, so it is not kept even if voice commands are stored
+        if session["audio_file"]:
+            self.audio_archiver.release(session["audio_file"])
+
+        self.logger.info(f"Voice recording session stats: {json.dumps(self.rvc_sessions.get_stats())}")
+
+
+    def abandon_voice_recording(self, stream_uuid):
+        """
+        Release a manual recording whose stream ended before its STOP request, if it is still active.
+
+        Args:
+            stream_uuid (str): The unique ID of the voice command.
+        """
+        session = self.rvc_sessions.pop(stream_uuid)
+        if session is not None:
+            self.evict_voice_recording(stream_uuid, session, "stream_closed")
+
+
+    @abort_on_rejection
+    @scheduled
     def RecognizeVoiceCommand(self, requests, context):
         """
         Recognize the voice command using the STT model and extract the intent using the NLU model. This method records voice 
         on server side, meaning the client only sends a START and STOP request to the server. If your client and server are 
-        not on the same machine, then you should use the `S_RecognizeVoiceCommand` method instead.
+        not on the same machine, then you should use the `S_RecognizeVoiceCommand` method instead. In AUTO mode the client
+        only sends START, recording stops by itself once the user stops speaking and the result is returned right away.
+        """
+        client_ip = context.peer()
+        result = None
+        action = None
+
+        for request in requests:
+            result = self.recognize_voice_request(request, client_ip, context.add_callback) or result
+            action = request.action
+
+        if result is None:
+            # the stream held no request that is valid in its mode
+            result = (generate_unique_uuid(8), "", "", [], [], voice_agent_pb2.VOICE_NOT_RECOGNIZED)
+
+        return self.build_recognize_result(*result, client_ip, "RecognizeVoiceCommand", action)
+
+
+    def recognize_voice_request(self, request, client_ip, add_cancel_callback, transcribe_only=False):
+        """
+        Handle a single START or STOP request of a RecognizeVoiceCommand stream. Blocks until an AUTO recording ends.
+
+        Args:
+            request (RecognizeVoiceControl): The request.
+            client_ip (str): The peer address of the client, for logging.
+            add_cancel_callback (callable): Registers a function to be called without arguments once the RPC ends,
+                used to cancel an AUTO recording if the client goes away.
+            transcribe_only (bool, optional): Only get the text of the recording, without extracting the intent
+                (default is False).
+
+        Returns:
+            tuple: The stream ID, the recognized text, the intent, the intent slots, the intent slots for logging and
+                the status, or None if the request is not valid in its mode.
         """
         stt = ""
         intent = ""
         intent_slots = []
         log_intent_slots = []
+        nlu_model = None if transcribe_only else request.nlu_model
 
-        for request in requests:
-            if request.record_mode == voice_agent_pb2.MANUAL:
+        if request.record_mode == voice_agent_pb2.MANUAL:
 
-                if request.action == voice_agent_pb2.START:
-                    status = voice_agent_pb2.REC_PROCESSING
-                    stream_uuid = generate_unique_uuid(8)
+            if request.action == voice_agent_pb2.START:
+                status = voice_agent_pb2.REC_PROCESSING
+                stream_uuid = generate_unique_uuid(8)
 
-                    # Log the unique request ID, client's IP address, and the endpoint
-                    client_ip = context.peer()
-                    self.logger.info(f"[ReqID#{stream_uuid}] Client {client_ip} made a manual START request to RecognizeVoiceCommand end-point.")
+                # Log the unique request ID, client's IP address, and the endpoint
+                self.logger.info(f"[ReqID#{stream_uuid}] Client {client_ip} made a manual START request to RecognizeVoiceCommand end-point.")
 
-                    recorder = AudioRecorder(self.stt_model, self.base_audio_dir, self.channels, self.sample_rate, self.bits_per_sample)
-                    recorder.set_pipeline_mode("manual")
-                    audio_file = recorder.create_pipeline()
+                recorder, audio_file, handoff = self.start_voice_recording(stream_uuid, "manual", self.capture_mode, client_ip)
+                self.rvc_sessions.add(stream_uuid, {
+                    "recorder": recorder,
+                    "audio_file": audio_file,
+                    "handoff": handoff
+                })
 
-                    self.rvc_stream_uuids[stream_uuid] = {
-                        "recorder": recorder,
-                        "audio_file": audio_file
-                    }
-                    
-                    recorder.start_recording()
+            elif request.action == voice_agent_pb2.STOP:
+                stream_uuid = request.stream_id
 
-                elif request.action == voice_agent_pb2.STOP:
-                    stream_uuid = request.stream_id
-                    status = voice_agent_pb2.REC_SUCCESS
+                # Log the unique request ID, client's IP address, and the endpoint
+                self.logger.info(f"[ReqID#{stream_uuid}] Client {client_ip} made a manual STOP request to RecognizeVoiceCommand end-point.")
 
-                    # Log the unique request ID, client's IP address, and the endpoint
-                    client_ip = context.peer()
-                    self.logger.info(f"[ReqID#{stream_uuid}] Client {client_ip} made a manual STOP request to RecognizeVoiceCommand end-point.")
+                session = self.rvc_sessions.pop(stream_uuid)
+                if session is None:
+                    # unknown stream ID, or the recording ran past its limits and was evicted
+                    self.logger.warning(f"[ReqID#{stream_uuid}] No active recording for STOP request, it is unknown or was evicted.")
+                    status = voice_agent_pb2.VOICE_NOT_RECOGNIZED
+                else:
+                    stt, intent, intent_slots, log_intent_slots, status = self.finish_voice_recording(
+                        stream_uuid, session["recorder"], session["audio_file"], session["handoff"], nlu_model)
 
-                    recorder = self.rvc_stream_uuids[stream_uuid]["recorder"]
-                    audio_file = self.rvc_stream_uuids[stream_uuid]["audio_file"]
-                    del self.rvc_stream_uuids[stream_uuid]
+            else:
+                return None
 
-                    recorder.stop_recording()
-                    recognizer_uuid = self.stt_model.setup_recognizer()
-                    stt = self.stt_model.recognize_from_file(recognizer_uuid, audio_file)
+        elif request.record_mode == voice_agent_pb2.AUTO and request.action == voice_agent_pb2.START:
+            stream_uuid = generate_unique_uuid(8)
 
-                    if stt not in ["FILE_NOT_FOUND", "FILE_FORMAT_INVALID", "VOICE_NOT_RECOGNIZED", ""]:
-                        if request.nlu_model == voice_agent_pb2.SNIPS:
-                            extracted_intent = self.snips_interface.extract_intent(stt)
-                            intent, intent_actions = self.snips_interface.process_intent(extracted_intent)
+            # Log the unique request ID, client's IP address, and the endpoint
+            self.logger.info(f"[ReqID#{stream_uuid}] Client {client_ip} made an auto START request to RecognizeVoiceCommand end-point.")
 
-                            if not intent or intent == "":
-                                status = voice_agent_pb2.INTENT_NOT_RECOGNIZED
-                            
-                            else:
-                                for action, value in intent_actions.items():
-                                    intent_slots.append(voice_agent_pb2.IntentSlot(name=action, value=value))
-                                    log_intent_slots.append({"name": action, "value": value})
-                        
-                        elif request.nlu_model == voice_agent_pb2.RASA:
-                            extracted_intent = self.rasa_interface.extract_intent(stt)
-                            intent, intent_actions = self.rasa_interface.process_intent(extracted_intent)
+            # the end of the utterance is detected on the audio as it is recorded, so auto mode always decodes while recording
+            recorder, audio_file, handoff = self.start_voice_recording(stream_uuid, "auto", "stream", client_ip)
+            add_cancel_callback(recorder.cancel)
+            reason = recorder.wait_for_endpoint()
+            self.logger.info(f"[ReqID#{stream_uuid}] Auto recording ended after {time.monotonic() - recorder.recording_started_at:.1f} seconds, reason: {reason}.")
 
-                            if not intent or intent == "":
-                                status = voice_agent_pb2.INTENT_NOT_RECOGNIZED
+            stt, intent, intent_slots, log_intent_slots, status = self.finish_voice_recording(
+                stream_uuid, recorder, audio_file, handoff, nlu_model)
 
-                            else:
-                                for action, value in intent_actions.items():
-                                    intent_slots.append(voice_agent_pb2.IntentSlot(name=action, value=value))
-                                    log_intent_slots.append({"name": action, "value": value})
+        else:
+            return None
 
-                        else:
-                            status = voice_agent_pb2.NLU_MODEL_NOT_SUPPORTED
+        return stream_uuid, stt, intent, intent_slots, log_intent_slots, status
 
-                    else:
-                        stt = ""
-                        status = voice_agent_pb2.VOICE_NOT_RECOGNIZED
-                    
-                    # cleanup the kaldi recognizer
-                    self.stt_model.cleanup_recognizer(recognizer_uuid)
 
-                    # delete the audio file
-                    if not self.store_voice_command:   
-                        delete_file(audio_file)
+    def build_recognize_result(self, stream_uuid, stt, intent, intent_slots, log_intent_slots, status, client_ip, endpoint, action=None):
+        """
+        Build the RecognizeResult response of a voice command and log it.
 
+        Args:
+            stream_uuid (str): The stream ID.
+            stt (str): The recognized text.
+            intent (str): The intent.
+            intent_slots (list): The intent slots.
+            log_intent_slots (list): The intent slots for logging.
+            status (RecognizeStatusType): The status.
+            client_ip (str): The peer address of the client, for logging.
+            endpoint (str): The name of the RPC, for logging.
+            action (RecordAction, optional): The action of the request answered, for logging.
 
+        Returns:
+            RecognizeResult: The response.
+        """
         # Process the request and generate a RecognizeResult
         response = voice_agent_pb2.RecognizeResult(
             command=stt,
@@ -248,53 +872,174 @@ class VoiceAgentServicer(voice_agent_pb2_grpc.VoiceAgentServiceServicer):
             "status": status
         }
         response_json = json.dumps(response_data)
-        self.logger.info(f"[ReqID#{stream_uuid}] Returning {request.action} request response to client {client_ip} from RecognizeVoiceCommand end-point. Response: {response_json}")
+        answered = "response" if action is None else f"{action} request response"
+        self.logger.info(f"[ReqID#{stream_uuid}] Returning {answered} to client {client_ip} from {endpoint} end-point. Response: {response_json}")
 
         return response
     
 
-    def RecognizeTextCommand(self, request, context):
+    @abort_on_rejection
+    @scheduled
+    def S_RecognizeVoiceCommand(self, requests, context):
         """
-        Recognize the text command using the STT model and extract the intent using the NLU model.
+        Recognize the voice command from audio streamed by the client and extract the intent using the NLU model. Each
+        audio chunk is pushed into the recognizer as soon as it arrives, and the NLU model runs once the client closes
+        its side of the stream. Audio is expected to be 16-bit mono PCM.
         """
+        stt = ""
         intent = ""
         intent_slots = []
         log_intent_slots = []
-
-        stream_uuid = generate_unique_uuid(8)
-        text_command = request.text_command
         status = voice_agent_pb2.REC_SUCCESS
+        stream_uuid = generate_unique_uuid(8)
+        stream_state = {"nlu_model": voice_agent_pb2.SNIPS, "truncated": False, "received_bytes": 0}
 
         # Log the unique request ID, client's IP address, and the endpoint
         client_ip = context.peer()
-        self.logger.info(f"[ReqID#{stream_uuid}] Client {client_ip} made a request to RecognizeTextCommand end-point.")
+        self.logger.info(f"[ReqID#{stream_uuid}] Client {client_ip} made a request to S_RecognizeVoiceCommand end-point.")
 
-        if request.nlu_model == voice_agent_pb2.SNIPS:
-            extracted_intent = self.snips_interface.extract_intent(text_command)
-            intent, intent_actions = self.snips_interface.process_intent(extracted_intent)
+        requests = iter(requests)
+        first_request = next(requests, None)
 
-            if not intent or intent == "":
-                status = voice_agent_pb2.INTENT_NOT_RECOGNIZED
-            
-            else:
-                for action, value in intent_actions.items():
-                    intent_slots.append(voice_agent_pb2.IntentSlot(name=action, value=value))
-                    log_intent_slots.append({"name": action, "value": value})
-        
-        elif request.nlu_model == voice_agent_pb2.RASA:
-            extracted_intent = self.rasa_interface.extract_intent(text_command)
-            intent, intent_actions = self.rasa_interface.process_intent(extracted_intent)
+        if first_request is not None:
+            stream_uuid = first_request.stream_id or stream_uuid
+            sample_rate = self.get_stream_sample_rate(first_request.audio_stream.sample_rate)
+            if sample_rate is None:
+                context.abort(grpc.StatusCode.INVALID_ARGUMENT,
+                              self.unsupported_sample_rate(stream_uuid, client_ip, first_request.audio_stream.sample_rate))
+            recognizer_uuid = self.stt_model.setup_recognizer(sample_rate)
+            try:
+                texts = []
+                audio_received = False
+                for chunk in self.iter_stream_audio(first_request, requests, sample_rate, stream_state):
+                    audio_received = True
+                    text = self.decode_stream_chunk(recognizer_uuid, chunk)
+                    if text is not None:
+                        texts.append(text)
+                if audio_received:
+                    stt = self.finish_stream_decoding(recognizer_uuid, texts)
+            finally:
+                # the client may cancel or break the stream at any point, the recognizer still goes back
+                self.stt_model.cleanup_recognizer(recognizer_uuid)
 
-            if not intent or intent == "":
-                status = voice_agent_pb2.INTENT_NOT_RECOGNIZED
+            if stream_state["truncated"]:
+                self.logger.warning(f"[ReqID#{stream_uuid}] Voice command exceeded {self.max_stream_audio_seconds} seconds, remaining audio was ignored.")
+
+        if stt not in ["VOICE_NOT_RECOGNIZED", ""]:
+            intent, intent_slots, log_intent_slots, status = self.process_nlu(stt, stream_state["nlu_model"])
 
-            else:
-                for action, value in intent_actions.items():
-                    intent_slots.append(voice_agent_pb2.IntentSlot(name=action, value=value))
-                    log_intent_slots.append({"name": action, "value": value})
-        
         else:
-            status = voice_agent_pb2.NLU_MODEL_NOT_SUPPORTED
+            stt = ""
+            status = voice_agent_pb2.VOICE_NOT_RECOGNIZED
+
+        return self.build_recognize_result(stream_uuid, stt, intent, intent_slots, log_intent_slots, status,
+                                           client_ip, "S_RecognizeVoiceCommand")
+
+
+    def decode_stream_chunk(self, recognizer_uuid, chunk):
+        """
+        Feed one chunk of a S_RecognizeVoiceCommand stream into its recognizer. A STT slot is only held while the
+        chunk is decoded, not while the stream waits for the client's next chunk, so slow clients don't starve the
+        others.
+
+        Args:
+            recognizer_uuid (str): The recognizer of the stream.
+            chunk (bytes): A chunk of 16-bit PCM audio.
+
+        Returns:
+            str: The text of the utterance segment that ended with the chunk, or None if it did not end one.
+
+        Raises:
+            AdmissionRejected: If the STT stage is overloaded.
+        """
+        with self.admission.slot("stt"):
+            return self.stt_model.accept_chunk(recognizer_uuid, chunk)
+
+
+    def finish_stream_decoding(self, recognizer_uuid, texts):
+        """
+        Flush the recognizer of a S_RecognizeVoiceCommand stream, holding a STT slot like `decode_stream_chunk`.
+
+        Args:
+            recognizer_uuid (str): The recognizer of the stream.
+            texts (list): The texts returned by `decode_stream_chunk`.
+
+        Returns:
+            str: The recognized text of the whole stream.
+
+        Raises:
+            AdmissionRejected: If the STT stage is overloaded.
+        """
+        with self.admission.slot("stt"):
+            return self.stt_model.finish_stream(recognizer_uuid, texts)
+
+
+    def iter_stream_audio(self, first_request, requests, sample_rate, stream_state):
+        """
+        Yield the audio chunks of a S_RecognizeVoiceCommand stream as they arrive.
+
+        Args:
+            first_request (S_RecognizeVoiceControl): The first message of the stream.
+            requests (iterator): The remaining messages of the stream.
+            sample_rate (int): The sample rate of the streamed audio.
+            stream_state (dict): Updated with the NLU model requested by the client and whether audio was truncated.
+
+        Yields:
+            bytes: Chunks of 16-bit PCM audio.
+        """
+        for request in itertools.chain([first_request], requests):
+            yield from self.split_stream_audio(request, sample_rate, stream_state)
+
+
+    def split_stream_audio(self, request, sample_rate, stream_state):
+        """
+        Split the audio of one S_RecognizeVoiceCommand message into the chunks fed to the recognizer.
+
+        Chunks larger than `max_stream_chunk_bytes` are split so a single message can't stall the recognizer, and
+        audio beyond `max_stream_audio_seconds` is dropped so a stream can't grow without bound.
+
+        Args:
+            request (S_RecognizeVoiceControl): A message of the stream.
+            sample_rate (int): The sample rate of the streamed audio.
+            stream_state (dict): Updated with the NLU model requested by the client, the number of audio bytes
+                received and whether audio was truncated.
+
+        Returns:
+            list: Chunks of 16-bit PCM audio, empty if the message carries no audio that is used.
+        """
+        max_audio_bytes = self.max_stream_audio_seconds * sample_rate * 2
+        received_bytes = stream_state["received_bytes"]
+
+        stream_state["nlu_model"] = request.nlu_model
+        audio_chunk = request.audio_stream.audio_chunk
+        if not audio_chunk or stream_state["truncated"]:
+            return []
+
+        if received_bytes + len(audio_chunk) > max_audio_bytes:
+            audio_chunk = audio_chunk[:max_audio_bytes - received_bytes]
+            stream_state["truncated"] = True
+        stream_state["received_bytes"] = received_bytes + len(audio_chunk)
+
+        if len(audio_chunk) <= self.max_stream_chunk_bytes:
+            return [audio_chunk]
+        return [audio_chunk[offset:offset + self.max_stream_chunk_bytes]
+                for offset in range(0, len(audio_chunk), self.max_stream_chunk_bytes)]
+    
+
+    @abort_on_rejection
+    @scheduled
+    def RecognizeTextCommand(self, request, context):
+        """
+        Recognize the text command using the STT model and extract the intent using the NLU model.
+        """
+        stream_uuid = generate_unique_uuid(8)
+        text_command = request.text_command
+
+        # Log the unique request ID, client's IP address, and the endpoint
+        client_ip = context.peer()
+        self.logger.info(f"[ReqID#{stream_uuid}] Client {client_ip} made a request to RecognizeTextCommand end-point.")
+
+        intent, intent_slots, log_intent_slots, status = self.process_nlu(text_command, request.nlu_model)
 
         # Process the request and generate a RecognizeResult
         response = voice_agent_pb2.RecognizeResult(
@@ -319,79 +1064,185 @@ class VoiceAgentServicer(voice_agent_pb2_grpc.VoiceAgentServiceServicer):
         return response
 
 
-    def ExecuteCommand(self, request, context):
+    @abort_on_rejection
+    @scheduled
+    def S_RecognizeTextCommand(self, requests, context):
         """
-        Execute the voice command by sending the intent to Kuksa.
+        Recognize a stream of text commands and extract their intents, for bulk jobs. The commands are recognized in
+        the text worker pool of the scheduler and a RecognizeResult is returned for each of them, in the order of the
+        commands and with a status of its own. Results are sent as they complete, the client may keep sending.
         """
+        stream_uuid = generate_unique_uuid(8)
+
         # Log the unique request ID, client's IP address, and the endpoint
-        request_id = generate_unique_uuid(8)
         client_ip = context.peer()
-        self.logger.info(f"[ReqID#{request_id}] Client {client_ip} made a request to ExecuteCommand end-point.")
+        self.logger.info(f"[ReqID#{stream_uuid}] Client {client_ip} made a request to S_RecognizeTextCommand end-point.")
 
-        intent = request.intent
-        intent_slots = request.intent_slots
-        processed_slots = []
-        for slot in intent_slots:
-            slot_name = slot.name
-            slot_value = slot.value
-            processed_slots.append({"name": slot_name, "value": slot_value})
+        started_at = time.monotonic()
+        status_counts = {}
+        try:
+            results = ordered_map(self.scheduler.text_executor, functools.partial(self.recognize_text, stream_uuid),
+                                  requests, self.scheduler.text_window)
+            for response in results:
+                status_counts[response.status] = status_counts.get(response.status, 0) + 1
+                yield response
+
+        finally:
+            # one line per stream instead of per command, a bulk job sends tens of thousands of them
+            self.log_text_stream_stats(stream_uuid, client_ip, status_counts, time.monotonic() - started_at)
+
+
+    def recognize_text(self, stream_uuid, request):
+        """
+        Recognize one text command of a S_RecognizeTextCommand stream. A failure only fails this command.
+
+        Args:
+            stream_uuid (str): The unique ID of the stream, returned as the stream ID of every command.
+            request (RecognizeTextControl): The text command.
+
+        Returns:
+            RecognizeResult: The result of the command.
+        """
+        text_command = request.text_command
+        if not text_command.strip():
+            return voice_agent_pb2.RecognizeResult(command=text_command, stream_id=stream_uuid,
+                                                   status=voice_agent_pb2.TEXT_NOT_RECOGNIZED)
+
+        try:
+            # the text workers bound how many commands wait, so an overloaded engine slows the stream down instead
+            # of failing its commands
+            intent, intent_slots, _, status = self.process_nlu(text_command, request.nlu_model, wait=True)
+        except Exception as e:
+            self.logger.error(f"[ReqID#{stream_uuid}] Failed to recognize text command '{text_command}': {e}")
+            return voice_agent_pb2.RecognizeResult(command=text_command, stream_id=stream_uuid,
+                                                   status=voice_agent_pb2.REC_ERROR)
+
+        return voice_agent_pb2.RecognizeResult(
+            command=text_command,
+            intent=intent,
+            intent_slots=intent_slots,
+            stream_id=stream_uuid,
+            status=status
+        )
+
+
+    def log_text_stream_stats(self, stream_uuid, client_ip, status_counts, duration):
+        """
+        Log the summary of a S_RecognizeTextCommand stream.
 
+        Args:
+            stream_uuid (str): The unique ID of the stream.
+            client_ip (str): The peer address of the client.
+            status_counts (dict): The number of results returned by RecognizeStatusType.
+            duration (float): How long the stream took, in seconds.
+        """
+        count = sum(status_counts.values())
+        response_data = {
+            "commands": count,
+            "statuses": {voice_agent_pb2.RecognizeStatusType.Name(status): n for status, n in status_counts.items()},
+            "seconds": round(duration, 3),
+            "commands_per_second": round(count / duration, 1) if duration > 0 else 0.0,
+        }
+        self.logger.info(f"[ReqID#{stream_uuid}] Returned {count} results to client {client_ip} from S_RecognizeTextCommand end-point. Stats: {json.dumps(response_data)}")
+
+
+    def execute_intent(self, request_id, intent, processed_slots):
+        """
+        Map an intent to VSS signals and write them to Kuksa.
+
+        Args:
+            request_id (str): The unique ID of the request, used for logging.
+            intent (str): The intent.
+            processed_slots (list): The intent slots as dicts with a 'name' and a 'value'.
+
+        Returns:
+            tuple: The response text (str) and the execution status (ExecuteStatusType).
+
+        Raises:
+            AdmissionRejected: If the Kuksa stage is overloaded.
+        """
         print(intent)
         print(processed_slots)
         execution_list = self.mapper.parse_intent(intent, processed_slots, req_id=request_id)
         exec_response = f"Sorry, I failed to execute command against intent '{intent}'. Maybe try again with more specific instructions."
         exec_status = voice_agent_pb2.EXEC_ERROR
 
-        # Check for kuksa status, and try re-connecting again if status is False 
-        if not self.kuksa_client.get_kuksa_status():
-            self.logger.error(f"[ReqID#{request_id}] Kuksa client found disconnected. Trying to close old instance and re-connecting...")
-            self.kuksa_client.close_kuksa_client()
-            self.kuksa_client.connect_kuksa_client()
-            self.kuksa_client.authorize_kuksa_client()
-
-        for execution_item in execution_list:
-            print(execution_item)
-            action = execution_item["action"]
-            signal = execution_item["signal"]
-
-            if self.kuksa_client.get_kuksa_status():
-                if action == "set" and "value" in execution_item:
-                    value = execution_item["value"]
-                    if self.kuksa_client.send_values(signal, value):
-                        exec_response = f"Yay, I successfully updated the intent '{intent}' to value '{value}'."
-                        exec_status = voice_agent_pb2.EXEC_SUCCESS
-                
-                elif action in ["increase", "decrease"]:
-                    if "value" in execution_item:
+        # the Kuksa writes are capped so a burst of commands can't starve the audio path
+        with self.admission.slot("kuksa"):
+            # Check for kuksa status, and try re-connecting again if status is False 
+            if not self.kuksa_client.get_kuksa_status():
+                self.logger.error(f"[ReqID#{request_id}] Kuksa client found disconnected. Trying to close old instance and re-connecting...")
+                self.kuksa_client.close_kuksa_client()
+                self.kuksa_client.connect_kuksa_client()
+                self.kuksa_client.authorize_kuksa_client()
+
+            for execution_item in execution_list:
+                print(execution_item)
+                action = execution_item["action"]
+                signal = execution_item["signal"]
+
+                if self.kuksa_client.get_kuksa_status():
+                    if action == "set" and "value" in execution_item:
                         value = execution_item["value"]
                         if self.kuksa_client.send_values(signal, value):
                             exec_response = f"Yay, I successfully updated the intent '{intent}' to value '{value}'."
                             exec_status = voice_agent_pb2.EXEC_SUCCESS
-                    
-                    elif "factor" in execution_item:
-                        # incoming values are always str as kuksa expects str during subscribe we need to convert
-                        # the value to int before performing any arithmetic operations and then convert back to str
-                        factor = int(execution_item["factor"]) 
-                        current_value = self.kuksa_client.get_value(signal)
-                        if current_value:
-                            current_value = int(current_value)
-                            if action == "increase":
-                                value = current_value + factor
-                                value = str(value)
-                            elif action == "decrease":
-                                value = current_value - factor
-                                value = str(value)
+                
+                    elif action in ["increase", "decrease"]:
+                        if "value" in execution_item:
+                            value = execution_item["value"]
                             if self.kuksa_client.send_values(signal, value):
                                 exec_response = f"Yay, I successfully updated the intent '{intent}' to value '{value}'."
                                 exec_status = voice_agent_pb2.EXEC_SUCCESS
+                    
+                        elif "factor" in execution_item:
+                            # incoming values are always str as kuksa expects str during subscribe we need to convert
+                            # the value to int before performing any arithmetic operations and then convert back to str
+                            factor = int(execution_item["factor"]) 
+                            current_value = self.kuksa_client.get_value(signal)
+                            if current_value:
+                                current_value = int(current_value)
+                                if action == "increase":
+                                    value = current_value + factor
+                                    value = str(value)
+                                elif action == "decrease":
+                                    value = current_value - factor
+                                    value = str(value)
+                                if self.kuksa_client.send_values(signal, value):
+                                    exec_response = f"Yay, I successfully updated the intent '{intent}' to value '{value}'."
+                                    exec_status = voice_agent_pb2.EXEC_SUCCESS
                         
-                        else:
-                            exec_response = f"Uh oh, there is no value set for intent '{intent}'. Why not try setting a value first?"
-                            exec_status = voice_agent_pb2.KUKSA_CONN_ERROR
+                            else:
+                                exec_response = f"Uh oh, there is no value set for intent '{intent}'. Why not try setting a value first?"
+                                exec_status = voice_agent_pb2.KUKSA_CONN_ERROR
 
-            else:
-                exec_response = "Uh oh, I failed to connect to Kuksa."
-                exec_status = voice_agent_pb2.KUKSA_CONN_ERROR
+                else:
+                    exec_response = "Uh oh, I failed to connect to Kuksa."
+                    exec_status = voice_agent_pb2.KUKSA_CONN_ERROR
+
+        return exec_response, exec_status
+
+
+    @abort_on_rejection
+    @scheduled
+    def ExecuteCommand(self, request, context):
+        """
+        Execute the voice command by sending the intent to Kuksa.
+        """
+        # Log the unique request ID, client's IP address, and the endpoint
+        request_id = generate_unique_uuid(8)
+        client_ip = context.peer()
+        self.logger.info(f"[ReqID#{request_id}] Client {client_ip} made a request to ExecuteCommand end-point.")
+
+        intent = request.intent
+        intent_slots = request.intent_slots
+        processed_slots = []
+        for slot in intent_slots:
+            slot_name = slot.name
+            slot_value = slot.value
+            processed_slots.append({"name": slot_name, "value": slot_value})
+
+        exec_response, exec_status = self.execute_intent(request_id, intent, processed_slots)
 
         response = voice_agent_pb2.ExecuteResult(
             response=exec_response,
@@ -407,3 +1258,152 @@ class VoiceAgentServicer(voice_agent_pb2_grpc.VoiceAgentServiceServicer):
         self.logger.info(f"[ReqID#{request_id}] Returning response to client {client_ip} from ExecuteCommand end-point. Response: {response_json}")
 
         return response
+
+
+    def with_stream_id(self, request, stream_uuid):
+        """
+        Fill in the stream ID of a STOP request that has none with the ID of the recording started on the same
+        stream, so a client of a bidirectional stream doesn't need to send it back.
+
+        Args:
+            request (RecognizeVoiceControl): The request.
+            stream_uuid (str): The ID of the recording started on the stream, or None.
+
+        Returns:
+            RecognizeVoiceControl: The request, or a copy of it with the stream ID.
+        """
+        if request.action != voice_agent_pb2.STOP or request.stream_id or stream_uuid is None:
+            return request
+        stop_request = voice_agent_pb2.RecognizeVoiceControl()
+        stop_request.CopyFrom(request)
+        stop_request.stream_id = stream_uuid
+        return stop_request
+
+
+    def build_stage_result(self, stage, recognition, client_ip, endpoint, execution=None):
+        """
+        Build the RecognizeExecuteResult response of a pipeline stage and log it.
+
+        Args:
+            stage (PipelineStage): The stage that completed.
+            recognition (tuple): The stream ID, the recognized text, the intent, the intent slots, the intent slots
+                for logging and the recognition status, as returned by `recognize_voice_request`.
+            client_ip (str): The peer address of the client, for logging.
+            endpoint (str): The name of the RPC, for logging.
+            execution (tuple, optional): The response text and the execution status, as returned by
+                `execute_intent`, for the EXECUTION stage.
+
+        Returns:
+            RecognizeExecuteResult: The response.
+        """
+        stream_uuid, stt, intent, intent_slots, log_intent_slots, status = recognition
+        response = voice_agent_pb2.RecognizeExecuteResult(
+            stage=stage,
+            recognize_result=voice_agent_pb2.RecognizeResult(
+                command=stt,
+                intent=intent,
+                intent_slots=intent_slots,
+                stream_id=stream_uuid,
+                status=status
+            )
+        )
+
+        # Convert the response object to a JSON string and log it
+        response_data = {
+            "command": stt,
+            "intent": intent,
+            "intent_slots": log_intent_slots,
+            "stream_id": stream_uuid,
+            "status": status
+        }
+        if execution is not None:
+            exec_response, exec_status = execution
+            response.execute_result.response = exec_response
+            response.execute_result.status = exec_status
+            response_data["response"] = exec_response
+            response_data["exec_status"] = exec_status
+        response_json = json.dumps(response_data)
+        stage_name = voice_agent_pb2.PipelineStage.Name(stage)
+        self.logger.info(f"[ReqID#{stream_uuid}] Returning {stage_name} stage to client {client_ip} from {endpoint} end-point. Response: {response_json}")
+
+        return response
+
+
+    def interpret_and_execute(self, stream_uuid, command, nlu_model, client_ip, endpoint):
+        """
+        Extract the intent of a command and execute it, yielding the result of each stage. The command is only
+        executed if its intent was recognized.
+
+        Args:
+            stream_uuid (str): The unique ID of the request.
+            command (str): The text command.
+            nlu_model (NLUModel): The NLU model to use.
+            client_ip (str): The peer address of the client, for logging.
+            endpoint (str): The name of the RPC, for logging.
+
+        Yields:
+            RecognizeExecuteResult: The INTENT stage, then the EXECUTION stage.
+
+        Raises:
+            AdmissionRejected: If the NLU or the Kuksa stage is overloaded.
+        """
+        intent, intent_slots, log_intent_slots, status = self.process_nlu(command, nlu_model)
+        recognition = (stream_uuid, command, intent, intent_slots, log_intent_slots, status)
+        yield self.build_stage_result(voice_agent_pb2.INTENT, recognition, client_ip, endpoint)
+
+        if status == voice_agent_pb2.REC_SUCCESS:
+            execution = self.execute_intent(stream_uuid, intent, log_intent_slots)
+            yield self.build_stage_result(voice_agent_pb2.EXECUTION, recognition, client_ip, endpoint, execution)
+
+
+    @abort_on_rejection
+    @scheduled
+    def RecognizeVoiceAndExecute(self, requests, context):
+        """
+        Record a voice command on server side, recognize it, extract its intent and execute it in a single call. The
+        requests are the same as for `RecognizeVoiceCommand`, a STOP request may leave out the stream ID. The result
+        of each stage is sent as soon as it completes: RECORDING once a manual recording started, TRANSCRIPT, INTENT,
+        and EXECUTION if the intent was recognized. The stream ends after the last stage.
+        """
+        client_ip = context.peer()
+        started_uuid = None
+
+        try:
+            for request in requests:
+                request = self.with_stream_id(request, started_uuid)
+                recognition = self.recognize_voice_request(request, client_ip, context.add_callback, transcribe_only=True)
+                if recognition is None:
+                    continue
+
+                stream_uuid, stt, _, _, _, status = recognition
+                if status == voice_agent_pb2.REC_PROCESSING:
+                    started_uuid = stream_uuid
+                    yield self.build_stage_result(voice_agent_pb2.RECORDING, recognition, client_ip, "RecognizeVoiceAndExecute")
+                    continue
+
+                yield self.build_stage_result(voice_agent_pb2.TRANSCRIPT, recognition, client_ip, "RecognizeVoiceAndExecute")
+                if status == voice_agent_pb2.REC_SUCCESS:
+                    yield from self.interpret_and_execute(stream_uuid, stt, request.nlu_model, client_ip, "RecognizeVoiceAndExecute")
+                return
+
+        finally:
+            # the recording can't be stopped anymore once its stream is gone
+            if started_uuid is not None:
+                self.abandon_voice_recording(started_uuid)
+
+
+    @abort_on_rejection
+    @scheduled
+    def RecognizeTextAndExecute(self, request, context):
+        """
+        Extract the intent of a text command and execute it in a single call. The INTENT stage is sent once the intent
+        is extracted, followed by the EXECUTION stage if the intent was recognized.
+        """
+        stream_uuid = generate_unique_uuid(8)
+
+        # Log the unique request ID, client's IP address, and the endpoint
+        client_ip = context.peer()
+        self.logger.info(f"[ReqID#{stream_uuid}] Client {client_ip} made a request to RecognizeTextAndExecute end-point.")
+
+        yield from self.interpret_and_execute(stream_uuid, request.text_command, request.nlu_model, client_ip,
+                                              "RecognizeTextAndExecute")
@@ -0,0 +1,241 @@
+# SPDX-License-Identifier: Apache-2.0
+#
+# Copyright (c) 2023 Malik Talha
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import time
+import threading
+from contextlib import contextmanager
+from agl_service_voiceagent.utils.config import get_config_value
+
+
+class AdmissionRejected(Exception):
+    """
+    Raised when a request is not admitted to a stage, because its wait queue is full or the wait timed out.
+    """
+
+    def __init__(self, stage, reason):
+        """
+        Initialize the AdmissionRejected exception.
+
+        Args:
+            stage (str): The name of the stage.
+            reason (str): 'queue_full' or 'timeout'.
+        """
+        super().__init__(f"The {stage} stage is overloaded ({reason}), try again later.")
+        self.stage = stage
+        self.reason = reason
+
+
+class AdmissionStage:
+    """
+    AdmissionStage caps how many requests run a CPU-heavy stage at once. Requests over the cap wait in a bounded
+    queue for a limited time, a request that finds the queue full is rejected right away.
+    """
+
+    def __init__(self, name, max_concurrent=0, max_queue=0, queue_timeout=2.0):
+        """
+        Initialize the AdmissionStage instance.
+
+        Args:
+            name (str): The name of the stage, used in errors and logs.
+            max_concurrent (int, optional): How many requests may run the stage at once, 0 for no limit (default
+                is 0).
+            max_queue (int, optional): How many requests may wait for the stage (default is 0).
+            queue_timeout (float, optional): Seconds a request waits before it is rejected (default is 2.0).
+        """
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self.waiting = 0
+        self.cond = threading.Condition()
+        self.stats = {
+            "admitted": 0,
+            "queued": 0,
+            "rejected_queue_full": 0,
+            "rejected_timeout": 0,
+            "peak_active": 0,
+            "peak_waiting": 0,
+            "wait_ms_total": 0.0,
+            "wait_ms_max": 0.0,
+        }
+
+
+    def acquire(self, wait=False):
+        """
+        Wait for a slot in the stage. Every successful call must be matched by a call to `release`.
+
+        Args:
+            wait (bool, optional): If True, wait for a slot however long it takes, without counting against the
+                wait queue. For callers that bound their own concurrency, e.g. a worker pool, and would rather slow
+                down than fail (default is False).
+
+        Raises:
+            AdmissionRejected: If the wait queue is full or the wait timed out, never if `wait` is True.
+        """
+        with self.cond:
+            if not self.max_concurrent or self.active < self.max_concurrent:
+                self.admit()
+                return
+
+            if not wait and self.waiting >= self.max_queue:
+                self.stats["rejected_queue_full"] += 1
+                raise AdmissionRejected(self.name, "queue_full")
+
+            started_at = time.monotonic()
+            deadline = started_at + self.queue_timeout
+            if not wait:
+                self.waiting += 1
+            self.stats["queued"] += 1
+            self.stats["peak_waiting"] = max(self.stats["peak_waiting"], self.waiting)
+            try:
+                while self.active >= self.max_concurrent:
+                    if wait:
+                        self.cond.wait()
+                        continue
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.stats["rejected_timeout"] += 1
+                        raise AdmissionRejected(self.name, "timeout")
+                    self.cond.wait(remaining)
+            finally:
+                # requests that timed out count as well, they show how long the queue would have needed
+                if not wait:
+                    self.waiting -= 1
+                wait_ms = (time.monotonic() - started_at) * 1000
+                self.stats["wait_ms_total"] += wait_ms
+                self.stats["wait_ms_max"] = max(self.stats["wait_ms_max"], wait_ms)
+
+            self.admit()
+
+
+    def admit(self):
+        """
+        Take a slot in the stage. Must be called with the condition held.
+        """
+        self.active += 1
+        self.stats["admitted"] += 1
+        self.stats["peak_active"] = max(self.stats["peak_active"], self.active)
+
+
+    def release(self):
+        """
+        Give back a slot taken by `acquire` and wake up the longest waiting request.
+        """
+        with self.cond:
+            self.active -= 1
+            self.cond.notify()
+
+
+    @contextmanager
+    def slot(self, wait=False):
+        """
+        Hold a slot in the stage for the duration of a `with` block.
+
+        Args:
+            wait (bool, optional): Wait for the slot however long it takes, see `acquire` (default is False).
+
+        Raises:
+            AdmissionRejected: If the wait queue is full or the wait timed out, never if `wait` is True.
+        """
+        self.acquire(wait)
+        try:
+            yield
+        finally:
+            self.release()
+
+
+    def get_stats(self):
+        """
+        Get the stage statistics.
+
+        Returns:
+            dict: The configured limits, the requests running and waiting now and at most, the admitted, queued and
+                rejected requests and the total, mean and maximum time queued requests spent waiting in milliseconds.
+        """
+        with self.cond:
+            stats = dict(self.stats)
+            stats["active"] = self.active
+            stats["waiting"] = self.waiting
+        stats["max_concurrent"] = self.max_concurrent
+        stats["max_queue"] = self.max_queue
+        stats["wait_ms_mean"] = stats["wait_ms_total"] / stats["queued"] if stats["queued"] else 0.0
+        return stats
+
+
+class AdmissionController:
+    """
+    Admission Controller
+
+    Process-wide concurrency limits for the CPU-heavy stages of a request: speech to text, the Snips and RASA intent
+    engines and the Kuksa writes. Without them a burst of requests slows every request down together, including the
+    always-on wake word detection, instead of shedding the excess load.
+    """
+
+    STAGES = ("stt", "snips", "rasa", "kuksa")
+
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls):
+        """
+        Get the unique instance of the class.
+
+        Returns:
+            AdmissionController: The instance of the class.
+        """
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = super(AdmissionController, cls).__new__(cls)
+                cls._instance.init_controller()
+        return cls._instance
+
+
+    def init_controller(self):
+        """
+        Create the stages from the [Admission] section of the config.
+        """
+        max_queue = int(get_config_value('MAX_QUEUE', 'Admission', fallback='16'))
+        queue_timeout = int(get_config_value('QUEUE_TIMEOUT_MS', 'Admission', fallback='2000')) / 1000
+        self.stages = {}
+        for name in self.STAGES:
+            max_concurrent = int(get_config_value(f'{name.upper()}_CONCURRENCY', 'Admission', fallback='0'))
+            self.stages[name] = AdmissionStage(name, max_concurrent, max_queue, queue_timeout)
+
+
+    def slot(self, stage, wait=False):
+        """
+        Hold a slot in a stage for the duration of a `with` block.
+
+        Args:
+            stage (str): The name of the stage.
+            wait (bool, optional): Wait for the slot however long it takes, see `AdmissionStage.acquire` (default
+                is False).
+
+        Raises:
+            AdmissionRejected: If the wait queue of the stage is full or the wait timed out, never if `wait` is True.
+        """
+        return self.stages[stage].slot(wait)
+
+
+    def get_stats(self):
+        """
+        Get the statistics of all stages.
+
+        Returns:
+            dict: The stage statistics by stage name.
+        """
+        return {name: stage.get_stats() for name, stage in self.stages.items()}
@@ -0,0 +1,238 @@
+# SPDX-License-Identifier: Apache-2.0
+#
+# Copyright (c) 2023 Malik Talha
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import gi
+import time
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+gi.require_version('Gst', '1.0')
+from gi.repository import Gst, GLib
+from agl_service_voiceagent.utils.common import add_trailing_slash, delete_file
+from agl_service_voiceagent.utils.pipeline_manager import PipelineManager
+
+Gst.init(None)
+GLib.threads_init()
+
+
+class AudioArchiver:
+    """
+    AudioArchiver keeps stored voice commands in a compressed archive. Recordings are encoded, copied into the
+    archive directory and released from scratch storage by a pool of background writers, so storing voice commands
+    adds no file I/O to the request threads. The archive is rotated by size and age, oldest recordings first.
+    """
+
+    # archive format -> (file extension, GStreamer encoder description, None to copy the WAV file as is)
+    FORMATS = {
+        "wav": (".wav", None),
+        "flac": (".flac", "flacenc"),
+        "opus": (".opus", "opusenc ! oggmux"),
+    }
+
+    def __init__(self, audio_store, archive_dir, audio_format="flac", max_size_mb=0, max_age_days=0, workers=1,
+                 encode_timeout=30):
+        """
+        Initialize the AudioArchiver instance.
+
+        Args:
+            audio_store (AudioStore): The store the recordings are allocated from, they are released once archived.
+            archive_dir (str): The directory of the archive.
+            audio_format (str, optional): 'wav', 'flac' or 'opus' (default is 'flac').
+            max_size_mb (float, optional): The size the archive is rotated down to, 0 for no limit (default is 0).
+            max_age_days (float, optional): The age after which archived recordings are deleted, 0 for no limit
+                (default is 0).
+            workers (int, optional): The number of background writer threads (default is 1).
+            encode_timeout (float, optional): Seconds after which encoding a recording is given up (default is 30).
+
+        Raises:
+            ValueError: If the audio format is unknown.
+        """
+        if audio_format not in self.FORMATS:
+            raise ValueError(f"Unknown archive format '{audio_format}', expected one of {', '.join(self.FORMATS)}.")
+
+        self.audio_store = audio_store
+        self.archive_dir = add_trailing_slash(archive_dir)
+        self.audio_format = audio_format
+        self.extension, self.encoder = self.FORMATS[audio_format]
+        self.max_bytes = int(max_size_mb * 1024 * 1024)
+        self.max_age = max_age_days * 24 * 60 * 60
+        self.encode_timeout = encode_timeout
+        self.pipeline_manager = PipelineManager()
+        self.executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="audio-archiver")
+        self.lock = threading.Lock()
+        self.stats = {
+            "queued": 0,
+            "archived": 0,
+            "failed": 0,
+            "released": 0,
+            "bytes_archived": 0,
+            "rotated": 0,
+        }
+
+
+    def archive(self, audio_file):
+        """
+        Queue a recording for archival. The recording is released from the audio store once it is archived, or if
+        archiving failed.
+
+        Args:
+            audio_file (str): A path allocated from the audio store.
+
+        Returns:
+            concurrent.futures.Future: Resolves to the path of the archived recording, or None if archiving failed.
+        """
+        with self.lock:
+            self.stats["queued"] += 1
+        return self.executor.submit(self.archive_file, audio_file)
+
+
+    def release(self, audio_file):
+        """
+        Queue a recording that is not archived to be released from the audio store.
+
+        Args:
+            audio_file (str): A path allocated from the audio store.
+
+        Returns:
+            concurrent.futures.Future: Resolves once the recording is released.
+        """
+        return self.executor.submit(self.release_file, audio_file)
+
+
+    def archive_file(self, audio_file):
+        """
+        Encode a recording into the archive, release it and rotate the archive. Runs in a writer thread.
+
+        Args:
+            audio_file (str): A path allocated from the audio store.
+
+        Returns:
+            str: The path of the archived recording, or None if archiving failed.
+        """
+        archive_file = f"{self.archive_dir}{self.audio_store.make_name(self.extension)}"
+        try:
+            if self.encoder is None:
+                shutil.copyfile(audio_file, archive_file)
+            elif not self.encode(audio_file, archive_file):
+                raise RuntimeError(f"{self.audio_format} encoding failed")
+            size = os.path.getsize(archive_file)
+
+        except Exception as e:
+            print(f"Failed to archive '{audio_file}': {e}")
+            with self.lock:
+                self.stats["failed"] += 1
+            if os.path.exists(archive_file):
+                delete_file(archive_file)
+            return None
+
+        finally:
+            self.release_file(audio_file)
+
+        with self.lock:
+            self.stats["archived"] += 1
+            self.stats["bytes_archived"] += size
+        self.rotate()
+        return archive_file
+
+
+    def encode(self, audio_file, archive_file):
+        """
+        Encode a WAV recording with a GStreamer pipeline and wait until it is written.
+
+        Args:
+            audio_file (str): The path of the WAV recording.
+            archive_file (str): The path of the encoded file.
+
+        Returns:
+            bool: True if the file was encoded, False on a pipeline error or timeout.
+        """
+        pipeline = Gst.parse_launch(
+            f'filesrc location="{audio_file}" ! wavparse ! audioconvert ! {self.encoder} ! filesink location="{archive_file}"')
+        errors = []
+
+        def on_message(bus, message):
+            if message.type == Gst.MessageType.ERROR:
+                err, _ = message.parse_error()
+                errors.append(err.message)
+
+        pipeline_id = self.pipeline_manager.register(pipeline, "audio_archiver", on_message)
+        try:
+            self.pipeline_manager.start(pipeline_id)
+            # the pipeline ends by itself once the whole file is read, an error also sets the event
+            drained = self.pipeline_manager.get_record(pipeline_id)["eos_event"].wait(self.encode_timeout)
+        finally:
+            self.pipeline_manager.teardown(pipeline_id)
+
+        if errors:
+            print(f"Failed to encode '{audio_file}': {errors[0]}")
+        return drained and not errors
+
+
+    def release_file(self, audio_file):
+        """
+        Release a recording from the audio store. Runs in a writer thread.
+
+        Args:
+            audio_file (str): A path allocated from the audio store.
+        """
+        self.audio_store.release(audio_file)
+        with self.lock:
+            self.stats["released"] += 1
+
+
+    def rotate(self):
+        """
+        Delete archived recordings older than the maximum age, then the oldest ones until the archive fits into its
+        maximum size.
+        """
+        if not self.max_bytes and not self.max_age:
+            return
+
+        extensions = tuple(extension for extension, _ in self.FORMATS.values())
+        # only one writer rotates at a time, so files are not deleted twice
+        with self.lock:
+            files = []
+            for entry in os.scandir(self.archive_dir):
+                if entry.is_file() and entry.name.endswith(extensions):
+                    stat = entry.stat()
+                    files.append((stat.st_mtime, stat.st_size, entry.path))
+            files.sort()
+
+            now = time.time()
+            total = sum(size for _, size, _ in files)
+            for mtime, size, path in files:
+                expired = self.max_age and now - mtime > self.max_age
+                oversized = self.max_bytes and total > self.max_bytes
+                if not expired and not oversized:
+                    break
+                delete_file(path)
+                total -= size
+                self.stats["rotated"] += 1
+
+
+    def get_stats(self):
+        """
+        Get the archive counters.
+
+        Returns:
+            dict: The archive format along with the queued, archived, failed, released and rotated recordings and the
+                number of bytes archived.
+        """
+        with self.lock:
+            stats = dict(self.stats)
+            stats["format"] = self.audio_format
+            return stats
@@ -16,8 +16,13 @@
 
 import gi
 import time
+import wave
+import threading
 gi.require_version('Gst', '1.0')
 from gi.repository import Gst, GLib
+from agl_service_voiceagent.utils.buffer_map import map_buffer
+from agl_service_voiceagent.utils.pipeline_manager import PipelineManager
+from agl_service_voiceagent.utils.pipeline_pool import PipelinePool
 
 Gst.init(None)
 GLib.threads_init()
@@ -27,97 +32,334 @@ class AudioRecorder:
     AudioRecorder is a class for recording audio using GStreamer in various modes.
     """
 
-    def __init__(self, stt_model, audio_files_basedir, channels=1, sample_rate=16000, bits_per_sample=16):
+    def __init__(self, stt_model, audio_store, channels=1, sample_rate=16000, bits_per_sample=16, capture_mode="stream", store_audio=False,
+                 audio_source=None):
         """
         Initialize the AudioRecorder instance with the provided parameters.
 
         Args:
-            stt_model (str): The speech-to-text model to use for voice input recognition.
-            audio_files_basedir (str): The base directory for saving audio files.
+            stt_model (STTModel): The speech-to-text model to use for voice input recognition.
+            audio_store (AudioStore): Where the audio files are recorded to.
             channels (int, optional): The number of audio channels (default is 1).
             sample_rate (int, optional): The audio sample rate in Hz (default is 16000).
             bits_per_sample (int, optional): The number of bits per sample (default is 16).
+            capture_mode (str, optional): 'stream' to decode audio while it is being recorded, or 'file' to
+                only record to a WAV file that is decoded afterwards (default is 'stream').
+            store_audio (bool, optional): In 'stream' mode, also write the recording to a WAV file (default is False).
+            audio_source (SharedAudioSource, optional): A shared capture pipeline to subscribe to instead of building
+                a pipeline for this recording.
         """
-        self.loop = GLib.MainLoop()
         self.mode = None
+        self.capture_mode = capture_mode
+        self.store_audio = store_audio or capture_mode == "file"
         self.pipeline = None
-        self.bus = None
-        self.audio_files_basedir = audio_files_basedir
+        self.pipeline_id = None
+        self.pipeline_manager = PipelineManager()
+        self.pipeline_pool = PipelinePool()
+        self.audio_source = audio_source
+        self.subscriptions = {}  # branch name -> (subscription, consumer thread)
+        self.subscription_stats = {}
+        self.queue_monitors = {}
+        self.audio_file_name = None
+        self.recognizer_uuid = None
+        self.recognized_segments = []
+        self.audio_received = False
+        self.eos_timeout = 2  # seconds to wait for the pipeline to drain after EOS
+        self.audio_store = audio_store
         self.sample_rate = sample_rate
         self.channels = channels
         self.bits_per_sample = bits_per_sample
         self.frame_size = int(self.sample_rate * 0.02)
         self.audio_model = stt_model
-        self.buffer_duration = 1  # Buffer audio for atleast 1 second
-        self.audio_buffer = bytearray()
-        self.energy_threshold = 50000  # Adjust this threshold as needed
-        self.silence_frames_threshold = 10
-        self.frames_above_threshold = 0
+        self.vad = None
+        self.max_duration = None
+        self.no_speech_timeout = None
+        self.speech_detected = False
+        self.endpoint_reason = None
+        self.endpoint_event = threading.Event()
+        self.recording_started_at = None
     
 
     def create_pipeline(self):
         """
         Create and configure the GStreamer audio recording pipeline.
 
+        In 'stream' mode the audio is pushed from an appsink straight into a recognizer leased from the STT
+        model while the user is still talking. The WAV file branch is only added when the audio has to be
+        stored, or in 'file' mode. With a shared audio source no pipeline is built at all, the recording only
+        subscribes to the source once it is started.
+
         Returns:
-            str: The name of the audio file being recorded.
+            str: The name of the audio file being recorded, or None if no file is recorded.
         """
+        if self.audio_source is not None:
+            return self.prepare_subscription()
+
         print("Creating pipeline for audio recording in {} mode...".format(self.mode))
-        self.pipeline = Gst.Pipeline()
-        autoaudiosrc = Gst.ElementFactory.make("autoaudiosrc", None)
-        queue = Gst.ElementFactory.make("queue", None)
-        audioconvert = Gst.ElementFactory.make("audioconvert", None)
-        wavenc = Gst.ElementFactory.make("wavenc", None)
-
-        capsfilter = Gst.ElementFactory.make("capsfilter", None)
-        caps = Gst.Caps.new_empty_simple("audio/x-raw")
-        caps.set_value("format", "S16LE")
-        caps.set_value("rate", self.sample_rate)
-        caps.set_value("channels", self.channels)
-        capsfilter.set_property("caps", caps)
-
-        self.pipeline.add(autoaudiosrc)
-        self.pipeline.add(queue)
-        self.pipeline.add(audioconvert)
-        self.pipeline.add(wavenc)
-        self.pipeline.add(capsfilter)
-        
-        autoaudiosrc.link(queue)
-        queue.link(audioconvert)
-        audioconvert.link(capsfilter)
-
-        audio_file_name = f"{self.audio_files_basedir}{int(time.time())}.wav"
-
-        filesink = Gst.ElementFactory.make("filesink", None)
-        filesink.set_property("location", audio_file_name)
-        self.pipeline.add(filesink)
-        capsfilter.link(wavenc)
-        wavenc.link(filesink)
-
-        self.bus = self.pipeline.get_bus()
-        self.bus.add_signal_watch()
-        self.bus.connect("message", self.on_bus_message)
+        # a pre-built pipeline parked by the pipeline pool is leased if available, so START only has to set it PLAYING
+        with_appsink = self.capture_mode == "stream"
+        layout = self.pipeline_pool.get_layout(self.channels, self.sample_rate, with_appsink, self.store_audio)
+        warm_pipeline = self.pipeline_pool.acquire(layout, "audio_recorder", self.on_bus_message)
+        self.pipeline = warm_pipeline.pipeline
+        self.pipeline_id = warm_pipeline.pipeline_id
+        self.queue_monitors = warm_pipeline.queue_monitors
+
+        if with_appsink:
+            self.recognizer_uuid = self.audio_model.setup_recognizer()
+            self.recognized_segments = []
+            self.audio_received = False
+            warm_pipeline.sample_handler = self.on_new_buffer
+
+        audio_file_name = None
+        if self.store_audio:
+            audio_file_name = self.audio_store.allocate()
+            warm_pipeline.filesink.set_property("location", audio_file_name)
 
         return audio_file_name
 
 
-    def start_recording(self):
+    def prepare_subscription(self):
+        """
+        Prepare a recording fed by the shared audio source: lease a recognizer and pick the name of the audio file.
+
+        Returns:
+            str: The name of the audio file being recorded, or None if no file is recorded.
+        """
+        if self.capture_mode == "stream":
+            self.recognizer_uuid = self.audio_model.setup_recognizer(self.sample_rate)
+            self.recognized_segments = []
+            self.audio_received = False
+
+        self.audio_file_name = None
+        if self.store_audio:
+            self.audio_file_name = self.audio_store.allocate()
+        return self.audio_file_name
+
+
+    def start_subscription(self, name, consume, start_position=None, lossless=False):
+        """
+        Subscribe to the shared audio source and consume the subscription on a thread of its own.
+
+        Args:
+            name (str): The name of the branch the subscription feeds, used in the queue stats.
+            consume (callable): Called with the subscription on the consumer thread.
+            start_position (int, optional): The absolute stream position to start from, see
+                `SharedAudioSource.subscribe`.
+            lossless (bool, optional): If True, the subscription never drops audio (default is False).
+        """
+        subscription = self.audio_source.subscribe(start_position, lossless)
+        thread = threading.Thread(target=consume, args=(subscription,))
+        self.subscriptions[name] = (subscription, thread)
+        thread.start()
+
+
+    def consume_subscription(self, subscription):
+        """
+        Read audio from the shared audio source until the subscription is closed and drained, feeding it into the
+        recognizer.
+
+        Args:
+            subscription (AudioSubscription): The subscription of the recognizer.
+        """
+        for data in subscription:
+            self.process_audio(data)
+
+
+    def write_subscription(self, subscription):
+        """
+        Read audio from the shared audio source until the subscription is closed and drained, writing it to the audio
+        file.
+
+        Args:
+            subscription (AudioSubscription): The lossless subscription of the audio file.
+        """
+        with wave.open(self.audio_file_name, "wb") as wav_file:
+            wav_file.setnchannels(self.channels)
+            wav_file.setsampwidth(self.bits_per_sample // 8)
+            wav_file.setframerate(self.sample_rate)
+            for data in subscription:
+                wav_file.writeframes(data)
+
+
+    def process_audio(self, data):
+        """
+        Feed a chunk of recorded audio into the recognizer, and into the endpoint detector in 'auto' mode.
+
+        Args:
+            data (bytes-like): The audio chunk, it is not kept after the call.
+        """
+        if data:
+            self.audio_received = True
+            segment_final = self.audio_model.init_recognition(self.recognizer_uuid, data)
+            if segment_final:
+                self.recognized_segments.append(self.audio_model.recognize(self.recognizer_uuid)["text"])
+            if self.vad is not None:
+                self.detect_endpoint(data, segment_final)
+
+
+    def set_endpointing(self, vad, max_duration=10, no_speech_timeout=5):
         """
-        Start recording audio using the GStreamer pipeline.
+        Enable end of utterance detection for the 'auto' mode. Requires the 'stream' capture mode, since the
+        audio has to be analyzed while it is being recorded.
+
+        Args:
+            vad (EnergyVAD): The voice activity detector used to find the end of speech.
+            max_duration (float, optional): Seconds after which recording stops even if the user keeps
+                talking (default is 10).
+            no_speech_timeout (float, optional): Seconds after which recording stops if no speech was heard
+                at all (default is 5).
         """
-        self.pipeline.set_state(Gst.State.PLAYING)
+        self.vad = vad
+        self.max_duration = max_duration
+        self.no_speech_timeout = no_speech_timeout
+
+
+    def detect_endpoint(self, data, segment_final):
+        """
+        Check whether the user finished speaking. The end of an utterance is detected either when the voice
+        activity detector reports the end of speech, or when Vosk finalized a segment with text while no
+        speech is going on.
+
+        Args:
+            data (bytes): The audio chunk.
+            segment_final (bool): True if the recognizer finalized a segment with this chunk.
+        """
+        _, speech_ended = self.vad.process(data)
+        if self.vad.speech_active:
+            self.speech_detected = True
+
+        if not self.speech_detected:
+            return
+
+        if speech_ended or (segment_final and not self.vad.speech_active and self.recognized_segments[-1]):
+            self.endpoint_reason = "endpoint"
+            self.endpoint_event.set()
+
+
+    def wait_for_endpoint(self):
+        """
+        Block until the end of the utterance is detected, the maximum duration is reached or no speech was
+        heard within the no speech timeout.
+
+        Returns:
+            str: Why recording ended: 'endpoint', 'max_duration', 'no_speech' or 'cancelled'.
+        """
+        while not self.endpoint_event.wait(0.05):
+            elapsed = time.monotonic() - self.recording_started_at
+            if elapsed >= self.max_duration:
+                return "max_duration"
+            if not self.speech_detected and elapsed >= self.no_speech_timeout:
+                return "no_speech"
+        return self.endpoint_reason
+
+
+    def cancel(self):
+        """
+        Stop waiting for the end of the utterance, e.g. because the client went away.
+        """
+        if not self.endpoint_event.is_set():
+            self.endpoint_reason = "cancelled"
+            self.endpoint_event.set()
+
+
+    def on_new_buffer(self, appsink, data) -> Gst.FlowReturn:
+        """
+        Callback function to feed new audio buffers from the GStreamer appsink into the recognizer.
+
+        Args:
+            appsink (Gst.AppSink): The GStreamer appsink.
+            data (object): User data (not used).
+
+        Returns:
+            Gst.FlowReturn: Indicates the status of buffer processing.
+        """
+        sample = appsink.emit("pull-sample")
+        with map_buffer(sample.get_buffer()) as data:
+            self.process_audio(data)
+
+        return Gst.FlowReturn.OK
+
+
+    def start_recording(self, start_position=None):
+        """
+        Start recording audio using the GStreamer pipeline, or by subscribing to the shared audio source.
+
+        Args:
+            start_position (int, optional): With a shared audio source, the absolute stream position to start the
+                recording from, audio captured since then is replayed from the source history.
+        """
+        self.recording_started_at = time.monotonic()
+        if self.audio_source is not None:
+            # the file has a subscription of its own that never drops audio, so a recognizer that falls behind and
+            # drops the oldest audio from its subscription can't cut holes into the recording
+            if self.audio_file_name:
+                self.start_subscription("file", self.write_subscription, start_position, lossless=True)
+            if self.capture_mode == "stream":
+                self.start_subscription("stream", self.consume_subscription, start_position)
+        else:
+            self.pipeline_manager.start(self.pipeline_id)
         print("Recording Voice Input...")
 
 
     def stop_recording(self):
         """
-        Stop audio recording and clean up the GStreamer pipeline.
+        Stop audio recording, wait for the pipeline to drain and clean it up.
         """
         print("Stopping recording...")
-        # self.cleanup_pipeline()
-        self.pipeline.send_event(Gst.Event.new_eos())
+        if self.subscriptions:
+            # the shared capture keeps running, only our subscriptions end once the queued audio is consumed
+            for subscription, _ in self.subscriptions.values():
+                subscription.close()
+            for name, (subscription, thread) in self.subscriptions.items():
+                thread.join()
+                self.subscription_stats[name] = subscription.get_stats()
+            self.subscriptions = {}
+        elif self.pipeline is not None:
+            # wait for every sink to receive the EOS so the recognizer and the WAV file have seen all audio
+            if not self.pipeline_manager.stop(self.pipeline_id, self.eos_timeout):
+                print(f"Pipeline did not drain within {self.eos_timeout} seconds.")
+            self.cleanup_pipeline()
         print("Recording finished!")
 
+
+    def get_queue_stats(self):
+        """
+        Get how much audio waited for the recognizer and how much was dropped because it fell behind.
+
+        Returns:
+            dict: The statistics of the pipeline queues, or of the subscriptions to the shared audio source, by branch
+                name.
+        """
+        if self.audio_source is not None:
+            subscriptions = self.subscriptions
+            if subscriptions:
+                return {name: subscription.get_stats() for name, (subscription, _) in subscriptions.items()}
+            return dict(self.subscription_stats)
+        return {name: monitor.get_stats() for name, monitor in self.queue_monitors.items()}
+
+
+    def finish_recognition(self):
+        """
+        Flush the recognizer after recording has stopped and return it to the STT model.
+
+        Returns:
+            str: The recognized text or error messages.
+        """
+        if self.recognizer_uuid is None:
+            return "VOICE_NOT_RECOGNIZED"
+
+        if self.audio_received:
+            self.recognized_segments.append(self.audio_model.recognize(self.recognizer_uuid, final=True)["text"])
+            result = " ".join(text for text in self.recognized_segments if text)
+        else:
+            print("Voice not recognized. Please speak again...")
+            result = "VOICE_NOT_RECOGNIZED"
+
+        self.audio_model.cleanup_recognizer(self.recognizer_uuid)
+        self.recognizer_uuid = None
+        self.recognized_segments = []
+        return result
+
     
     def set_pipeline_mode(self, mode):
         """
@@ -157,29 +399,15 @@ class AudioRecorder:
                 old_state, new_state, pending_state = message.parse_state_changed()
                 print(("Pipeline state changed from %s to %s." %
                        (old_state.value_nick, new_state.value_nick)))
-                
-        elif self.mode == "auto" and message.type == Gst.MessageType.ELEMENT:
-            if message.get_structure().get_name() == "level":
-                rms = message.get_structure()["rms"][0]
-                if rms > self.energy_threshold:
-                    self.frames_above_threshold += 1
-                    # if self.frames_above_threshold >= self.silence_frames_threshold:
-                    #     self.start_recording()
-                else:
-                    if self.frames_above_threshold > 0:
-                        self.frames_above_threshold -= 1
-                        if self.frames_above_threshold == 0:
-                            self.stop_recording()
-    
+
 
     def cleanup_pipeline(self):
         """
-        Clean up the GStreamer pipeline, set it to NULL state, and remove the signal watch.
+        Clean up the GStreamer pipeline, set it to NULL state, and remove the bus watch.
         """
         if self.pipeline is not None:
             print("Cleaning up pipeline...")
-            self.pipeline.set_state(Gst.State.NULL)
-            self.bus.remove_signal_watch()
+            self.pipeline_manager.teardown(self.pipeline_id)
             print("Pipeline cleanup complete!")
-            self.bus = None
+            self.pipeline_id = None
             self.pipeline = None
@@ -0,0 +1,452 @@
+# SPDX-License-Identifier: Apache-2.0
+#
+# Copyright (c) 2023 Malik Talha
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import gi
+import threading
+from collections import deque
+gi.require_version('Gst', '1.0')
+from gi.repository import Gst, GLib
+from agl_service_voiceagent.utils.pipeline_manager import PipelineManager
+from agl_service_voiceagent.utils.ring_buffer import AudioRingBuffer
+
+Gst.init(None)
+GLib.threads_init()
+
+
+class AudioSubscription:
+    """
+    AudioSubscription is the receiving end of a SharedAudioSource. Audio chunks are kept in a bounded queue,
+    when a slow subscriber falls behind the oldest audio is dropped so the capture thread never blocks.
+    """
+
+    def __init__(self, source, max_bytes, position=0):
+        """
+        Initialize the AudioSubscription instance.
+
+        Args:
+            source (SharedAudioSource): The audio source the subscription belongs to.
+            max_bytes (int): The maximum number of bytes queued before the oldest audio is dropped, None to never drop
+                audio, e.g. for a subscriber that writes it to a file.
+            position (int, optional): The absolute stream position of the first byte the subscription receives.
+        """
+        self.source = source
+        self.max_bytes = max_bytes
+        self.chunks = deque()
+        self.queued_bytes = 0
+        self.dropped_bytes = 0
+        self.replay_bytes = 0  # replayed history still queued, it is allowed on top of `max_bytes`
+        self.position = position  # absolute stream position of the next byte returned by read()
+        self.closed = False
+        self.cond = threading.Condition()
+
+
+    def push(self, data):
+        """
+        Queue a chunk of audio. Called from the capture thread.
+
+        Args:
+            data (bytes): The audio chunk.
+        """
+        with self.cond:
+            if self.closed:
+                return
+            self.chunks.append(data)
+            self.queued_bytes += len(data)
+            while self.max_bytes is not None and self.queued_bytes > self.max_bytes and len(self.chunks) > 1:
+                dropped = self.chunks.popleft()
+                self.queued_bytes -= len(dropped)
+                self.dropped_bytes += len(dropped)
+                self.position += len(dropped)
+                self.release_replay(len(dropped))
+            self.cond.notify()
+
+
+    def replay(self, data):
+        """
+        Queue audio from the history of the source. The queue bound is raised by its length until it has been read,
+        so live audio does not push it out right away.
+
+        Args:
+            data (bytes): The replayed audio.
+        """
+        if self.max_bytes is not None:
+            with self.cond:
+                self.replay_bytes += len(data)
+                self.max_bytes += len(data)
+        self.push(data)
+
+
+    def release_replay(self, length):
+        """
+        Lower the queue bound back towards its configured value as replayed audio leaves the queue. Must be called
+        with the condition held.
+
+        Args:
+            length (int): The number of bytes that left the queue.
+        """
+        released = min(length, self.replay_bytes)
+        self.replay_bytes -= released
+        self.max_bytes -= released
+
+
+    def read(self, timeout=None):
+        """
+        Get the next chunk of audio, blocking until one is available.
+
+        Audio that was queued before the subscription was closed is still returned, so a closed subscription can be
+        drained.
+
+        Args:
+            timeout (float, optional): The maximum number of seconds to wait, waits forever if None.
+
+        Returns:
+            bytes: The next audio chunk, an empty bytes object on timeout, or None once the subscription is closed
+                and drained.
+        """
+        with self.cond:
+            if not self.chunks and not self.closed:
+                self.cond.wait(timeout)
+            if self.chunks:
+                data = self.chunks.popleft()
+                self.queued_bytes -= len(data)
+                self.position += len(data)
+                self.release_replay(len(data))
+                return data
+            return None if self.closed else b""
+
+
+    def __iter__(self):
+        """
+        Iterate over the audio chunks until the subscription is closed and drained.
+        """
+        while True:
+            data = self.read()
+            if data is None:
+                return
+            if data:
+                yield data
+
+
+    def close(self):
+        """
+        Stop receiving audio from the source. Already queued audio can still be read.
+        """
+        with self.cond:
+            if self.closed:
+                return
+            self.closed = True
+            self.cond.notify_all()
+        self.source.unsubscribe(self)
+
+
+    def get_stats(self):
+        """
+        Get the queue state of the subscription.
+
+        Returns:
+            dict: The number of bytes queued and dropped because the subscriber fell behind.
+        """
+        with self.cond:
+            return {"queued_bytes": self.queued_bytes, "dropped_bytes": self.dropped_bytes}
+
+
+class SharedAudioSource:
+    """
+    SharedAudioSource owns a single long-lived GStreamer capture pipeline and fans the captured PCM out to any number
+    of subscribers, e.g. wake word detectors and command recorders. The microphone is opened once when the server
+    starts, so no pipeline has to be built in the request path.
+
+    The most recent audio can be kept in a history ring buffer, so a new subscriber can start from a position in the
+    past, e.g. a command recorder picking up right where the wake word was detected.
+    """
+
+    def __init__(self, channels=1, sample_rate=16000, bits_per_sample=16, subscriber_queue_ms=2000, restart_delay=2,
+                 history_ms=0, backpressure=None):
+        """
+        Initialize the SharedAudioSource instance with the provided parameters.
+
+        Args:
+            channels (int, optional): The number of audio channels (default is 1).
+            sample_rate (int, optional): The audio sample rate in Hz (default is 16000).
+            bits_per_sample (int, optional): The number of bits per sample (default is 16).
+            subscriber_queue_ms (int, optional): How much audio a subscriber may fall behind before its oldest audio
+                is dropped, in milliseconds (default is 2000).
+            restart_delay (int, optional): Seconds to wait before restarting the pipeline after an error (default is 2).
+            history_ms (int, optional): How much past audio is kept for subscribers that start in the past, in
+                milliseconds (default is 0, no history).
+            backpressure (Backpressure, optional): Bounds the queue and the appsink of the capture pipeline, they are
+                unbounded if None.
+        """
+        self.channels = channels
+        self.sample_rate = sample_rate
+        self.bits_per_sample = bits_per_sample
+        self.frame_bytes = channels * bits_per_sample // 8
+        self.subscriber_queue_bytes = self.ms_to_bytes(subscriber_queue_ms)
+        self.history = AudioRingBuffer(self.ms_to_bytes(history_ms)) if history_ms > 0 else None
+        self.position = 0  # total number of bytes captured
+        self.restart_delay = restart_delay
+        self.backpressure = backpressure
+        self.queue_monitor = None
+        self.pipeline = None
+        self.pipeline_id = None
+        self.pipeline_manager = PipelineManager()
+        self.running = False
+        self.subscribers = []
+        self.subscribers_lock = threading.Lock()
+        self.stats = {
+            "buffers": 0,
+            "bytes": 0,
+            "restarts": 0,
+        }
+
+
+    def ms_to_bytes(self, duration_ms):
+        """
+        Convert a duration to a number of bytes of captured audio, rounded to whole frames.
+
+        Args:
+            duration_ms (int): The duration in milliseconds.
+
+        Returns:
+            int: The number of bytes.
+        """
+        return int(duration_ms * self.sample_rate / 1000) * self.frame_bytes
+
+
+    def create_pipeline(self):
+        """
+        Create the capture pipeline, which converts the microphone audio to the configured raw format.
+        """
+        self.pipeline = Gst.Pipeline()
+        autoaudiosrc = Gst.ElementFactory.make("autoaudiosrc", None)
+        queue = Gst.ElementFactory.make("queue", None)
+        audioconvert = Gst.ElementFactory.make("audioconvert", None)
+        audioresample = Gst.ElementFactory.make("audioresample", None)
+
+        capsfilter = Gst.ElementFactory.make("capsfilter", None)
+        caps = Gst.Caps.new_empty_simple("audio/x-raw")
+        caps.set_value("format", "S16LE")
+        caps.set_value("rate", self.sample_rate)
+        caps.set_value("channels", self.channels)
+        capsfilter.set_property("caps", caps)
+
+        appsink = Gst.ElementFactory.make("appsink", None)
+        appsink.set_property("emit-signals", True)
+        appsink.set_property("sync", False)  # Set sync property to False to enable async processing
+        appsink.connect("new-sample", self.on_new_buffer, None)
+        if self.backpressure is not None:
+            # recordings are fed from this pipeline too, so it never drops audio itself, subscribers that fall
+            # behind drop from their own queues instead
+            self.queue_monitor = self.backpressure.configure_queue(queue, leaky=False)
+            self.backpressure.configure_appsink(appsink, leaky=False)
+
+        for element in [autoaudiosrc, queue, audioconvert, audioresample, capsfilter, appsink]:
+            self.pipeline.add(element)
+
+        autoaudiosrc.link(queue)
+        queue.link(audioconvert)
+        audioconvert.link(audioresample)
+        audioresample.link(capsfilter)
+        capsfilter.link(appsink)
+
+        self.pipeline_id = self.pipeline_manager.register(self.pipeline, "shared_audio_source", self.on_bus_message, long_lived=True)
+
+
+    def start(self):
+        """
+        Start capturing audio. The bus is watched from the pipeline manager's main loop thread.
+        """
+        if self.running:
+            return
+        self.running = True
+        self.create_pipeline()
+        self.pipeline_manager.start(self.pipeline_id)
+        print("Shared audio capture started.")
+
+
+    def stop(self):
+        """
+        Stop capturing audio, tear the pipeline down and close all subscriptions.
+        """
+        self.running = False
+        self.cleanup_pipeline()
+        with self.subscribers_lock:
+            subscribers = list(self.subscribers)
+        for subscription in subscribers:
+            subscription.close()
+
+
+    def restart(self):
+        """
+        Rebuild the capture pipeline, e.g. after the audio device reported an error.
+
+        Returns:
+            bool: False, so the GLib timeout that calls it is not repeated.
+        """
+        if self.running:
+            print("Restarting shared audio capture...")
+            self.stats["restarts"] += 1
+            self.cleanup_pipeline()
+            self.create_pipeline()
+            self.pipeline_manager.start(self.pipeline_id)
+        return False
+
+
+    def subscribe(self, start_position=None, lossless=False):
+        """
+        Subscribe to the captured audio.
+
+        Args:
+            start_position (int, optional): The absolute stream position to start from. Audio since this position is
+                replayed from the history first, as far as the history still holds it. Only audio captured after
+                subscribing is delivered if None.
+            lossless (bool, optional): If True, the subscription never drops audio however far it falls behind, for
+                subscribers that write the audio to a file and keep up on average (default is False).
+
+        Returns:
+            AudioSubscription: The subscription, which must be closed once it is no longer needed.
+        """
+        with self.subscribers_lock:
+            # replaying and registering under the fan-out lock leaves no gap and no overlap with live audio
+            subscription = AudioSubscription(self, None if lossless else self.subscriber_queue_bytes, self.position)
+            if start_position is not None and self.history is not None:
+                start_position = min(max(start_position, self.history.get_oldest_position()), self.position)
+                start_position -= start_position % self.frame_bytes
+                if start_position < self.position:
+                    subscription.position = start_position
+                    subscription.replay(bytes(self.history.read(start_position, self.position - start_position)))
+            self.subscribers.append(subscription)
+        return subscription
+
+
+    def get_position(self):
+        """
+        Get the current stream position.
+
+        Returns:
+            int: The total number of bytes captured so far.
+        """
+        with self.subscribers_lock:
+            return self.position
+
+
+    def unsubscribe(self, subscription):
+        """
+        Remove a subscription, it receives no more audio.
+
+        Args:
+            subscription (AudioSubscription): The subscription to remove.
+        """
+        with self.subscribers_lock:
+            if subscription in self.subscribers:
+                self.subscribers.remove(subscription)
+
+
+    def on_new_buffer(self, appsink, data) -> Gst.FlowReturn:
+        """
+        Callback function to fan new audio buffers from the GStreamer appsink out to the subscribers.
+
+        Args:
+            appsink (Gst.AppSink): The GStreamer appsink.
+            data (object): User data (not used).
+
+        Returns:
+            Gst.FlowReturn: Indicates the status of buffer processing.
+        """
+        sample = appsink.emit("pull-sample")
+        if self.history is None and not self.subscribers:
+            # nobody is listening and nothing is kept, don't even copy the buffer out of GStreamer
+            return Gst.FlowReturn.OK
+
+        buffer = sample.get_buffer()
+        self.publish(buffer.extract_dup(0, buffer.get_size()))
+        return Gst.FlowReturn.OK
+
+
+    def publish(self, data):
+        """
+        Fan a chunk of captured audio out to the subscribers and keep it in the history. Called from the capture
+        thread.
+
+        Args:
+            data (bytes): The audio chunk.
+        """
+        with self.subscribers_lock:
+            self.stats["buffers"] += 1
+            self.stats["bytes"] += len(data)
+            if self.history is not None:
+                self.history.write(data)
+            self.position += len(data)
+
+            # bytes are immutable, so every subscriber can share the same chunk
+            for subscription in self.subscribers:
+                subscription.push(data)
+
+
+    def on_bus_message(self, bus, message):
+        """
+        Handle GStreamer bus messages and restart the pipeline on errors.
+
+        Args:
+            bus (Gst.Bus): The GStreamer bus.
+            message (Gst.Message): The GStreamer message to process.
+        """
+        if message.type == Gst.MessageType.ERROR:
+            err, debug_info = message.parse_error()
+            print(f"Error received from element {message.src.get_name()}: {err.message}")
+            print(f"Debugging information: {debug_info}")
+            GLib.timeout_add_seconds(self.restart_delay, self.restart)
+        elif message.type == Gst.MessageType.EOS:
+            print("End-of-stream message received from the shared audio source")
+            GLib.timeout_add_seconds(self.restart_delay, self.restart)
+        elif message.type == Gst.MessageType.WARNING:
+            err, debug_info = message.parse_warning()
+            print(f"Warning received from element {message.src.get_name()}: {err.message}")
+            print(f"Debugging information: {debug_info}")
+        elif message.type == Gst.MessageType.STATE_CHANGED:
+            if isinstance(message.src, Gst.Pipeline):
+                old_state, new_state, pending_state = message.parse_state_changed()
+                print(("Shared audio pipeline state changed from %s to %s." %
+                       (old_state.value_nick, new_state.value_nick)))
+
+
+    def get_stats(self):
+        """
+        Get the capture and fan-out statistics.
+
+        Returns:
+            dict: Captured buffer and byte counters, the number of restarts, the capture queue state and the per
+                subscriber queue state.
+        """
+        with self.subscribers_lock:
+            subscribers = list(self.subscribers)
+        stats = dict(self.stats)
+        stats["subscribers"] = len(subscribers)
+        stats["queued_bytes"] = [subscription.queued_bytes for subscription in subscribers]
+        stats["dropped_bytes"] = [subscription.dropped_bytes for subscription in subscribers]
+        if self.queue_monitor is not None:
+            stats["capture_queue"] = self.queue_monitor.get_stats()
+        return stats
+
+
+    def cleanup_pipeline(self):
+        """
+        Clean up the GStreamer pipeline and remove the bus watch.
+        """
+        if self.pipeline is not None:
+            self.pipeline_manager.teardown(self.pipeline_id)
+            self.pipeline_id = None
+            self.pipeline = None
@@ -0,0 +1,148 @@
+# SPDX-License-Identifier: Apache-2.0
+#
+# Copyright (c) 2023 Malik Talha
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import time
+import uuid
+import tempfile
+import threading
+from agl_service_voiceagent.utils.common import add_trailing_slash, delete_file
+
+
+class AudioStore:
+    """
+    AudioStore hands out collision-free paths for recorded voice commands.
+
+    Recordings are only needed until they are decoded, or archived, so they live in scratch storage: anonymous memory
+    files (`memfd`), or a RAM-backed directory (`tmpfs`). Only the `persistent` backend writes them to block storage,
+    into a `scratch/` directory inside the persistent audio directory.
+    """
+
+    BACKENDS = ("memfd", "tmpfs", "persistent")
+
+    def __init__(self, persistent_dir, backend="memfd", scratch_dir=None):
+        """
+        Initialize the AudioStore instance.
+
+        Args:
+            persistent_dir (str): The directory used by the 'persistent' backend.
+            backend (str, optional): Where scratch recordings go: 'memfd', 'tmpfs' or 'persistent' (default is 'memfd').
+                Falls back to 'tmpfs' if memory files are not supported by the platform.
+            scratch_dir (str, optional): The directory used by the 'tmpfs' backend (default is a directory in
+                /dev/shm, or in the system temp directory if there is no /dev/shm).
+
+        Raises:
+            ValueError: If the backend is unknown.
+        """
+        if backend not in self.BACKENDS:
+            raise ValueError(f"Unknown audio storage backend '{backend}', expected one of {', '.join(self.BACKENDS)}.")
+
+        if backend == "memfd" and not hasattr(os, "memfd_create"):
+            print("Memory files are not supported on this platform, falling back to tmpfs audio storage.")
+            backend = "tmpfs"
+
+        self.backend = backend
+        # kept apart from the archive in the persistent directory, so archive rotation never sees open recordings
+        self.persistent_dir = f"{add_trailing_slash(persistent_dir)}scratch/"
+        if not scratch_dir:
+            scratch_root = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+            scratch_dir = os.path.join(scratch_root, "agl-voiceagent")
+        self.scratch_dir = add_trailing_slash(scratch_dir)
+        if self.backend == "tmpfs":
+            os.makedirs(self.scratch_dir, exist_ok=True)
+        elif self.backend == "persistent":
+            os.makedirs(self.persistent_dir, exist_ok=True)
+
+        self.memfds = {}  # path -> file descriptor of the memory file
+        self.lock = threading.Lock()
+        self.stats = {
+            "allocated": 0,
+            "released": 0,
+        }
+
+
+    def make_name(self, suffix=".wav"):
+        """
+        Build a unique file name. The name starts with a nanosecond timestamp, so stored recordings still sort by
+        time, and ends with a random part, so recordings started at the same time don't collide.
+
+        Args:
+            suffix (str, optional): The file name extension (default is '.wav').
+
+        Returns:
+            str: The file name, without a directory.
+        """
+        return f"{time.time_ns()}-{uuid.uuid4().hex[:8]}{suffix}"
+
+
+    def allocate(self, suffix=".wav"):
+        """
+        Allocate the path of a new recording. The path can be opened by name like any file, including by GStreamer
+        and the wave module, until it is released.
+
+        Args:
+            suffix (str, optional): The file name extension (default is '.wav').
+
+        Returns:
+            str: The path of the recording.
+        """
+        name = self.make_name(suffix)
+        with self.lock:
+            self.stats["allocated"] += 1
+
+        if self.backend == "persistent":
+            return f"{self.persistent_dir}{name}"
+
+        if self.backend == "tmpfs":
+            return f"{self.scratch_dir}{name}"
+
+        # the memory file is reachable by path through procfs and disappears once its descriptor is closed
+        fd = os.memfd_create(name)
+        path = f"/proc/self/fd/{fd}"
+        with self.lock:
+            self.memfds[path] = fd
+        return path
+
+
+    def release(self, path):
+        """
+        Delete a recording that is no longer needed.
+
+        Args:
+            path (str): A path returned by `allocate`.
+        """
+        with self.lock:
+            fd = self.memfds.pop(path, None)
+            self.stats["released"] += 1
+
+        if fd is not None:
+            os.close(fd)
+        else:
+            delete_file(path)
+
+
+    def get_stats(self):
+        """
+        Get the storage counters.
+
+        Returns:
+            dict: The backend, the number of allocated and released recordings, and the number of open memory files.
+        """
+        with self.lock:
+            stats = dict(self.stats)
+            stats["backend"] = self.backend
+            stats["open_memfds"] = len(self.memfds)
+            return stats
@@ -0,0 +1,198 @@
+# SPDX-License-Identifier: Apache-2.0
+#
+# Copyright (c) 2023 Malik Talha
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import gi
+import threading
+gi.require_version('Gst', '1.0')
+from gi.repository import Gst, GLib
+
+Gst.init(None)
+GLib.threads_init()
+
+
+class QueueMonitor:
+    """
+    QueueMonitor keeps track of how much audio a GStreamer queue holds and how much it discarded.
+    """
+
+    def __init__(self, queue):
+        """
+        Initialize the QueueMonitor instance and attach it to the queue.
+
+        Args:
+            queue (Gst.Element): The queue element to monitor.
+        """
+        self.queue = queue
+        self.lock = threading.Lock()
+        self.stats = {
+            "bytes_in": 0,
+            "bytes_out": 0,
+            "overruns": 0,
+            "max_depth_ms": 0.0,
+        }
+        queue.get_static_pad("sink").add_probe(Gst.PadProbeType.BUFFER, self.on_buffer_in)
+        queue.get_static_pad("src").add_probe(Gst.PadProbeType.BUFFER, self.on_buffer_out)
+        queue.connect("overrun", self.on_overrun)
+
+
+    def on_buffer_in(self, pad, info):
+        """
+        Count a buffer entering the queue. Called from the upstream streaming thread.
+
+        Args:
+            pad (Gst.Pad): The sink pad of the queue.
+            info (Gst.PadProbeInfo): The probe info holding the buffer.
+
+        Returns:
+            Gst.PadProbeReturn: OK, the buffer is passed on.
+        """
+        size = info.get_buffer().get_size()
+        with self.lock:
+            self.stats["bytes_in"] += size
+        return Gst.PadProbeReturn.OK
+
+
+    def on_buffer_out(self, pad, info):
+        """
+        Count a buffer leaving the queue and record the queue depth. Called from the queue's streaming thread.
+
+        Args:
+            pad (Gst.Pad): The src pad of the queue.
+            info (Gst.PadProbeInfo): The probe info holding the buffer.
+
+        Returns:
+            Gst.PadProbeReturn: OK, the buffer is passed on.
+        """
+        size = info.get_buffer().get_size()
+        depth_ms = self.queue.get_property("current-level-time") / Gst.MSECOND
+        with self.lock:
+            self.stats["bytes_out"] += size
+            self.stats["max_depth_ms"] = max(self.stats["max_depth_ms"], depth_ms)
+        return Gst.PadProbeReturn.OK
+
+
+    def on_overrun(self, queue):
+        """
+        Count the queue running full.
+
+        Args:
+            queue (Gst.Element): The queue element.
+        """
+        with self.lock:
+            self.stats["overruns"] += 1
+
+
+    def get_stats(self):
+        """
+        Get the queue statistics.
+
+        Returns:
+            dict: The current and maximum queue depth in milliseconds, the bytes that entered and left the queue, how
+                often it ran full and the bytes it discarded. Audio still queued when the pipeline is torn down counts
+                as discarded.
+        """
+        level_bytes = self.queue.get_property("current-level-bytes")
+        depth_ms = self.queue.get_property("current-level-time") / Gst.MSECOND
+        with self.lock:
+            stats = dict(self.stats)
+        stats["depth_ms"] = depth_ms
+        stats["dropped_bytes"] = max(0, stats["bytes_in"] - stats["bytes_out"] - level_bytes)
+        return stats
+
+
+class Backpressure:
+    """
+    Backpressure bounds how much audio the queues and appsinks of a capture pipeline may buffer while the
+    recognizer falls behind, so latency degrades by a known amount under CPU contention instead of drifting.
+
+    With the 'drop_oldest' policy a full queue discards its oldest audio and the recognizer skips ahead. With the
+    'block' policy a full queue blocks the audio source, which then drops the newest audio once its own buffer
+    overruns. Only the branch feeding the recognizer follows the policy, queues shared with or feeding a file branch
+    never discard audio, so recordings have no holes.
+    """
+
+    POLICIES = ("drop_oldest", "block")
+
+    def __init__(self, max_buffered_ms=500, policy="drop_oldest"):
+        """
+        Initialize the Backpressure instance.
+
+        Args:
+            max_buffered_ms (int, optional): How much audio a queue or appsink may hold, in milliseconds (default
+                is 500).
+            policy (str, optional): 'drop_oldest' or 'block' (default is 'drop_oldest').
+
+        Raises:
+            ValueError: If the policy is unknown.
+        """
+        if policy not in self.POLICIES:
+            raise ValueError(f"Unknown backpressure policy '{policy}', expected one of {', '.join(self.POLICIES)}.")
+        self.max_buffered_ms = max_buffered_ms
+        self.policy = policy
+
+
+    def configure_queue(self, queue, leaky=True):
+        """
+        Bound a queue element by time and attach a monitor to it.
+
+        Args:
+            queue (Gst.Element): The queue element, not linked yet or in the NULL state.
+            leaky (bool, optional): If False, the queue blocks when full regardless of the policy, for queues shared
+                by branches that must not lose audio (default is True).
+
+        Returns:
+            QueueMonitor: The monitor of the queue.
+        """
+        queue.set_property("max-size-time", int(self.max_buffered_ms * Gst.MSECOND))
+        # only the duration counts, audio buffers are small and their number depends on the source
+        queue.set_property("max-size-buffers", 0)
+        queue.set_property("max-size-bytes", 0)
+        queue.set_property("leaky", 2 if leaky and self.policy == "drop_oldest" else 0)  # 2: leak downstream, the oldest data
+        return QueueMonitor(queue)
+
+
+    def monitor_queue(self, queue):
+        """
+        Lift the bounds of a queue element and attach a monitor to it, for branches that must keep every buffer, e.g.
+        one writing a WAV file. Such a queue never blocks the branches next to it either.
+
+        Args:
+            queue (Gst.Element): The queue element, not linked yet or in the NULL state.
+
+        Returns:
+            QueueMonitor: The monitor of the queue.
+        """
+        queue.set_property("max-size-time", 0)
+        queue.set_property("max-size-buffers", 0)
+        queue.set_property("max-size-bytes", 0)
+        return QueueMonitor(queue)
+
+
+    def configure_appsink(self, appsink, leaky=True):
+        """
+        Bound the sample queue of an appsink.
+
+        Args:
+            appsink (Gst.Element): The appsink element.
+            leaky (bool, optional): If False, a full appsink blocks regardless of the policy, for appsinks whose
+                audio is also recorded (default is True).
+        """
+        if appsink.find_property("max-time") is not None:
+            appsink.set_property("max-time", int(self.max_buffered_ms * Gst.MSECOND))
+        else:
+            # older GStreamer only bounds the number of buffers, audio sources deliver 10 ms buffers by default
+            appsink.set_property("max-buffers", max(1, int(self.max_buffered_ms // 10)))
+        appsink.set_property("drop", leaky and self.policy == "drop_oldest")
@@ -0,0 +1,55 @@
+# SPDX-License-Identifier: Apache-2.0
+#
+# Copyright (c) 2023 Malik Talha
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import gi
+from contextlib import contextmanager
+gi.require_version('Gst', '1.0')
+from gi.repository import Gst, GLib
+
+Gst.init(None)
+GLib.threads_init()
+
+
+@contextmanager
+def map_buffer(buffer):
+    """
+    Map a GStreamer buffer read-only and expose its data as a memoryview.
+
+    With the GStreamer Python overrides the view points straight into the buffer memory, so no audio is copied. The
+    view, and every slice of it, is only valid inside the `with` block, anything that outlives it has to be copied.
+    Without the overrides the bindings already hand out a copy of the data, which is used as is.
+
+    Args:
+        buffer (Gst.Buffer): The buffer to map.
+
+    Yields:
+        memoryview: The data of the buffer.
+
+    Raises:
+        RuntimeError: If the buffer can't be mapped.
+    """
+    success, map_info = buffer.map(Gst.MapFlags.READ)
+    if not success:
+        raise RuntimeError("Failed to map GStreamer buffer.")
+
+    try:
+        data = map_info.data
+        if not isinstance(data, (bytes, memoryview)):
+            # older bindings expose the data as a list of ints, copying it out of the buffer is cheaper
+            data = buffer.extract_dup(0, buffer.get_size())
+        yield memoryview(data)
+    finally:
+        buffer.unmap(map_info)
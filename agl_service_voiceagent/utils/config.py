@@ -66,10 +66,15 @@ def update_config_value(value, key, group="General"):
     with open(config_path, 'w') as configfile:
         config.write(configfile)
 
-def get_config_value(key, group="General"):
+def get_config_value(key, group="General", fallback=None):
     """
     Gets a value from the config file.
+
+    If a fallback is provided it is returned when the key (or group) is missing, this allows
+    older config files to keep working when new options are introduced.
     """
+    if fallback is not None:
+        return config.get(group, key, fallback=fallback)
     return config.get(group, key)
 
 def get_logger():
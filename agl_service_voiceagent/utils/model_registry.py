@@ -0,0 +1,161 @@
+# SPDX-License-Identifier: Apache-2.0
+#
+# Copyright (c) 2023 Malik Talha
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import threading
+from agl_service_voiceagent.utils.stt_model import STTModel
+
+
+class ModelRegistry:
+    """
+    Model Registry
+
+    Process-wide registry of loaded STT models. Models are keyed by their canonical path, sample rate
+    and language, and reference counted so that identical models are only loaded once.
+    """
+
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls):
+        """
+        Get the unique instance of the class.
+
+        Returns:
+            ModelRegistry: The instance of the class.
+        """
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = super(ModelRegistry, cls).__new__(cls)
+                cls._instance.init_registry()
+        return cls._instance
+
+
+    def init_registry(self):
+        """
+        Initialize the registry state.
+        """
+        self.models = {}
+        self.model_lock = threading.Lock()
+        self.saved_bytes = 0
+
+
+    def get_model_key(self, model_path, sample_rate, language=None):
+        """
+        Build the registry key of a model.
+
+        Args:
+            model_path (str): The path to the Vosk model.
+            sample_rate (int): The audio sample rate in Hz.
+            language (str, optional): The language of the model.
+
+        Returns:
+            tuple: The (canonical path, sample rate, language) key.
+        """
+        return (os.path.realpath(model_path), int(sample_rate), language)
+
+
+    def get_model_size(self, model_path):
+        """
+        Estimate the memory footprint of a model from its size on disk.
+
+        Args:
+            model_path (str): The path to the Vosk model.
+
+        Returns:
+            int: The total size of the model files in bytes.
+        """
+        total_size = 0
+        for root, _, files in os.walk(model_path):
+            for file_name in files:
+                try:
+                    total_size += os.path.getsize(os.path.join(root, file_name))
+                except OSError:
+                    pass
+        return total_size
+
+
+    def acquire_model(self, model_path, sample_rate=16000, language=None, **pool_config):
+        """
+        Get a shared STT model, loading it only if no identical model is registered yet.
+
+        Args:
+            model_path (str): The path to the Vosk model.
+            sample_rate (int, optional): The audio sample rate in Hz (default is 16000).
+            language (str, optional): The language of the model.
+            **pool_config: Recognizer pool options forwarded to `STTModel` when the model is loaded.
+
+        Returns:
+            STTModel: The shared STT model instance.
+        """
+        key = self.get_model_key(model_path, sample_rate, language)
+        with self.model_lock:
+            entry = self.models.get(key)
+            if entry is not None:
+                entry["refs"] += 1
+                self.saved_bytes += entry["size"]
+                return entry["model"]
+
+            stt_model = STTModel(model_path, sample_rate, **pool_config)
+            self.models[key] = {
+                "model": stt_model,
+                "refs": 1,
+                "size": self.get_model_size(key[0])
+            }
+            return stt_model
+
+
+    def release_model(self, stt_model):
+        """
+        Drop a reference to a shared STT model, unloading it once it is no longer used.
+
+        Args:
+            stt_model (STTModel): The model returned by `acquire_model`.
+        """
+        with self.model_lock:
+            for key, entry in self.models.items():
+                if entry["model"] is stt_model:
+                    entry["refs"] -= 1
+                    if entry["refs"] > 0:
+                        self.saved_bytes -= entry["size"]
+                    else:
+                        del self.models[key]
+                    return
+
+
+    def get_memory_saved(self):
+        """
+        Get the estimated memory saved by sharing models instead of loading duplicates.
+
+        Returns:
+            int: The saved memory in bytes.
+        """
+        with self.model_lock:
+            return self.saved_bytes
+
+
+    def get_stats(self):
+        """
+        Get the registered models along with their reference counts.
+
+        Returns:
+            list: The path, sample rate, language, reference count and size in bytes of each model.
+        """
+        with self.model_lock:
+            return [
+                {"path": key[0], "sample_rate": key[1], "language": key[2], "refs": entry["refs"], "size": entry["size"]}
+                for key, entry in self.models.items()
+            ]
@@ -0,0 +1,80 @@
+# SPDX-License-Identifier: Apache-2.0
+#
+# Copyright (c) 2023 Malik Talha
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import queue
+import threading
+from concurrent.futures import Future
+
+
+def ordered_map(executor, func, items, window):
+    """
+    Call a function on every item of an iterable in an executor and yield the results in the order of the items.
+
+    The items are read on a thread of their own, so a result is yielded as soon as it and the results before it are
+    ready, even while reading the next item blocks, e.g. on a client that waits for results before it sends more. At
+    most `window` items are in flight ahead of the results yielded, which bounds the memory of an endless iterable.
+
+    Args:
+        executor (concurrent.futures.Executor): Runs the function calls.
+        func (callable): Called with one item at a time.
+        items (iterable): The items, may block.
+        window (int): How many items may be in flight at once.
+
+    Yields:
+        object: The return values of the function, in the order of the items.
+
+    Raises:
+        Exception: The first exception raised by the function or by the iterable, in the order of the items.
+    """
+    slots = threading.Semaphore(window)
+    futures = queue.Queue()
+    stopped = threading.Event()
+
+    def read():
+        try:
+            for item in items:
+                slots.acquire()
+                if stopped.is_set():
+                    return
+                futures.put(executor.submit(func, item))
+        except Exception as e:
+            failed = Future()
+            failed.set_exception(e)
+            futures.put(failed)
+        finally:
+            futures.put(None)
+
+    threading.Thread(target=read, name="ordered-map-reader", daemon=True).start()
+    try:
+        while True:
+            future = futures.get()
+            if future is None:
+                return
+            result = future.result()
+            slots.release()
+            yield result
+
+    finally:
+        # the reader stops at its next item, calls that did not start yet are dropped
+        stopped.set()
+        slots.release()
+        while True:
+            try:
+                future = futures.get_nowait()
+            except queue.Empty:
+                break
+            if future is not None:
+                future.cancel()
@@ -0,0 +1,367 @@
+# SPDX-License-Identifier: Apache-2.0
+#
+# Copyright (c) 2023 Malik Talha
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import gi
+import time
+import itertools
+import threading
+gi.require_version('Gst', '1.0')
+from gi.repository import Gst, GLib
+from agl_service_voiceagent.utils.config import get_config_value, get_logger
+from agl_service_voiceagent.utils.scheduler import Scheduler
+
+Gst.init(None)
+GLib.threads_init()
+
+
+class PipelineManager:
+    """
+    Pipeline Manager
+
+    Process-wide owner of every GStreamer pipeline. A single GLib main loop thread dispatches the bus messages of
+    all pipelines, while state changes and teardown can be requested from any thread, e.g. gRPC workers.
+    """
+
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls):
+        """
+        Get the unique instance of the class.
+
+        Returns:
+            PipelineManager: The instance of the class.
+        """
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = super(PipelineManager, cls).__new__(cls)
+                cls._instance.init_manager()
+        return cls._instance
+
+
+    def init_manager(self):
+        """
+        Initialize the manager state and start the main loop thread.
+        """
+        self.logger = get_logger()
+        self.leak_timeout = float(get_config_value('PIPELINE_LEAK_TIMEOUT', 'Audio', fallback='600'))
+        self.pipelines = {}
+        self.pipelines_lock = threading.Lock()
+        self.pipeline_ids = itertools.count(1)
+        self.stats = {
+            "created": 0,
+            "torn_down": 0,
+            "errors": 0,
+            "leaks_reported": 0,
+        }
+        self.state_latency = {}
+        self.loop = GLib.MainLoop()
+        self.loop_thread = threading.Thread(target=self.run_loop, name="glib-main-loop", daemon=True)
+        self.loop_thread.start()
+        # look for pipelines that were never torn down once a minute
+        GLib.timeout_add_seconds(60, self.check_leaks)
+
+
+    def run_loop(self):
+        """
+        Run the GLib main loop. Runs in the main loop thread, which drives every pipeline and so is a realtime thread.
+        """
+        Scheduler().apply_thread_class("realtime")
+        self.loop.run()
+
+
+    def register(self, pipeline, name, on_message=None, long_lived=False):
+        """
+        Take ownership of a pipeline and watch its bus from the main loop thread.
+
+        Args:
+            pipeline (Gst.Pipeline): The pipeline, in the NULL state.
+            name (str): A name describing the owner of the pipeline, used in stats and logs.
+            on_message (callable, optional): Called as `on_message(bus, message)` from the main loop thread for
+                every bus message of the pipeline.
+            long_lived (bool, optional): If True, the pipeline is meant to live as long as the server and is never
+                reported as leaked (default is False).
+
+        Returns:
+            int: The ID of the pipeline, used for all further calls.
+        """
+        pipeline_id = next(self.pipeline_ids)
+        bus = pipeline.get_bus()
+        record = {
+            "name": name,
+            "pipeline": pipeline,
+            "bus": bus,
+            "on_message": on_message,
+            "state": Gst.State.NULL,
+            "state_request": None,
+            "created_at": time.monotonic(),
+            "started": False,
+            "long_lived": long_lived,
+            "leak_reported": False,
+            "eos_event": threading.Event(),
+        }
+        with self.pipelines_lock:
+            self.pipelines[pipeline_id] = record
+            self.stats["created"] += 1
+        bus.add_watch(GLib.PRIORITY_DEFAULT, self.on_bus_message, pipeline_id)
+        return pipeline_id
+
+
+    def assign(self, pipeline_id, name, on_message=None):
+        """
+        Hand a registered pipeline over to a new owner, e.g. when a pre-built pipeline is leased.
+
+        Args:
+            pipeline_id (int): The ID of the pipeline.
+            name (str): A name describing the new owner of the pipeline, used in stats and logs.
+            on_message (callable, optional): Called as `on_message(bus, message)` from the main loop thread for
+                every bus message of the pipeline from now on.
+        """
+        with self.pipelines_lock:
+            record = self.pipelines.get(pipeline_id)
+            if record is not None:
+                record["name"] = name
+                record["on_message"] = on_message
+                record["long_lived"] = False
+                record["created_at"] = time.monotonic()
+
+
+    def get_record(self, pipeline_id):
+        """
+        Get the bookkeeping record of a pipeline.
+
+        Args:
+            pipeline_id (int): The ID of the pipeline.
+
+        Returns:
+            dict: The record, or None if the pipeline was torn down.
+        """
+        with self.pipelines_lock:
+            return self.pipelines.get(pipeline_id)
+
+
+    def set_state(self, pipeline_id, state):
+        """
+        Request a state change of a pipeline. The time until the pipeline reaches the state is recorded.
+
+        Args:
+            pipeline_id (int): The ID of the pipeline.
+            state (Gst.State): The target state.
+
+        Returns:
+            Gst.StateChangeReturn: The result of the state change, or None if the pipeline was torn down.
+        """
+        record = self.get_record(pipeline_id)
+        if record is None:
+            return None
+
+        record["state_request"] = (record["state"], state, time.monotonic())
+        result = record["pipeline"].set_state(state)
+        if result == Gst.StateChangeReturn.FAILURE:
+            print(f"Failed to set {record['name']} pipeline to {state.value_nick}.")
+            self.logger.error(f"Failed to set {record['name']} pipeline #{pipeline_id} to {state.value_nick}.")
+        return result
+
+
+    def start(self, pipeline_id):
+        """
+        Set a pipeline to PLAYING.
+
+        Args:
+            pipeline_id (int): The ID of the pipeline.
+
+        Returns:
+            Gst.StateChangeReturn: The result of the state change, or None if the pipeline was torn down.
+        """
+        record = self.get_record(pipeline_id)
+        if record is not None:
+            record["started"] = True
+        return self.set_state(pipeline_id, Gst.State.PLAYING)
+
+
+    def send_eos(self, pipeline_id):
+        """
+        Send an End-of-Stream (EOS) event to a pipeline.
+
+        Args:
+            pipeline_id (int): The ID of the pipeline.
+        """
+        record = self.get_record(pipeline_id)
+        if record is not None:
+            record["pipeline"].send_event(Gst.Event.new_eos())
+
+
+    def stop(self, pipeline_id, timeout=2):
+        """
+        Send EOS to a pipeline, wait until every sink has received it and tear the pipeline down. Must not be
+        called from the main loop thread, which delivers the EOS.
+
+        Args:
+            pipeline_id (int): The ID of the pipeline.
+            timeout (float, optional): Seconds to wait for the pipeline to drain (default is 2).
+
+        Returns:
+            bool: True if the pipeline drained before the timeout, False otherwise.
+        """
+        record = self.get_record(pipeline_id)
+        if record is None:
+            return True
+
+        drained = True
+        if record["started"]:
+            record["pipeline"].send_event(Gst.Event.new_eos())
+            drained = record["eos_event"].wait(timeout)
+        self.teardown(pipeline_id)
+        return drained
+
+
+    def teardown(self, pipeline_id):
+        """
+        Set a pipeline to NULL, remove its bus watch and forget about it. Safe to call more than once. Must not be
+        called from a streaming thread of the pipeline, use `teardown_async` there.
+
+        Args:
+            pipeline_id (int): The ID of the pipeline.
+        """
+        with self.pipelines_lock:
+            record = self.pipelines.pop(pipeline_id, None)
+            if record is None:
+                return
+            self.stats["torn_down"] += 1
+
+        start = time.monotonic()
+        record["pipeline"].set_state(Gst.State.NULL)
+        self.record_latency(record["state"], Gst.State.NULL, start)
+        record["bus"].remove_watch()
+        # wake up anyone still waiting for the pipeline to drain
+        record["eos_event"].set()
+
+
+    def teardown_async(self, pipeline_id):
+        """
+        Tear a pipeline down from the main loop thread, e.g. when requested from one of its streaming threads.
+
+        Args:
+            pipeline_id (int): The ID of the pipeline.
+        """
+        GLib.idle_add(lambda: self.teardown(pipeline_id) and False)
+
+
+    def on_bus_message(self, bus, message, pipeline_id):
+        """
+        Handle the bus messages of all pipelines, keep track of their states and forward the messages to the
+        pipeline owners. Runs in the main loop thread.
+
+        Args:
+            bus (Gst.Bus): The GStreamer bus.
+            message (Gst.Message): The GStreamer message to process.
+            pipeline_id (int): The ID of the pipeline the bus belongs to.
+
+        Returns:
+            bool: True, to keep the bus watch.
+        """
+        record = self.get_record(pipeline_id)
+        if record is None:
+            return True
+
+        if message.type == Gst.MessageType.STATE_CHANGED and message.src == record["pipeline"]:
+            _, new_state, _ = message.parse_state_changed()
+            record["state"] = new_state
+            state_request = record["state_request"]
+            if state_request is not None and state_request[1] == new_state:
+                self.record_latency(state_request[0], new_state, state_request[2])
+                record["state_request"] = None
+
+        elif message.type == Gst.MessageType.ERROR:
+            with self.pipelines_lock:
+                self.stats["errors"] += 1
+
+        try:
+            if record["on_message"] is not None:
+                record["on_message"](bus, message)
+        finally:
+            # the owner handles the message first, so whoever waits for the drain sees e.g. the error it recorded
+            if message.type in (Gst.MessageType.EOS, Gst.MessageType.ERROR):
+                record["eos_event"].set()
+        return True
+
+
+    def record_latency(self, from_state, to_state, started_at):
+        """
+        Record how long a state change took.
+
+        Args:
+            from_state (Gst.State): The state of the pipeline when the change was requested.
+            to_state (Gst.State): The state the pipeline reached.
+            started_at (float): The `time.monotonic()` timestamp of the request.
+        """
+        latency_ms = (time.monotonic() - started_at) * 1000
+        key = f"{from_state.value_nick}->{to_state.value_nick}"
+        with self.pipelines_lock:
+            latency = self.state_latency.setdefault(key, {"count": 0, "total_ms": 0.0, "max_ms": 0.0})
+            latency["count"] += 1
+            latency["total_ms"] += latency_ms
+            latency["max_ms"] = max(latency["max_ms"], latency_ms)
+
+
+    def check_leaks(self):
+        """
+        Log pipelines that have been alive for longer than the leak timeout. Runs periodically in the main loop
+        thread.
+
+        Returns:
+            bool: True, to keep the periodic check running.
+        """
+        now = time.monotonic()
+        with self.pipelines_lock:
+            for pipeline_id, record in self.pipelines.items():
+                if record["long_lived"] or record["leak_reported"]:
+                    continue
+                if now - record["created_at"] > self.leak_timeout:
+                    record["leak_reported"] = True
+                    self.stats["leaks_reported"] += 1
+                    self.logger.warning(f"Pipeline #{pipeline_id} ({record['name']}) has been alive for "
+                                        f"{now - record['created_at']:.0f} seconds in state {record['state'].value_nick}, it may have leaked.")
+        return True
+
+
+    def get_stats(self):
+        """
+        Get the pipeline counters, the pipelines suspected to be leaked and the state change latencies.
+
+        Returns:
+            dict: Pipeline counts by owner and state, lifetime counters, suspected leaks and the count, average and
+                maximum latency of every state transition in milliseconds.
+        """
+        now = time.monotonic()
+        with self.pipelines_lock:
+            stats = dict(self.stats)
+            stats["active"] = len(self.pipelines)
+            stats["by_name"] = {}
+            stats["by_state"] = {}
+            stats["suspected_leaks"] = []
+            for pipeline_id, record in self.pipelines.items():
+                state = record["state"].value_nick
+                stats["by_name"][record["name"]] = stats["by_name"].get(record["name"], 0) + 1
+                stats["by_state"][state] = stats["by_state"].get(state, 0) + 1
+                age = now - record["created_at"]
+                if not record["long_lived"] and age > self.leak_timeout:
+                    stats["suspected_leaks"].append({"id": pipeline_id, "name": record["name"], "state": state, "age_seconds": round(age, 1)})
+            stats["state_latency_ms"] = {
+                key: {"count": latency["count"], "avg": latency["total_ms"] / latency["count"], "max": latency["max_ms"]}
+                for key, latency in self.state_latency.items()
+            }
+            return stats
@@ -0,0 +1,369 @@
+# SPDX-License-Identifier: Apache-2.0
+#
+# Copyright (c) 2023 Malik Talha
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import gi
+import threading
+from collections import deque
+gi.require_version('Gst', '1.0')
+from gi.repository import Gst, GLib
+from agl_service_voiceagent.utils.backpressure import Backpressure
+from agl_service_voiceagent.utils.config import get_config_value, get_logger
+from agl_service_voiceagent.utils.pipeline_manager import PipelineManager
+
+Gst.init(None)
+GLib.threads_init()
+
+
+class WarmPipeline:
+    """
+    WarmPipeline is a built capture pipeline along with the elements its owner has to configure. The appsink is
+    connected once when the pipeline is built and forwards samples to whatever handler the current owner set.
+    """
+
+    def __init__(self, pipeline, appsink=None, filesink=None, queue_monitors=None):
+        """
+        Initialize the WarmPipeline instance.
+
+        Args:
+            pipeline (Gst.Pipeline): The capture pipeline.
+            appsink (Gst.Element, optional): The appsink of the pipeline, if it has one.
+            filesink (Gst.Element, optional): The filesink of the pipeline, if it has one.
+            queue_monitors (dict, optional): The monitors of the bounded queues of the pipeline, by branch name.
+        """
+        self.pipeline = pipeline
+        self.pipeline_id = None
+        self.appsink = appsink
+        self.filesink = filesink
+        self.queue_monitors = queue_monitors or {}
+        self.sample_handler = None
+        if appsink is not None:
+            appsink.connect("new-sample", self.on_new_sample, None)
+
+
+    def on_new_sample(self, appsink, data) -> Gst.FlowReturn:
+        """
+        Forward a new sample from the appsink to the handler of the current owner.
+
+        Args:
+            appsink (Gst.AppSink): The GStreamer appsink.
+            data (object): User data (not used).
+
+        Returns:
+            Gst.FlowReturn: Indicates the status of buffer processing.
+        """
+        sample_handler = self.sample_handler
+        if sample_handler is None:
+            appsink.emit("pull-sample")
+            return Gst.FlowReturn.OK
+        return sample_handler(appsink, data)
+
+
+    def get_queue_stats(self):
+        """
+        Get the statistics of the bounded queues of the pipeline.
+
+        Returns:
+            dict: The queue statistics by branch name.
+        """
+        return {name: monitor.get_stats() for name, monitor in self.queue_monitors.items()}
+
+
+def build_capture_pipeline(channels=1, sample_rate=16000, with_appsink=True, with_filesink=False, backpressure=None):
+    """
+    Build a microphone capture pipeline: autoaudiosrc -> queue -> audioconvert -> capsfilter -> tee, with a branch to
+    an appsink and/or a branch to a WAV filesink hanging off the tee.
+
+    Args:
+        channels (int, optional): The number of audio channels (default is 1).
+        sample_rate (int, optional): The audio sample rate in Hz (default is 16000).
+        with_appsink (bool, optional): Add the appsink branch (default is True).
+        with_filesink (bool, optional): Add the WAV file branch, its location has to be set before the pipeline
+            leaves the READY state (default is False).
+        backpressure (Backpressure, optional): Bounds the queues and the appsink of the pipeline, they are unbounded
+            if None.
+
+    Returns:
+        WarmPipeline: The pipeline, in the NULL state.
+    """
+    pipeline = Gst.Pipeline()
+    autoaudiosrc = Gst.ElementFactory.make("autoaudiosrc", None)
+    queue = Gst.ElementFactory.make("queue", None)
+    audioconvert = Gst.ElementFactory.make("audioconvert", None)
+
+    capsfilter = Gst.ElementFactory.make("capsfilter", None)
+    caps = Gst.Caps.new_empty_simple("audio/x-raw")
+    caps.set_value("format", "S16LE")
+    caps.set_value("rate", sample_rate)
+    caps.set_value("channels", channels)
+    capsfilter.set_property("caps", caps)
+
+    # both the appsink and the file branches hang off a tee so either of them can be left out
+    tee = Gst.ElementFactory.make("tee", None)
+
+    for element in [autoaudiosrc, queue, audioconvert, capsfilter, tee]:
+        pipeline.add(element)
+
+    autoaudiosrc.link(queue)
+    queue.link(audioconvert)
+    audioconvert.link(capsfilter)
+    capsfilter.link(tee)
+
+    queue_monitors = {}
+    if backpressure is not None:
+        # the queue feeds the file branch too, so it blocks instead of dropping, the stream queue drops if need be
+        queue_monitors["capture"] = backpressure.configure_queue(queue, leaky=False)
+
+    appsink = None
+    if with_appsink:
+        stream_queue = Gst.ElementFactory.make("queue", None)
+        appsink = Gst.ElementFactory.make("appsink", None)
+        appsink.set_property("emit-signals", True)
+        appsink.set_property("sync", False)  # Set sync property to False to enable async processing
+        if backpressure is not None:
+            # the recognizer runs in this queue's streaming thread, so this is where a backlog builds up
+            queue_monitors["stream"] = backpressure.configure_queue(stream_queue)
+            backpressure.configure_appsink(appsink)
+
+        pipeline.add(stream_queue)
+        pipeline.add(appsink)
+        tee.link(stream_queue)
+        stream_queue.link(appsink)
+
+    filesink = None
+    if with_filesink:
+        file_queue = Gst.ElementFactory.make("queue", None)
+        wavenc = Gst.ElementFactory.make("wavenc", None)
+        filesink = Gst.ElementFactory.make("filesink", None)
+        if backpressure is not None:
+            # a dropped buffer would cut a hole into the recording, so the file queue keeps everything
+            queue_monitors["file"] = backpressure.monitor_queue(file_queue)
+
+        pipeline.add(file_queue)
+        pipeline.add(wavenc)
+        pipeline.add(filesink)
+        tee.link(file_queue)
+        file_queue.link(wavenc)
+        wavenc.link(filesink)
+
+    return WarmPipeline(pipeline, appsink, filesink, queue_monitors)
+
+
+class PipelinePool:
+    """
+    Pipeline Pool
+
+    Process-wide pool of pre-built capture pipelines. Pipelines are built in the background and parked in PAUSED
+    (READY if they write a file, since the file location can't change after READY), so starting a recording only
+    takes the transition to PLAYING. Pipelines are not reused, every leased pipeline is torn down by its owner and
+    the pool builds a replacement.
+    """
+
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls):
+        """
+        Get the unique instance of the class.
+
+        Returns:
+            PipelinePool: The instance of the class.
+        """
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = super(PipelinePool, cls).__new__(cls)
+                cls._instance.init_pool()
+        return cls._instance
+
+
+    def init_pool(self):
+        """
+        Initialize the pool state and start the refill thread if pipelines are kept warm.
+        """
+        self.logger = get_logger()
+        self.max_warm = max(0, int(get_config_value('WARM_PIPELINES', 'Audio', fallback='0')))
+        self.backpressure = Backpressure(int(get_config_value('MAX_BUFFERED_MS', 'Audio', fallback='500')),
+                                         get_config_value('BACKPRESSURE', 'Audio', fallback='drop_oldest'))
+        self.pipeline_manager = PipelineManager()
+        self.warm = {}  # layout -> deque of parked WarmPipeline
+        self.building = {}  # layout -> number of pipelines being built
+        self.cond = threading.Condition()
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "built": 0,
+            "discarded": 0,
+        }
+        self.refill_thread = None
+        if self.max_warm > 0:
+            self.refill_thread = threading.Thread(target=self.refill, name="pipeline-pool-refill", daemon=True)
+            self.refill_thread.start()
+
+
+    def get_layout(self, channels=1, sample_rate=16000, with_appsink=True, with_filesink=False):
+        """
+        Build the key of a pipeline layout.
+
+        Args:
+            channels (int, optional): The number of audio channels (default is 1).
+            sample_rate (int, optional): The audio sample rate in Hz (default is 16000).
+            with_appsink (bool, optional): The pipeline has an appsink branch (default is True).
+            with_filesink (bool, optional): The pipeline has a WAV file branch (default is False).
+
+        Returns:
+            tuple: The layout key.
+        """
+        return (int(channels), int(sample_rate), bool(with_appsink), bool(with_filesink))
+
+
+    def prewarm(self, layout):
+        """
+        Keep pipelines of a layout warm from now on. Layouts are also kept warm once they were acquired.
+
+        Args:
+            layout (tuple): The layout returned by `get_layout`.
+        """
+        if self.max_warm == 0:
+            return
+        with self.cond:
+            self.warm.setdefault(layout, deque())
+            self.cond.notify()
+
+
+    def acquire(self, layout, name, on_message=None):
+        """
+        Lease a pipeline, a parked one if available, otherwise one that is built right away.
+
+        Args:
+            layout (tuple): The layout returned by `get_layout`.
+            name (str): A name describing the new owner of the pipeline, used in stats and logs.
+            on_message (callable, optional): Called as `on_message(bus, message)` for every bus message of the
+                pipeline from now on.
+
+        Returns:
+            WarmPipeline: The pipeline, registered with the pipeline manager and owned by the caller.
+        """
+        warm_pipeline = None
+        if self.max_warm > 0:
+            with self.cond:
+                parked = self.warm.setdefault(layout, deque())
+                if parked:
+                    warm_pipeline = parked.popleft()
+                    self.stats["hits"] += 1
+                else:
+                    self.stats["misses"] += 1
+                self.cond.notify()
+
+        if warm_pipeline is None:
+            warm_pipeline = build_capture_pipeline(*layout, backpressure=self.backpressure)
+            warm_pipeline.pipeline_id = self.pipeline_manager.register(warm_pipeline.pipeline, name, on_message)
+        else:
+            self.pipeline_manager.assign(warm_pipeline.pipeline_id, name, on_message)
+        return warm_pipeline
+
+
+    def build_parked(self, layout):
+        """
+        Build a pipeline and park it, ready to be leased.
+
+        Args:
+            layout (tuple): The layout of the pipeline.
+
+        Returns:
+            WarmPipeline: The parked pipeline, or None if it could not be parked.
+        """
+        warm_pipeline = build_capture_pipeline(*layout, backpressure=self.backpressure)
+        warm_pipeline.pipeline_id = self.pipeline_manager.register(
+            warm_pipeline.pipeline, "warm_pipeline",
+            lambda bus, message: self.on_parked_message(warm_pipeline, message), long_lived=True)
+
+        park_state = Gst.State.READY if warm_pipeline.filesink is not None else Gst.State.PAUSED
+        if self.pipeline_manager.set_state(warm_pipeline.pipeline_id, park_state) == Gst.StateChangeReturn.FAILURE:
+            self.pipeline_manager.teardown(warm_pipeline.pipeline_id)
+            return None
+        return warm_pipeline
+
+
+    def refill(self):
+        """
+        Keep every known layout filled up to the configured number of warm pipelines. Runs in the refill thread.
+        """
+        while True:
+            with self.cond:
+                layout = None
+                while layout is None:
+                    for candidate, parked in self.warm.items():
+                        if len(parked) + self.building.get(candidate, 0) < self.max_warm:
+                            layout = candidate
+                            break
+                    else:
+                        self.cond.wait()
+                self.building[layout] = self.building.get(layout, 0) + 1
+
+            # building and parking can take a few hundred ms, so it is done outside of the lock
+            try:
+                warm_pipeline = self.build_parked(layout)
+            except Exception as e:
+                self.logger.error(f"Failed to build a warm pipeline: {e}")
+                warm_pipeline = None
+
+            with self.cond:
+                self.building[layout] -= 1
+                if warm_pipeline is not None:
+                    self.warm[layout].append(warm_pipeline)
+                    self.stats["built"] += 1
+                else:
+                    # don't spin on a broken audio device, the next acquire retries
+                    self.cond.wait(5)
+
+
+    def on_parked_message(self, warm_pipeline, message):
+        """
+        Drop a parked pipeline that reported an error, e.g. because the audio device went away.
+
+        Args:
+            warm_pipeline (WarmPipeline): The parked pipeline.
+            message (Gst.Message): The GStreamer message to process.
+        """
+        if message.type != Gst.MessageType.ERROR:
+            return
+
+        with self.cond:
+            for parked in self.warm.values():
+                if warm_pipeline in parked:
+                    parked.remove(warm_pipeline)
+                    self.stats["discarded"] += 1
+                    break
+            else:
+                # the pipeline was leased in the meantime, its owner handles the error
+                return
+            self.cond.notify()
+
+        err, _ = message.parse_error()
+        self.logger.warning(f"Discarding warm pipeline #{warm_pipeline.pipeline_id}: {err.message}")
+        self.pipeline_manager.teardown(warm_pipeline.pipeline_id)
+
+
+    def get_stats(self):
+        """
+        Get the pool counters.
+
+        Returns:
+            dict: Hit/miss counters, the number of pipelines built and discarded, and the parked pipelines per layout.
+        """
+        with self.cond:
+            stats = dict(self.stats)
+            stats["parked"] = {str(layout): len(parked) for layout, parked in self.warm.items()}
+            return stats
@@ -0,0 +1,221 @@
+# SPDX-License-Identifier: Apache-2.0
+#
+# Copyright (c) 2023 Malik Talha
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import time
+import threading
+from collections import deque
+
+
+class RecognizerPoolExhausted(Exception):
+    """
+    Raised when no recognizer could be leased from the pool before the acquire timeout expired.
+    """
+    pass
+
+
+class RecognizerPool:
+    """
+    RecognizerPool is a bounded, thread-safe pool of pre-built Vosk recognizers.
+
+    Recognizers are leased with `acquire` and handed back with `release`, which resets them
+    so they can be reused by the next session instead of being constructed from scratch.
+    """
+
+    def __init__(self, factory, min_size=1, max_size=4, idle_timeout=60.0, acquire_timeout=5.0):
+        """
+        Initialize the RecognizerPool instance and pre-warm `min_size` recognizers.
+
+        Args:
+            factory (callable): A callable that builds and returns a new recognizer.
+            min_size (int, optional): The number of recognizers kept warm at all times (default is 1).
+            max_size (int, optional): The maximum number of recognizers the pool can own (default is 4).
+            idle_timeout (float, optional): Seconds an idle recognizer above `min_size` is kept before
+                being dropped (default is 60.0).
+            acquire_timeout (float, optional): Default number of seconds to wait for a free recognizer
+                when the pool is at `max_size` (default is 5.0).
+        """
+        self.factory = factory
+        self.max_size = max(1, int(max_size))
+        self.min_size = max(0, min(int(min_size), self.max_size))
+        self.idle_timeout = idle_timeout
+        self.acquire_timeout = acquire_timeout
+        self._idle = deque()  # (recognizer, released_at) pairs, most recently released on the right
+        self._size = 0  # recognizers owned by the pool, both idle and leased
+        self._in_use = 0
+        self._cond = threading.Condition()
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "waits": 0,
+            "timeouts": 0,
+            "created": 0,
+            "destroyed": 0,
+            "peak_in_use": 0,
+        }
+        self.prewarm()
+
+
+    def prewarm(self):
+        """
+        Build recognizers until the pool owns at least `min_size` of them.
+        """
+        while True:
+            with self._cond:
+                if self._size >= self.min_size:
+                    return
+                self._size += 1
+
+            try:
+                recognizer = self.factory()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                    self._cond.notify()
+                raise
+
+            with self._cond:
+                self.stats["created"] += 1
+                self._idle.append((recognizer, time.monotonic()))
+                self._cond.notify()
+
+
+    def acquire(self, timeout=None):
+        """
+        Lease a recognizer from the pool, building a new one if none is idle and the pool is not full.
+
+        Args:
+            timeout (float, optional): Seconds to wait for a recognizer when the pool is full. Defaults
+                to the pool's `acquire_timeout`.
+
+        Returns:
+            object: A recognizer that must be handed back with `release` or `discard`.
+
+        Raises:
+            RecognizerPoolExhausted: If no recognizer became available before the timeout.
+        """
+        timeout = self.acquire_timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        waited = False
+
+        with self._cond:
+            while True:
+                if self._idle:
+                    recognizer, _ = self._idle.pop()
+                    self.stats["hits"] += 1
+                    self._mark_leased()
+                    return recognizer
+
+                if self._size < self.max_size:
+                    # reserve a slot and build the recognizer outside of the lock
+                    self._size += 1
+                    self.stats["misses"] += 1
+                    self._mark_leased()
+                    break
+
+                if not waited:
+                    self.stats["waits"] += 1
+                    waited = True
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.stats["timeouts"] += 1
+                    raise RecognizerPoolExhausted(f"No recognizer available after waiting {timeout} seconds.")
+                self._cond.wait(remaining)
+
+        try:
+            recognizer = self.factory()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+        with self._cond:
+            self.stats["created"] += 1
+        return recognizer
+
+
+    def release(self, recognizer):
+        """
+        Reset a leased recognizer and return it to the pool.
+
+        Args:
+            recognizer (object): The recognizer previously returned by `acquire`.
+        """
+        try:
+            recognizer.Reset()
+        except Exception:
+            self.discard(recognizer)
+            return
+
+        with self._cond:
+            self._in_use -= 1
+            self._idle.append((recognizer, time.monotonic()))
+            self._shrink()
+            self._cond.notify()
+
+
+    def discard(self, recognizer):
+        """
+        Drop a leased recognizer instead of returning it to the pool, e.g. if it is in a bad state.
+
+        Args:
+            recognizer (object): The recognizer previously returned by `acquire`.
+        """
+        with self._cond:
+            self._in_use -= 1
+            self._size -= 1
+            self.stats["destroyed"] += 1
+            self._cond.notify()
+
+
+    def get_stats(self):
+        """
+        Get a snapshot of the pool counters.
+
+        Returns:
+            dict: Hit/miss/wait counters along with the current pool size, idle and in-use counts.
+        """
+        with self._cond:
+            stats = dict(self.stats)
+            stats["size"] = self._size
+            stats["idle"] = len(self._idle)
+            stats["in_use"] = self._in_use
+            return stats
+
+
+    def _mark_leased(self):
+        """
+        Update the in-use counters after a lease. Must be called with the pool lock held.
+        """
+        self._in_use += 1
+        self.stats["peak_in_use"] = max(self.stats["peak_in_use"], self._in_use)
+
+
+    def _shrink(self):
+        """
+        Drop the coldest idle recognizers that exceeded the idle timeout while the pool is above
+        `min_size`. Must be called with the pool lock held.
+        """
+        now = time.monotonic()
+        while self._idle and self._size > self.min_size:
+            _, released_at = self._idle[0]
+            if now - released_at < self.idle_timeout:
+                break
+            self._idle.popleft()
+            self._size -= 1
+            self.stats["destroyed"] += 1
@@ -0,0 +1,104 @@
+# SPDX-License-Identifier: Apache-2.0
+#
+# Copyright (c) 2023 Malik Talha
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+class AudioRingBuffer:
+    """
+    AudioRingBuffer is a fixed-capacity byte ring buffer for audio.
+
+    Every byte is stored twice, at its position and at its position plus the capacity. This way any window of up
+    to `capacity` bytes is contiguous in memory and can be handed out as a zero-copy memoryview, no matter where
+    the write position wrapped around.
+    """
+
+    def __init__(self, capacity):
+        """
+        Initialize the AudioRingBuffer instance.
+
+        Args:
+            capacity (int): The number of most recent bytes the buffer retains.
+        """
+        self.capacity = int(capacity)
+        self.buffer = bytearray(self.capacity * 2)
+        self.view = memoryview(self.buffer)
+        self.write_pos = 0  # total number of bytes ever written
+
+
+    def write(self, data):
+        """
+        Append data to the buffer, overwriting the oldest bytes once the buffer is full.
+
+        Args:
+            data (bytes-like): The data to append.
+        """
+        data = memoryview(data).cast("B")
+        total_length = len(data)
+        if total_length > self.capacity:
+            # only the most recent bytes can be retained
+            data = data[total_length - self.capacity:]
+
+        length = len(data)
+        start = (self.write_pos + total_length - length) % self.capacity
+        first = min(length, self.capacity - start)
+        rest = length - first
+
+        self.view[start:start + first] = data[:first]
+        self.view[start + self.capacity:start + self.capacity + first] = data[:first]
+        if rest:
+            self.view[0:rest] = data[first:]
+            self.view[self.capacity:self.capacity + rest] = data[first:]
+
+        self.write_pos += total_length
+
+
+    def read(self, start, length):
+        """
+        Get a zero-copy view of a window of the buffer.
+
+        The view is only valid until the window is overwritten, callers must consume it before writing more data.
+
+        Args:
+            start (int): The absolute position (in bytes written so far) of the first byte of the window.
+            length (int): The length of the window in bytes.
+
+        Returns:
+            memoryview: A read-only view of the window.
+
+        Raises:
+            ValueError: If the window is no longer, or not yet, held by the buffer.
+        """
+        if length > self.capacity or start < self.write_pos - self.capacity or start + length > self.write_pos:
+            raise ValueError(f"Window [{start}, {start + length}) is not available in the ring buffer.")
+
+        offset = start % self.capacity
+        return self.view[offset:offset + length].toreadonly()
+
+
+    def get_oldest_position(self):
+        """
+        Get the absolute position of the oldest byte still held by the buffer.
+
+        Returns:
+            int: The absolute position of the oldest retained byte.
+        """
+        return max(0, self.write_pos - self.capacity)
+
+
+    def clear(self):
+        """
+        Drop all data from the buffer.
+        """
+        self.write_pos = 0
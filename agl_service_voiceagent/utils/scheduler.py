@@ -0,0 +1,282 @@
+# SPDX-License-Identifier: Apache-2.0
+#
+# Copyright (c) 2023 Malik Talha
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from agl_service_voiceagent.utils.admission import AdmissionStage
+from agl_service_voiceagent.utils.config import get_config_value, get_logger
+
+
+def parse_cpus(cpus):
+    """
+    Parse a CPU list like '2,3' or '0-1,4'.
+
+    Args:
+        cpus (str): The CPU list, empty for all CPUs.
+
+    Returns:
+        set: The CPU numbers, or None if the list is empty.
+    """
+    result = set()
+    for part in cpus.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            first, last = part.split("-", 1)
+            result.update(range(int(first), int(last) + 1))
+        else:
+            result.add(int(part))
+    return result or None
+
+
+class PriorityClass:
+    """
+    PriorityClass is a class of threads that share a CPU set and a nice value. Threads started by a thread of the
+    class inherit both, including the streaming threads of GStreamer pipelines started from it.
+    """
+
+    def __init__(self, name, cpus=None, nice=0):
+        """
+        Initialize the PriorityClass instance.
+
+        Args:
+            name (str): The name of the class.
+            cpus (set, optional): The CPUs the threads of the class are pinned to, all CPUs if None.
+            nice (int, optional): The nice value added to the threads of the class (default is 0).
+        """
+        self.name = name
+        self.cpus = cpus
+        self.nice = nice
+
+
+    def apply(self, local):
+        """
+        Move the calling thread into the class. A nice value can't be lowered again without privileges, so this is
+        meant for threads that stay in the class.
+
+        Args:
+            local (threading.local): Records the class of the calling thread.
+        """
+        self.pin()
+        if self.nice:
+            try:
+                # on Linux the nice value is per thread
+                os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), self.nice)
+            except OSError as e:
+                print(f"Failed to set nice value {self.nice} for '{self.name}' thread: {e}")
+        local.priority_class = self.name
+
+
+    def pin(self):
+        """
+        Pin the calling thread to the CPUs of the class.
+
+        Returns:
+            set: The CPUs the thread was allowed to run on before, or None if it was not pinned.
+        """
+        if self.cpus is None or not hasattr(os, "sched_setaffinity"):
+            return None
+        previous = os.sched_getaffinity(0)
+        try:
+            os.sched_setaffinity(0, self.cpus)
+        except OSError as e:
+            print(f"Failed to pin '{self.name}' thread to CPUs {sorted(self.cpus)}: {e}")
+            return None
+        return previous
+
+
+    def create_executor(self, max_workers, thread_name_prefix, local):
+        """
+        Create a thread pool whose threads belong to the class.
+
+        Args:
+            max_workers (int): The number of threads.
+            thread_name_prefix (str): The name prefix of the threads.
+            local (threading.local): Records the class of each thread.
+
+        Returns:
+            ThreadPoolExecutor: The thread pool.
+        """
+        return ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=thread_name_prefix,
+                                  initializer=self.apply, initargs=(local,))
+
+
+class Scheduler:
+    """
+    Scheduler
+
+    Process-wide priority classes for the RPCs. Wake word detection and voice command capture are 'realtime', they
+    may be pinned to CPUs of their own. Text commands and command execution from scripted clients are 'batch', they
+    run in a small pool of threads with a raised nice value, optionally pinned to other CPUs, and only a bounded
+    number of them may be in flight, so they can't take every thread of the gRPC server.
+    """
+
+    # RPC name -> priority class, RPCs that are not listed run in the thread that received them
+    RPC_CLASSES = {
+        "DetectWakeWord": "realtime",
+        "S_DetectWakeWord": "realtime",
+        "RecognizeVoiceCommand": "realtime",
+        "S_RecognizeVoiceCommand": "realtime",
+        "RecognizeTextCommand": "batch",
+        "ExecuteCommand": "batch",
+        "RecognizeVoiceAndExecute": "realtime",
+        "RecognizeTextAndExecute": "batch",
+        "S_RecognizeTextCommand": "batch",
+    }
+
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls):
+        """
+        Get the unique instance of the class.
+
+        Returns:
+            Scheduler: The instance of the class.
+        """
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = super(Scheduler, cls).__new__(cls)
+                cls._instance.init_scheduler()
+        return cls._instance
+
+
+    def init_scheduler(self):
+        """
+        Create the priority classes and the batch thread pools from the [Scheduler] section of the config.
+        """
+        self.logger = get_logger()
+        self.local = threading.local()
+        self.classes = {
+            "realtime": PriorityClass("realtime", parse_cpus(get_config_value('REALTIME_CPUS', 'Scheduler', fallback=''))),
+            "batch": PriorityClass("batch", parse_cpus(get_config_value('BATCH_CPUS', 'Scheduler', fallback='')),
+                                   int(get_config_value('BATCH_NICE', 'Scheduler', fallback='10'))),
+        }
+        batch_workers = int(get_config_value('BATCH_WORKERS', 'Scheduler', fallback='2'))
+        batch_queue = int(get_config_value('BATCH_QUEUE', 'Scheduler', fallback='4'))
+        batch_timeout = int(get_config_value('BATCH_QUEUE_TIMEOUT_MS', 'Scheduler', fallback='5000')) / 1000
+        self.batch_executor = self.create_executor("batch", batch_workers, "batch-worker")
+        # batch RPCs over the limit wait on the thread that received them, the queue bounds how many threads that is
+        self.batch_stage = AdmissionStage("batch", batch_workers, batch_queue, batch_timeout)
+        # streaming batch RPCs stay open as long as their client, so they are admitted apart from the batch thread pool
+        batch_streams = int(get_config_value('BATCH_STREAMS', 'Scheduler', fallback='2'))
+        self.stream_stage = AdmissionStage("batch_stream", batch_streams, batch_queue, batch_timeout)
+        # the commands of a S_RecognizeTextCommand stream are recognized in a pool of their own, also in the batch class
+        text_workers = int(get_config_value('TEXT_WORKERS', 'Scheduler', fallback='4'))
+        self.text_executor = self.create_executor("batch", text_workers, "text-worker")
+        self.text_window = int(get_config_value('TEXT_WINDOW', 'Scheduler', fallback='64'))
+        for priority_class in self.classes.values():
+            if priority_class.cpus is not None:
+                self.logger.info(f"Pinning {priority_class.name} threads to CPUs {sorted(priority_class.cpus)}.")
+
+
+    def get_class(self, rpc_name):
+        """
+        Get the priority class of an RPC.
+
+        Args:
+            rpc_name (str): The name of the RPC.
+
+        Returns:
+            str: The name of the priority class, or None if the RPC is not scheduled.
+        """
+        return self.RPC_CLASSES.get(rpc_name)
+
+
+    def get_current_class(self):
+        """
+        Get the priority class of the calling thread.
+
+        Returns:
+            str: The name of the priority class, or None if the thread does not belong to one.
+        """
+        return getattr(self.local, "priority_class", None)
+
+
+    def apply_thread_class(self, class_name):
+        """
+        Move the calling thread into a priority class for good, for long-lived threads.
+
+        Args:
+            class_name (str): The name of the priority class.
+        """
+        self.classes[class_name].apply(self.local)
+
+
+    def create_executor(self, class_name, max_workers, thread_name_prefix):
+        """
+        Create a thread pool whose threads belong to a priority class.
+
+        Args:
+            class_name (str): The name of the priority class.
+            max_workers (int): The number of threads.
+            thread_name_prefix (str): The name prefix of the threads.
+
+        Returns:
+            ThreadPoolExecutor: The thread pool.
+        """
+        return self.classes[class_name].create_executor(max_workers, thread_name_prefix, self.local)
+
+
+    @contextmanager
+    def pinned(self, class_name):
+        """
+        Pin the calling thread to the CPUs of a priority class for the duration of a `with` block, for threads that
+        serve RPCs of different classes. The nice value is left as is.
+
+        Args:
+            class_name (str): The name of the priority class.
+        """
+        previous_class = self.get_current_class()
+        previous_cpus = self.classes[class_name].pin()
+        self.local.priority_class = class_name
+        try:
+            yield
+        finally:
+            self.local.priority_class = previous_class
+            if previous_cpus is not None:
+                os.sched_setaffinity(0, previous_cpus)
+
+
+    def run_batch(self, func, *args):
+        """
+        Run a call in the batch thread pool and wait for it.
+
+        Args:
+            func (callable): The function to call.
+            *args: The arguments of the function.
+
+        Returns:
+            object: The return value of the function.
+
+        Raises:
+            AdmissionRejected: If too many batch calls are in flight.
+        """
+        with self.batch_stage.slot():
+            return self.batch_executor.submit(func, *args).result()
+
+
+    def get_stats(self):
+        """
+        Get the statistics of the batch queues.
+
+        Returns:
+            dict: The admission statistics of the batch thread pool and of the streaming batch RPCs.
+        """
+        return {"batch": self.batch_stage.get_stats(), "batch_stream": self.stream_stage.get_stats()}
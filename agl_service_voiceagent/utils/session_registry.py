@@ -0,0 +1,131 @@
+# SPDX-License-Identifier: Apache-2.0
+#
+# Copyright (c) 2023 Malik Talha
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import time
+import threading
+
+
+class SessionRegistry:
+    """
+    SessionRegistry is a thread-safe registry of sessions that span several requests, e.g. a manual voice command
+    recording between its START and STOP requests.
+
+    Sessions expire once they exceed a maximum duration. A background reaper thread evicts expired sessions and hands
+    them to an eviction callback, so resources held by sessions whose client went away are released.
+    """
+
+    def __init__(self, max_duration=60, reap_interval=5, on_evict=None):
+        """
+        Initialize the SessionRegistry instance and start the reaper thread.
+
+        Args:
+            max_duration (float, optional): Seconds after which a session is evicted (default is 60).
+            reap_interval (float, optional): Seconds between two checks for expired sessions (default is 5).
+            on_evict (callable, optional): Called as `on_evict(session_id, session, reason)` from the reaper thread
+                for every evicted session, `reason` is 'max_duration'.
+        """
+        self.max_duration = max_duration
+        self.reap_interval = reap_interval
+        self.on_evict = on_evict
+        self.sessions = {}  # session_id -> (session, created_at)
+        self.sessions_lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.stats = {
+            "added": 0,
+            "removed": 0,
+            "evicted_max_duration": 0,
+            "peak": 0,
+        }
+        self.reaper_thread = threading.Thread(target=self.reap, name="session-reaper", daemon=True)
+        self.reaper_thread.start()
+
+
+    def add(self, session_id, session):
+        """
+        Register a new session.
+
+        Args:
+            session_id (str): The unique ID of the session.
+            session (object): The session state.
+        """
+        now = time.monotonic()
+        with self.sessions_lock:
+            self.sessions[session_id] = (session, now)
+            self.stats["added"] += 1
+            self.stats["peak"] = max(self.stats["peak"], len(self.sessions))
+
+
+    def pop(self, session_id):
+        """
+        Remove a session and take ownership of its state.
+
+        Args:
+            session_id (str): The unique ID of the session.
+
+        Returns:
+            object: The session state, or None if the session is unknown or was evicted.
+        """
+        with self.sessions_lock:
+            entry = self.sessions.pop(session_id, None)
+            if entry is None:
+                return None
+            self.stats["removed"] += 1
+            return entry[0]
+
+
+    def reap(self):
+        """
+        Evict expired sessions until the registry is stopped. Runs in the reaper thread.
+        """
+        while not self.stop_event.wait(self.reap_interval):
+            now = time.monotonic()
+            expired = []
+            with self.sessions_lock:
+                for session_id, (session, created_at) in list(self.sessions.items()):
+                    if now - created_at <= self.max_duration:
+                        continue
+                    reason = "max_duration"
+                    del self.sessions[session_id]
+                    self.stats[f"evicted_{reason}"] += 1
+                    expired.append((session_id, session, reason))
+
+            # the callback may block while it releases resources, so it runs outside of the lock
+            for session_id, session, reason in expired:
+                if self.on_evict is not None:
+                    try:
+                        self.on_evict(session_id, session, reason)
+                    except Exception as e:
+                        print(f"Failed to clean up evicted session {session_id}: {e}")
+
+
+    def stop(self):
+        """
+        Stop the reaper thread. Sessions left in the registry are not evicted.
+        """
+        self.stop_event.set()
+
+
+    def get_stats(self):
+        """
+        Get the session counters.
+
+        Returns:
+            dict: The number of live sessions along with the added, removed, evicted and peak session counters.
+        """
+        with self.sessions_lock:
+            stats = dict(self.stats)
+            stats["live"] = len(self.sessions)
+            return stats
@@ -18,71 +18,314 @@ import os
 import json
 import vosk
 import wave
+import threading
 from agl_service_voiceagent.utils.common import generate_unique_uuid
+from agl_service_voiceagent.utils.config import get_logger
+from agl_service_voiceagent.utils.recognizer_pool import RecognizerPool
 
 class STTModel:
     """
     STTModel is a class for speech-to-text (STT) recognition using the Vosk speech recognition library.
     """
 
-    def __init__(self, model_path, sample_rate=16000):
+    def __init__(self, model_path, sample_rate=16000, pool_min_size=1, pool_max_size=4, pool_idle_timeout=60.0, pool_acquire_timeout=5.0):
         """
         Initialize the STTModel instance with the provided model and sample rate.
 
         Args:
             model_path (str): The path to the Vosk speech recognition model.
             sample_rate (int, optional): The audio sample rate in Hz (default is 16000).
+            pool_min_size (int, optional): The number of pre-built recognizers kept warm (default is 1).
+            pool_max_size (int, optional): The maximum number of recognizers leased at once (default is 4).
+            pool_idle_timeout (float, optional): Seconds an extra idle recognizer is kept around (default is 60.0).
+            pool_acquire_timeout (float, optional): Seconds to wait for a free recognizer (default is 5.0).
         """
         self.sample_rate = sample_rate
         self.model = vosk.Model(model_path)
+        # grammars need a dynamic decoding graph, models with a static HCLG graph ignore them
+        self.supports_grammar = os.path.exists(os.path.join(model_path, "graph", "HCLr.fst")) or \
+            not os.path.exists(os.path.join(model_path, "graph", "HCLG.fst"))
+        self.rejected_grammars = set()
+        self.rejected_grammars_lock = threading.Lock()
         self.recognizer = {}
+        self.recognizer_lock = threading.Lock()
         self.chunk_size = 1024
+        self.pool_configs = {}
+        self.configure_pool("stt", pool_max_size, pool_idle_timeout, pool_acquire_timeout)
+        self.recognizer_pools = {}
+        self.recognizer_pool = self.get_recognizer_pool(self.sample_rate, min_size=pool_min_size)
+
+
+    def _create_recognizer(self, sample_rate, grammar=None):
+        """
+        Build a new Vosk recognizer for the recognizer pool.
+
+        Args:
+            sample_rate (int): The sample rate of the audio the recognizer will be fed with.
+            grammar (str, optional): A JSON list of the phrases the recognizer is restricted to.
+
+        Returns:
+            vosk.KaldiRecognizer: A new recognizer bound to the loaded model.
+        """
+        recognizer = None
+        if grammar and not self.supports_grammar:
+            self._warn_grammar_rejected(grammar, "the model has a static decoding graph")
+        elif grammar:
+            try:
+                recognizer = vosk.KaldiRecognizer(self.model, sample_rate, grammar)
+            except Exception as e:
+                self._warn_grammar_rejected(grammar, e)
+        if recognizer is None:
+            recognizer = vosk.KaldiRecognizer(self.model, sample_rate)
+        recognizer.SetWords(True)
+        return recognizer
+
+
+    def _warn_grammar_rejected(self, grammar, reason):
+        """
+        Log once per grammar that the model can't use it, the recognizers then decode the open vocabulary.
+
+        Args:
+            grammar (str): The grammar that was rejected.
+            reason (object): Why the grammar was rejected.
+        """
+        with self.rejected_grammars_lock:
+            if grammar in self.rejected_grammars:
+                return
+            self.rejected_grammars.add(grammar)
+        get_logger().warning(f"The model rejected the grammar {grammar} ({reason}), decoding the open vocabulary instead.")
+
+
+    def configure_pool(self, pool_name, max_size=4, idle_timeout=60.0, acquire_timeout=5.0):
+        """
+        Set the limits of a named group of recognizer pools, e.g. to size the recognizers of long-lived wake word
+        streams apart from those of voice commands. Only pools created after the call use the limits.
+
+        Args:
+            pool_name (str): The name of the pool group.
+            max_size (int, optional): The maximum number of recognizers leased at once per pool (default is 4).
+            idle_timeout (float, optional): Seconds an extra idle recognizer is kept around (default is 60.0).
+            acquire_timeout (float, optional): Seconds to wait for a free recognizer (default is 5.0).
+        """
+        with self.recognizer_lock:
+            self.pool_configs[pool_name] = {
+                "max_size": max_size,
+                "idle_timeout": idle_timeout,
+                "acquire_timeout": acquire_timeout
+            }
+
+
+    def get_recognizer_pool(self, sample_rate=None, min_size=0, grammar=None, pool_name="stt"):
+        """
+        Get the recognizer pool for a sample rate and grammar, creating it on first use.
+
+        Pools other than the model's default one are created lazily and start empty.
+
+        Args:
+            sample_rate (int, optional): The audio sample rate in Hz. Defaults to the model's sample rate.
+            min_size (int, optional): The number of recognizers pre-warmed when the pool is created (default is 0).
+            grammar (str, optional): A JSON list of the phrases the pool's recognizers are restricted to. Open
+                vocabulary recognizers are used if None.
+            pool_name (str, optional): The pool group, see `configure_pool`. Groups that were not configured use the
+                limits of the 'stt' group (default is 'stt').
+
+        Returns:
+            RecognizerPool: The recognizer pool for the sample rate and grammar.
+        """
+        sample_rate = int(sample_rate or self.sample_rate)
+        key = (sample_rate, grammar, pool_name)
+        with self.recognizer_lock:
+            pool = self.recognizer_pools.get(key)
+            if pool is None:
+                pool_config = self.pool_configs.get(pool_name, self.pool_configs["stt"])
+                pool = RecognizerPool(lambda: self._create_recognizer(sample_rate, grammar), min_size=min_size, **pool_config)
+                self.recognizer_pools[key] = pool
+            return pool
+
+
+    def _get_recognizer(self, uuid):
+        """
+        Get the Vosk recognizer leased to a session.
+
+        Args:
+            uuid (str): The unique identifier (UUID) for the session.
+
+        Returns:
+            vosk.KaldiRecognizer: The recognizer leased to the session.
+        """
+        with self.recognizer_lock:
+            return self.recognizer[uuid][0]
     
 
-    def setup_recognizer(self):
+    def setup_recognizer(self, sample_rate=None, grammar=None, pool_name="stt"):
         """
-        Set up a Vosk recognizer for a new session and return a unique identifier (UUID) for the session.
+        Lease a Vosk recognizer from the pool for a new session and return a unique identifier (UUID) for the session.
+
+        Args:
+            sample_rate (int, optional): The sample rate of the session audio. Defaults to the model's sample rate.
+            grammar (str, optional): A JSON list of phrases to restrict the recognizer to, see `build_grammar`.
+            pool_name (str, optional): The pool group to lease from, see `configure_pool` (default is 'stt').
 
         Returns:
             str: A unique identifier (UUID) for the session.
+
+        Raises:
+            RecognizerPoolExhausted: If all recognizers stayed leased for longer than the acquire timeout.
         """
-        uuid = generate_unique_uuid(6)
-        self.recognizer[uuid] = vosk.KaldiRecognizer(self.model, self.sample_rate)
+        pool = self.get_recognizer_pool(sample_rate, grammar=grammar, pool_name=pool_name)
+        recognizer = pool.acquire()
+        with self.recognizer_lock:
+            uuid = generate_unique_uuid(6)
+            while uuid in self.recognizer:
+                uuid = generate_unique_uuid(6)
+            self.recognizer[uuid] = (recognizer, pool)
         return uuid
 
 
+    def build_grammar(self, phrases):
+        """
+        Build a Vosk grammar that restricts recognition to a set of phrases.
+
+        Anything outside of the phrases is decoded as the `[unk]` token, so the decoding graph stays tiny. Note that
+        only models with a dynamic graph (e.g. the small Vosk models) honour grammars, big models ignore them.
+
+        Args:
+            phrases (list): The phrases the recognizer may output.
+
+        Returns:
+            str: The grammar as a JSON list, usable as a pool key.
+        """
+        unique_phrases = []
+        for phrase in phrases:
+            phrase = " ".join(phrase.lower().split())
+            if phrase and phrase not in unique_phrases:
+                unique_phrases.append(phrase)
+        return json.dumps(unique_phrases + ["[unk]"])
+
+
+    def _as_waveform(self, audio_data):
+        """
+        Prepare audio data for the Vosk recognizer without copying it. Vosk only reads the data during the call, so
+        views of buffers owned by someone else (e.g. a mapped GStreamer buffer or a ring buffer) are passed on as
+        they are.
+
+        Args:
+            audio_data (bytes-like): Audio data to process.
+
+        Returns:
+            bytes or cdata: Data that can be passed to `AcceptWaveform`.
+        """
+        if isinstance(audio_data, bytes):
+            return audio_data
+        ffi = getattr(vosk, "_ffi", None)
+        if ffi is None:
+            return bytes(audio_data)
+        # the cdata points into the buffer and keeps it alive, its length is the length in bytes
+        return ffi.from_buffer(memoryview(audio_data).cast("B"))
+
+
     def init_recognition(self, uuid, audio_data):
         """
         Initialize the Vosk recognizer for a session with audio data.
 
         Args:
             uuid (str): The unique identifier (UUID) for the session.
-            audio_data (bytes): Audio data to process.
+            audio_data (bytes-like): Audio data to process, it is not copied and only has to stay valid during the
+                call.
 
         Returns:
             bool: True if initialization was successful, False otherwise.
         """
-        return self.recognizer[uuid].AcceptWaveform(audio_data)
+        return self._get_recognizer(uuid).AcceptWaveform(self._as_waveform(audio_data))
 
 
-    def recognize(self, uuid, partial=False):
+    def recognize(self, uuid, partial=False, final=False):
         """
         Recognize speech and return the result as a JSON object.
 
         Args:
             uuid (str): The unique identifier (UUID) for the session.
             partial (bool, optional): If True, return partial recognition results (default is False).
+            final (bool, optional): If True, flush the recognizer and return the final result of the
+                utterance (default is False).
 
         Returns:
             dict: A JSON object containing recognition results.
         """
-        self.recognizer[uuid].SetWords(True)
+        recognizer = self._get_recognizer(uuid)
         if partial:
-            result = json.loads(self.recognizer[uuid].PartialResult())
+            result = json.loads(recognizer.PartialResult())
+        elif final:
+            result = json.loads(recognizer.FinalResult())
+            recognizer.Reset()
         else:
-            result = json.loads(self.recognizer[uuid].Result())
-            self.recognizer[uuid].Reset()
+            result = json.loads(recognizer.Result())
+            recognizer.Reset()
         return result
+
+
+    def recognize_stream(self, uuid, audio_chunks):
+        """
+        Recognize speech from an iterable of audio chunks, feeding each chunk into the recognizer as soon
+        as it is available instead of buffering the whole utterance.
+
+        Args:
+            uuid (str): The unique identifier (UUID) for the session.
+            audio_chunks (iterable): An iterable yielding bytes-like chunks of 16-bit mono PCM audio data.
+
+        Returns:
+            str: The recognized text or error messages.
+        """
+        texts = []
+        audio_received = False
+
+        for chunk in audio_chunks:
+            if not chunk:
+                continue
+            audio_received = True
+            text = self.accept_chunk(uuid, chunk)
+            if text is not None:
+                texts.append(text)
+
+        if not audio_received:
+            print("Voice not recognized. Please speak again...")
+            return "VOICE_NOT_RECOGNIZED"
+
+        return self.finish_stream(uuid, texts)
+
+
+    def accept_chunk(self, uuid, audio_chunk):
+        """
+        Feed one chunk of a stream into the recognizer, for callers that receive the audio chunk by chunk instead
+        of as an iterable.
+
+        Args:
+            uuid (str): The unique identifier (UUID) for the session.
+            audio_chunk (bytes-like): A chunk of 16-bit mono PCM audio data.
+
+        Returns:
+            str: The text of the utterance segment that ended with this chunk, or None if it did not end one.
+        """
+        recognizer = self._get_recognizer(uuid)
+        # Vosk signals the end of an utterance segment, its text is collected and decoding continues
+        if recognizer.AcceptWaveform(self._as_waveform(audio_chunk)):
+            return json.loads(recognizer.Result())["text"]
+        return None
+
+
+    def finish_stream(self, uuid, texts):
+        """
+        Finish recognizing a stream fed with `accept_chunk`.
+
+        Args:
+            uuid (str): The unique identifier (UUID) for the session.
+            texts (list): The texts of the utterance segments returned by `accept_chunk`.
+
+        Returns:
+            str: The recognized text of the whole stream.
+        """
+        texts = texts + [self.recognize(uuid, final=True)["text"]]
+        return " ".join(text for text in texts if text)
     
 
     def recognize_from_file(self, uuid, filename):
@@ -100,39 +343,41 @@ class STTModel:
             print(f"Audio file '{filename}' not found.")
             return "FILE_NOT_FOUND"
         
-        wf = wave.open(filename, "rb")
-        if wf.getnchannels() != 1 or wf.getsampwidth() != 2 or wf.getcomptype() != "NONE":
-            print("Audio file must be WAV format mono PCM.")
-            return "FILE_FORMAT_INVALID"
-        
-        # audio_data = wf.readframes(wf.getnframes())
-        # we need to perform chunking as target AGL system can't handle an entire audio file
-        audio_data = b""
-        while True:
-            chunk = wf.readframes(self.chunk_size)
-            if not chunk:
-                break  # End of file reached
-            audio_data += chunk
+        with wave.open(filename, "rb") as wf:
+            if wf.getnchannels() != 1 or wf.getsampwidth() != 2 or wf.getcomptype() != "NONE":
+                print("Audio file must be WAV format mono PCM.")
+                return "FILE_FORMAT_INVALID"
 
-        if audio_data:
-            if self.init_recognition(uuid, audio_data):
-                result = self.recognize(uuid)
-                return result['text']
-            else:
-                result = self.recognize(uuid, partial=True)
-                return result['partial']
+            # we need to perform chunking as target AGL system can't handle an entire audio file, each
+            # chunk is decoded as soon as it is read so memory use does not grow with the recording length
+            chunks = iter(lambda: wf.readframes(self.chunk_size), b"")
+            return self.recognize_stream(uuid, chunks)
 
-        else:
-            print("Voice not recognized. Please speak again...")
-            return "VOICE_NOT_RECOGNIZED"
-    
 
     def cleanup_recognizer(self, uuid):
         """
-        Clean up and remove the Vosk recognizer for a session.
+        Clean up the session and return its Vosk recognizer to the pool.
 
         Args:
             uuid (str): The unique identifier (UUID) for the session.
         """
-        del self.recognizer[uuid]
-    
\ No newline at end of file
+        with self.recognizer_lock:
+            session = self.recognizer.pop(uuid, None)
+        if session is not None:
+            recognizer, pool = session
+            pool.release(recognizer)
+
+
+    def get_pool_stats(self, sample_rate=None, grammar=None, pool_name="stt"):
+        """
+        Get the recognizer pool counters.
+
+        Args:
+            sample_rate (int, optional): The sample rate of the pool. Defaults to the model's sample rate.
+            grammar (str, optional): The grammar of the pool, None for the open vocabulary pool.
+            pool_name (str, optional): The pool group of the pool (default is 'stt').
+
+        Returns:
+            dict: Pool hit/miss/wait counters along with the current pool size.
+        """
+        return self.get_recognizer_pool(sample_rate, grammar=grammar, pool_name=pool_name).get_stats()
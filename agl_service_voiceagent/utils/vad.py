@@ -0,0 +1,272 @@
+# SPDX-License-Identifier: Apache-2.0
+#
+# Copyright (c) 2023 Malik Talha
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import numpy as np
+from collections import deque
+
+
+class EnergyVAD:
+    """
+    EnergyVAD is a cheap voice activity gate for 16-bit mono PCM audio.
+
+    Audio is split into short frames and every frame is classified from its RMS energy and zero-crossing rate
+    against an adaptive estimate of the background noise floor. Only speech frames (plus a short pre-roll before
+    each speech onset and a hangover after it) are passed on, so the expensive recognizer can skip silence.
+    """
+
+    def __init__(self, sample_rate=16000, frame_ms=20, threshold_ratio=3.0, min_rms=150.0, max_zcr=0.35,
+                 hangover_ms=300, preroll_ms=300, noise_adapt_rate=0.05, noise_floor=None):
+        """
+        Initialize the EnergyVAD instance.
+
+        Args:
+            sample_rate (int, optional): The audio sample rate in Hz (default is 16000).
+            frame_ms (int, optional): The analysis frame length in milliseconds (default is 20).
+            threshold_ratio (float, optional): How many times louder than the noise floor a frame must be to count
+                as speech (default is 3.0).
+            min_rms (float, optional): The minimum RMS a frame must have to count as speech, regardless of the noise
+                floor (default is 150.0).
+            max_zcr (float, optional): Frames close to the threshold with a zero-crossing rate above this value are
+                treated as hiss rather than speech (default is 0.35).
+            hangover_ms (int, optional): How long the gate stays open after the last speech frame (default is 300).
+            preroll_ms (int, optional): How much audio before a speech onset is passed on (default is 300).
+            noise_adapt_rate (float, optional): How fast the noise floor follows non-speech frames (default is 0.05).
+            noise_floor (float, optional): The initial noise floor, e.g. from an ambient noise calibration. Taken from
+                the first frame if None.
+        """
+        self.sample_rate = sample_rate
+        self.frame_samples = max(1, int(sample_rate * frame_ms / 1000))
+        self.frame_size = self.frame_samples * 2
+        self.threshold_ratio = threshold_ratio
+        self.min_rms = min_rms
+        self.max_zcr = max_zcr
+        self.noise_adapt_rate = noise_adapt_rate
+        self.hangover_frames = max(0, int(hangover_ms / frame_ms))
+        self.preroll = deque(maxlen=max(0, int(preroll_ms / frame_ms)))
+        self.noise_floor = noise_floor
+        self.speech_active = False
+        self.hangover_left = 0
+        self.pending = bytearray()
+        self.noise_weights = np.empty(0)
+        self.stats = {
+            "frames": 0,
+            "speech_frames": 0,
+            "speech_segments": 0,
+            "bytes_in": 0,
+            "bytes_passed": 0,
+            "bytes_copied": 0,
+        }
+
+
+    def analyze(self, audio_data):
+        """
+        Compute the RMS energy and zero-crossing rate of every whole frame in the audio.
+
+        Args:
+            audio_data (bytes-like): 16-bit mono PCM audio, its length must be a multiple of the frame size.
+
+        Returns:
+            tuple: Two NumPy arrays with the RMS and zero-crossing rate of each frame.
+        """
+        samples = np.frombuffer(audio_data, dtype=np.int16).reshape(-1, self.frame_samples).astype(np.float32)
+        rms = np.sqrt(np.einsum("ij,ij->i", samples, samples) / self.frame_samples)
+        signs = np.signbit(samples)
+        zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / self.frame_samples
+        return rms, zcr
+
+
+    def calibrate(self, audio_data):
+        """
+        Set the noise floor from audio that is known to contain no speech, e.g. ambient cabin noise on startup.
+
+        Args:
+            audio_data (bytes-like): 16-bit mono PCM audio of the background noise.
+        """
+        usable = len(audio_data) - len(audio_data) % self.frame_size
+        if usable:
+            rms, _ = self.analyze(memoryview(audio_data)[:usable])
+            self.noise_floor = float(np.median(rms))
+
+
+    def process(self, audio_data):
+        """
+        Run a chunk of audio through the gate. Whole frames are analyzed in place, only a partial frame at the end
+        of the chunk is copied and kept until the next call.
+
+        Args:
+            audio_data (bytes-like): 16-bit mono PCM audio of any length.
+
+        Returns:
+            tuple: A list of audio chunks (bytes-like) that should be passed on to the recognizer, and a bool that
+                is True when a speech segment ended within this chunk. The chunks may be views of `audio_data`, so
+                they have to be consumed before it is released.
+        """
+        audio_data = memoryview(audio_data).cast("B")
+        blocks = []
+        if self.pending:
+            # complete the partial frame left over from the previous chunk first
+            missing = self.frame_size - len(self.pending)
+            self.pending.extend(audio_data[:missing])
+            self.stats["bytes_copied"] += min(missing, len(audio_data))
+            if len(self.pending) < self.frame_size:
+                return [], False
+            blocks.append(memoryview(self.pending))
+            self.pending = bytearray()
+            audio_data = audio_data[missing:]
+
+        usable = len(audio_data) - len(audio_data) % self.frame_size
+        if usable:
+            blocks.append(audio_data[:usable])
+        if usable < len(audio_data):
+            self.pending.extend(audio_data[usable:])
+            self.stats["bytes_copied"] += len(audio_data) - usable
+
+        voiced_chunks = []
+        speech_ended = False
+        for block in blocks:
+            speech_ended = self.process_frames(block, voiced_chunks) or speech_ended
+        return voiced_chunks, speech_ended
+
+
+    def process_frames(self, data, voiced_chunks):
+        """
+        Classify whole frames of audio and collect the audio to pass on.
+
+        All frames are classified at once against the noise floor at the start of the block, the noise floor then
+        follows the non-speech frames of the block. Speech runs, hangover included, are found from the indexes of the
+        speech frames, so only the runs are handled one by one instead of every frame.
+
+        Args:
+            data (memoryview): 16-bit mono PCM audio, its length must be a multiple of the frame size.
+            voiced_chunks (list): The list the audio chunks to pass on are appended to.
+
+        Returns:
+            bool: True when a speech segment ended within the frames.
+        """
+        rms, zcr = self.analyze(data)
+        frames = len(rms)
+
+        if self.noise_floor is None:
+            self.noise_floor = float(rms[0])
+
+        threshold = max(self.min_rms, self.noise_floor * self.threshold_ratio)
+        is_speech = (rms > threshold) & ((zcr < self.max_zcr) | (rms > 2 * threshold))
+        speech_indexes = is_speech.nonzero()[0]
+
+        # a speech frame keeps the gate open for `hangover_frames` more frames, so speech frames closer than that
+        # belong to the same run, runs are [start, end) frame indexes and may end beyond the block
+        runs = []
+        if len(speech_indexes) == 1:
+            runs = [[int(speech_indexes[0]), int(speech_indexes[0]) + self.hangover_frames + 1]]
+        elif len(speech_indexes):
+            breaks = np.flatnonzero(np.diff(speech_indexes) > self.hangover_frames + 1)
+            starts = speech_indexes[np.concatenate(([0], breaks + 1))].tolist()
+            ends = (speech_indexes[np.concatenate((breaks, [len(speech_indexes) - 1]))] + self.hangover_frames + 1).tolist()
+            runs = [[start, end] for start, end in zip(starts, ends)]
+        if self.speech_active:
+            # the gate is still open from the previous block, for the frames left of its hangover
+            if runs and runs[0][0] <= self.hangover_left:
+                runs[0][0] = 0
+            else:
+                runs.insert(0, [0, self.hangover_left])
+
+        bytes_passed = 0
+        speech_ended = False
+        previous_end = 0
+        for run_start, run_end in runs:
+            if run_start > 0 or not self.speech_active:
+                self.fill_preroll(data, previous_end, run_start)
+                # pass on the audio right before the onset so the first phoneme is not clipped
+                self.stats["speech_segments"] += 1
+                voiced_chunks.extend(self.preroll)
+                bytes_passed += sum(len(chunk) for chunk in self.preroll)
+                self.preroll.clear()
+            if run_end > run_start:
+                voiced_chunks.append(data[run_start * self.frame_size:min(run_end, frames) * self.frame_size])
+                bytes_passed += (min(run_end, frames) - run_start) * self.frame_size
+            previous_end = run_end
+            speech_ended = speech_ended or run_end < frames
+        self.fill_preroll(data, previous_end, frames)
+
+        # a run that reaches the end of the block keeps the gate open, it closes within the next block at the earliest
+        self.speech_active = bool(runs) and runs[-1][1] >= frames
+        self.hangover_left = runs[-1][1] - frames if self.speech_active else 0
+
+        # only non-speech frames move the noise floor, quickly down and slowly up
+        noise = rms[~is_speech] if len(speech_indexes) else rms
+        if len(noise):
+            lowest = float(noise.min())
+            if lowest < self.noise_floor:
+                self.noise_floor = lowest
+            else:
+                # closed form of following every frame by `noise_adapt_rate`
+                keep = 1.0 - self.noise_adapt_rate
+                self.noise_floor = float(keep ** len(noise) * self.noise_floor + self.get_noise_weights(len(noise)) @ noise)
+
+        self.stats["speech_frames"] += len(speech_indexes)
+        self.stats["frames"] += frames
+        self.stats["bytes_in"] += len(data)
+        self.stats["bytes_passed"] += bytes_passed
+        return speech_ended
+
+
+    def get_noise_weights(self, count):
+        """
+        Get the weights of the last `count` non-speech frames in the noise floor, oldest first. They are computed once
+        for the longest block seen.
+
+        Args:
+            count (int): The number of non-speech frames.
+
+        Returns:
+            numpy.ndarray: The weights.
+        """
+        if count > len(self.noise_weights):
+            keep = 1.0 - self.noise_adapt_rate
+            self.noise_weights = (self.noise_adapt_rate * keep ** np.arange(count - 1, -1, -1)).astype(np.float32)
+        return self.noise_weights[len(self.noise_weights) - count:]
+
+
+    def fill_preroll(self, data, start, end):
+        """
+        Keep the last non-speech frames of a block in the pre-roll. Only the frames the pre-roll can hold are copied.
+
+        Args:
+            data (memoryview): The block of audio.
+            start (int): The index of the first non-speech frame.
+            end (int): The index after the last non-speech frame.
+        """
+        if not self.preroll.maxlen:
+            return
+        # the pre-roll outlives the chunk, so it can't keep a view of it
+        for index in range(max(start, end - self.preroll.maxlen), end):
+            self.preroll.append(bytes(data[index * self.frame_size:(index + 1) * self.frame_size]))
+            self.stats["bytes_copied"] += self.frame_size
+
+
+    def get_stats(self):
+        """
+        Get the gate statistics.
+
+        Returns:
+            dict: Frame and byte counters, the share of audio skipped and the current noise floor.
+        """
+        stats = dict(self.stats)
+        stats["bytes_skipped"] = max(0, stats["bytes_in"] - stats["bytes_passed"])
+        stats["skipped_ratio"] = stats["bytes_skipped"] / stats["bytes_in"] if stats["bytes_in"] else 0.0
+        stats["skipped_seconds"] = stats["bytes_skipped"] / (self.sample_rate * 2)
+        stats["noise_floor"] = self.noise_floor
+        return stats
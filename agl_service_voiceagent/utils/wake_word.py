@@ -15,18 +15,24 @@
 # limitations under the License.
 
 import gi
+import threading
 gi.require_version('Gst', '1.0')
 from gi.repository import Gst, GLib
+from agl_service_voiceagent.utils.buffer_map import map_buffer
+from agl_service_voiceagent.utils.pipeline_manager import PipelineManager
+from agl_service_voiceagent.utils.pipeline_pool import PipelinePool
+from agl_service_voiceagent.utils.wake_word_engine import WakeWordEngine
 
 Gst.init(None)
 GLib.threads_init()
 
 class WakeWordDetector:
     """
-    WakeWordDetector is a class for detecting a wake word in an audio stream using GStreamer and Vosk.
+    WakeWordDetector is a class for detecting a wake word in a local microphone stream using GStreamer. The
+    detection itself is delegated to a WakeWordEngine.
     """
 
-    def __init__(self, wake_word, stt_model, channels=1, sample_rate=16000, bits_per_sample=16):
+    def __init__(self, wake_word, stt_model, channels=1, sample_rate=16000, bits_per_sample=16, audio_source=None, **engine_config):
         """
         Initialize the WakeWordDetector instance with the provided parameters.
 
@@ -36,19 +42,30 @@ class WakeWordDetector:
             channels (int, optional): The number of audio channels (default is 1).
             sample_rate (int, optional): The audio sample rate in Hz (default is 16000).
             bits_per_sample (int, optional): The number of bits per sample (default is 16).
+            audio_source (SharedAudioSource, optional): A shared capture pipeline to subscribe to instead of building
+                a pipeline for this detector.
+            **engine_config: Detection options forwarded to the WakeWordEngine.
         """
-        self.loop = GLib.MainLoop()
         self.pipeline = None
-        self.bus = None
+        self.pipeline_id = None
+        self.pipeline_manager = PipelineManager()
+        self.pipeline_pool = PipelinePool()
+        self.consumer_thread = None
         self.wake_word = wake_word
         self.wake_word_detected = False
         self.sample_rate = sample_rate
         self.channels = channels
         self.bits_per_sample = bits_per_sample
-        self.wake_word_model = stt_model # Speech to text model recognizer
-        self.recognizer_uuid = stt_model.setup_recognizer() 
-        self.audio_buffer = bytearray()
-        self.segment_size = int(self.sample_rate * 1.0)  # Adjust the segment size (e.g., 1 second)
+        self.audio_source = audio_source
+        self.subscription = None
+        self.detection_position = None
+        self.queue_monitors = {}
+        self.subscription_stats = None
+        self.engine = WakeWordEngine(wake_word, stt_model, sample_rate, **engine_config)
+        # set as soon as the wake word is detected or listening stops, whichever happens first
+        self.detection_event = threading.Event()
+        self.done_callbacks = []
+        self.callback_lock = threading.Lock()
      
     
     def get_wake_word_status(self):
@@ -60,44 +77,102 @@ class WakeWordDetector:
         """
         return self.wake_word_detected
 
+
+    def wait_for_wake_word(self, timeout=None):
+        """
+        Block until the wake word is detected or listening stops.
+
+        Args:
+            timeout (float, optional): The maximum number of seconds to wait, waits forever if None.
+
+        Returns:
+            bool: True if the wake word has been detected, False otherwise.
+        """
+        self.detection_event.wait(timeout)
+        return self.wake_word_detected
+
+
+    def add_done_callback(self, callback):
+        """
+        Call a function once the wake word is detected or listening stops, whichever happens first. The function is
+        called from the thread that ended the detection, or right away if it already ended.
+
+        Args:
+            callback (callable): Called with the detector as its only argument.
+        """
+        with self.callback_lock:
+            if not self.detection_event.is_set():
+                self.done_callbacks.append(callback)
+                return
+        callback(self)
+
+
+    def set_done(self):
+        """
+        Mark the detection as ended and run the done callbacks. Only the first call has an effect.
+        """
+        with self.callback_lock:
+            if self.detection_event.is_set():
+                return
+            self.detection_event.set()
+            callbacks, self.done_callbacks = self.done_callbacks, []
+
+        for callback in callbacks:
+            callback(self)
+
+
+    def get_detection_time(self):
+        """
+        Get the time at which the wake word was detected.
+
+        Returns:
+            float: The `time.monotonic()` timestamp of the detection, or None if it was not detected.
+        """
+        return self.engine.detected_at
+
+
+    def get_detection_position(self):
+        """
+        Get the position in the shared audio stream at which the wake word was detected.
+
+        Returns:
+            int: The absolute stream position in bytes, or None if the wake word was not detected in shared audio.
+        """
+        return self.detection_position
+
+    def get_queue_stats(self):
+        """
+        Get how much audio waited for the engine and how much was dropped because it fell behind.
+
+        Returns:
+            dict: The statistics of the pipeline queues by branch name, or of the subscription to the shared audio
+                source.
+        """
+        if self.audio_source is not None:
+            subscription = self.subscription
+            if subscription is not None:
+                return {"subscription": subscription.get_stats()}
+            return {"subscription": self.subscription_stats} if self.subscription_stats else {}
+        return {name: monitor.get_stats() for name, monitor in self.queue_monitors.items()}
+
+
     def create_pipeline(self):
         """
-        Create and configure the GStreamer audio processing pipeline for wake word detection.
+        Create and configure the GStreamer audio processing pipeline for wake word detection. With a shared audio
+        source the detector subscribes to it instead.
         """
+        if self.audio_source is not None:
+            self.subscription = self.audio_source.subscribe()
+            return
+
         print("Creating pipeline for Wake Word Detection...")
-        self.pipeline = Gst.Pipeline()
-        autoaudiosrc = Gst.ElementFactory.make("autoaudiosrc", None)
-        queue = Gst.ElementFactory.make("queue", None)
-        audioconvert = Gst.ElementFactory.make("audioconvert", None)
-        wavenc = Gst.ElementFactory.make("wavenc", None)
-
-        capsfilter = Gst.ElementFactory.make("capsfilter", None)
-        caps = Gst.Caps.new_empty_simple("audio/x-raw")
-        caps.set_value("format", "S16LE")
-        caps.set_value("rate", self.sample_rate)
-        caps.set_value("channels", self.channels)
-        capsfilter.set_property("caps", caps)
-
-        appsink = Gst.ElementFactory.make("appsink", None)
-        appsink.set_property("emit-signals", True)
-        appsink.set_property("sync", False)  # Set sync property to False to enable async processing
-        appsink.connect("new-sample", self.on_new_buffer, None)
-
-        self.pipeline.add(autoaudiosrc)
-        self.pipeline.add(queue)
-        self.pipeline.add(audioconvert)
-        self.pipeline.add(wavenc)
-        self.pipeline.add(capsfilter)
-        self.pipeline.add(appsink)
-        
-        autoaudiosrc.link(queue)
-        queue.link(audioconvert)
-        audioconvert.link(capsfilter)
-        capsfilter.link(appsink)
-
-        self.bus = self.pipeline.get_bus()
-        self.bus.add_signal_watch()
-        self.bus.connect("message", self.on_bus_message)
+        # a pre-built pipeline parked by the pipeline pool is leased if available, so listening starts right away
+        layout = self.pipeline_pool.get_layout(self.channels, self.sample_rate, with_appsink=True)
+        warm_pipeline = self.pipeline_pool.acquire(layout, "wake_word_detector", self.on_bus_message)
+        warm_pipeline.sample_handler = self.on_new_buffer
+        self.pipeline = warm_pipeline.pipeline
+        self.pipeline_id = warm_pipeline.pipeline_id
+        self.queue_monitors = warm_pipeline.queue_monitors
 
     
     def on_new_buffer(self, appsink, data) -> Gst.FlowReturn:
@@ -112,64 +187,72 @@ class WakeWordDetector:
             Gst.FlowReturn: Indicates the status of buffer processing.
         """
         sample = appsink.emit("pull-sample")
-        buffer = sample.get_buffer()
-        data = buffer.extract_dup(0, buffer.get_size())
-
-        # Add the new data to the buffer
-        self.audio_buffer.extend(data)
+        if self.wake_word_detected:
+            return Gst.FlowReturn.OK
 
-        # Process audio in segments
-        while len(self.audio_buffer) >= self.segment_size:
-            segment = self.audio_buffer[:self.segment_size]
-            self.process_audio_segment(segment)
+        # the engine consumes the audio before the buffer is unmapped, so it is never copied out of GStreamer
+        with map_buffer(sample.get_buffer()) as data:
+            detected = self.engine.feed(data)
 
-            # Advance the buffer by the segment size
-            self.audio_buffer = self.audio_buffer[self.segment_size:]
+        if detected:
+            self.wake_word_detected = True
+            self.set_done()
+            self.pipeline_manager.send_eos(self.pipeline_id)
 
         return Gst.FlowReturn.OK
 
-    def process_audio_segment(self, segment):
-        """
-        Process an audio segment for wake word detection.
 
-        Args:
-            segment (bytes): The audio segment to process.
+    def consume_subscription(self):
         """
-        # Process the audio data segment
-        audio_data = bytes(segment)
-
-        # Perform wake word detection on the audio_data
-        if self.wake_word_model.init_recognition(self.recognizer_uuid, audio_data):
-            stt_result = self.wake_word_model.recognize(self.recognizer_uuid)
-            print("STT Result: ", stt_result)
-            if self.wake_word in stt_result["text"]:
+        Feed audio from the shared audio source into the engine until the wake word is detected or the
+        subscription is closed.
+        """
+        subscription = self.subscription
+        for data in subscription:
+            if self.engine.feed(data):
+                self.detection_position = subscription.position
                 self.wake_word_detected = True
-                print("Wake word detected!")
-                self.pipeline.send_event(Gst.Event.new_eos())
+                break
+        self.set_done()
 
     def send_eos(self):
         """
-        Send an End-of-Stream (EOS) event to the pipeline.
+        Send an End-of-Stream (EOS) event to the pipeline, or end the subscription to the shared audio source.
         """
-        self.pipeline.send_event(Gst.Event.new_eos())
-        self.audio_buffer.clear()
+        subscription = self.subscription
+        if subscription is not None:
+            subscription.close()
+            return
+
+        pipeline_id = self.pipeline_id
+        if pipeline_id is not None:
+            self.pipeline_manager.send_eos(pipeline_id)
 
 
     def start_listening(self):
         """
-        Start listening for the wake word and enter the event loop.
+        Start listening for the wake word. Returns right away, use `wait_for_wake_word` to wait for the detection.
         """
-        self.pipeline.set_state(Gst.State.PLAYING)
+        if self.subscription is not None:
+            self.consumer_thread = threading.Thread(target=self.consume_subscription)
+            self.consumer_thread.start()
+        else:
+            self.pipeline_manager.start(self.pipeline_id)
         print("Listening for Wake Word...")
-        self.loop.run()
 
 
     def stop_listening(self):
         """
-        Stop listening for the wake word and clean up the pipeline.
+        Stop listening for the wake word and clean up the pipeline. Safe to call more than once.
         """
+        subscription = self.subscription
+        if subscription is not None:
+            subscription.close()
+        consumer_thread = self.consumer_thread
+        if consumer_thread is not None and consumer_thread is not threading.current_thread():
+            consumer_thread.join()
         self.cleanup_pipeline()
-        self.loop.quit()
+        self.set_done()
 
 
     def on_bus_message(self, bus, message):
@@ -203,11 +286,16 @@ class WakeWordDetector:
         """
         Clean up the GStreamer pipeline and release associated resources.
         """
+        if self.subscription is not None:
+            self.subscription.close()
+            self.subscription_stats = self.subscription.get_stats()
+            self.subscription = None
+
         if self.pipeline is not None:
             print("Cleaning up pipeline...")
-            self.pipeline.set_state(Gst.State.NULL)
-            self.bus.remove_signal_watch()
+            self.pipeline_manager.teardown(self.pipeline_id)
             print("Pipeline cleanup complete!")
-            self.bus = None
+            self.pipeline_id = None
             self.pipeline = None
-            self.wake_word_model.cleanup_recognizer(self.recognizer_uuid)
+
+        self.engine.close()
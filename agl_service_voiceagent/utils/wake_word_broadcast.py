@@ -0,0 +1,150 @@
+# SPDX-License-Identifier: Apache-2.0
+#
+# Copyright (c) 2023 Malik Talha
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+
+
+class WakeWordBroadcast:
+    """
+    WakeWordBroadcast lets any number of coroutines wait for the wake word on the local microphone with a single
+    WakeWordDetector. Waiting clients hold no thread: the detector reports its result back to the event loop, and
+    only creating and stopping it runs in an executor.
+
+    A detector is started when the first client starts waiting and stopped once the wake word is detected, or once
+    the last client stops waiting. All clients waiting at the time of a detection receive it.
+    """
+
+    def __init__(self, create_detector, executor, on_detected=None, on_stopped=None):
+        """
+        Initialize the WakeWordBroadcast instance. Must be used from a single event loop.
+
+        Args:
+            create_detector (callable): Returns a new WakeWordDetector with its pipeline created. Called in the
+                executor.
+            executor (concurrent.futures.Executor): Runs the blocking detector calls.
+            on_detected (callable, optional): Called in the event loop with the detector when the wake word is
+                detected, before the detector is stopped.
+            on_stopped (callable, optional): Called in the event loop with the detector after it was stopped.
+        """
+        self.create_detector = create_detector
+        self.executor = executor
+        self.on_detected = on_detected
+        self.on_stopped = on_stopped
+        self.waiters = set()
+        self.session = None
+        self.done = None
+        self.abandoned = False
+        self.stats = {
+            "sessions": 0,
+            "detections": 0,
+            "peak_waiters": 0,
+        }
+
+
+    async def wait(self):
+        """
+        Wait until the wake word is detected. Cancelling the wait removes the client, and stops the detector if it
+        was the last one.
+
+        Returns:
+            tuple: True if the wake word was detected, False if listening stopped without a detection, and the
+                detector that ended.
+
+        Raises:
+            Exception: Whatever creating or starting the detector raised, e.g. `AdmissionRejected` if the service is
+                overloaded.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.waiters.add(future)
+        self.stats["peak_waiters"] = max(self.stats["peak_waiters"], len(self.waiters))
+        if self.session is None:
+            self.session = loop.create_task(self.listen())
+
+        try:
+            return await future
+        finally:
+            self.waiters.discard(future)
+            done = self.done
+            if not self.waiters and done is not None and not done.done():
+                # nobody is listening anymore, the detector is stopped without a detection
+                self.abandoned = True
+                done.set_result(None)
+
+
+    async def listen(self):
+        """
+        Run one detector until it ends, then hand its result to the clients waiting at that time. If the detector
+        could not be created or started, the clients waiting at that time get the exception instead.
+        """
+        loop = asyncio.get_running_loop()
+        self.stats["sessions"] += 1
+        done = self.done = loop.create_future()
+
+        def on_done(detector):
+            loop.call_soon_threadsafe(lambda: done.done() or done.set_result(None))
+
+        detector = None
+        error = None
+        self.abandoned = False
+        try:
+            detector = await loop.run_in_executor(self.executor, self.create_detector)
+            if not done.done():
+                detector.add_done_callback(on_done)
+                await loop.run_in_executor(self.executor, detector.start_listening)
+                await done
+
+        except Exception as e:
+            # handed to the waiters below, nothing awaits this task so it must not end with the exception
+            print(f"Wake word detector failed: {e}")
+            error = e
+
+        finally:
+            self.done = None
+            self.session = None
+            detected = detector is not None and detector.get_wake_word_status()
+            waiters = set(self.waiters)
+            if error is None and not detected and self.abandoned and waiters:
+                # clients that started waiting while the abandoned detector stopped get a detector of their own
+                waiters = set()
+                self.session = loop.create_task(self.listen())
+            if detected:
+                self.stats["detections"] += 1
+                if self.on_detected is not None:
+                    self.on_detected(detector)
+            for future in waiters:
+                if future.done():
+                    continue
+                if error is not None:
+                    future.set_exception(error)
+                else:
+                    future.set_result((detected, detector))
+            if detector is not None:
+                await loop.run_in_executor(self.executor, detector.stop_listening)
+                if self.on_stopped is not None:
+                    self.on_stopped(detector)
+
+
+    def get_stats(self):
+        """
+        Get the broadcast counters.
+
+        Returns:
+            dict: The number of detectors started, of detections and of clients waiting, now and at most.
+        """
+        stats = dict(self.stats)
+        stats["waiters"] = len(self.waiters)
+        return stats
@@ -0,0 +1,288 @@
+# SPDX-License-Identifier: Apache-2.0
+#
+# Copyright (c) 2023 Malik Talha
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import time
+from agl_service_voiceagent.utils.ring_buffer import AudioRingBuffer
+
+
+class WakeWordEngine:
+    """
+    WakeWordEngine is the audio source independent core of wake word detection. It segments raw PCM chunks,
+    runs them through a Vosk recognizer and matches the recognized text against the wake word.
+    """
+
+    def __init__(self, wake_word, stt_model, sample_rate=16000, segment_ms=500, hop_ms=None, vad=None,
+                 variants=None, use_grammar=False, check_partial=True):
+        """
+        Initialize the WakeWordEngine instance and lease a recognizer from the 'wake_word' pools of the STT model.
+
+        Audio is processed in segments of `segment_ms`, a new segment starts every `hop_ms`. When the hop equals
+        the segment length the segments are fed back to back into one continuous recognizer stream. When the hop
+        is shorter, segments overlap and every segment is decoded on its own, so a wake word that straddles a
+        segment boundary is still seen whole by the next segment and detection no longer waits for the
+        recognizer to find the end of an utterance. This costs `segment_ms / hop_ms` times more decoding.
+
+        With `use_grammar` the recognizer is restricted to the wake word, its variants and `[unk]`, which makes
+        decoding much cheaper than open vocabulary recognition and keeps unrelated words from being transcribed
+        into something that merely contains the wake word.
+
+        Args:
+            wake_word (str): The wake word to detect in the audio stream.
+            stt_model (STTModel): An instance of the STTModel for speech-to-text recognition.
+            sample_rate (int, optional): The audio sample rate in Hz (default is 16000).
+            segment_ms (int, optional): The length of an audio segment in milliseconds (default is 500).
+            hop_ms (int, optional): The distance between the start of two segments in milliseconds, defaults to
+                `segment_ms` (no overlap).
+            vad (EnergyVAD, optional): A voice activity gate, audio it classifies as non-speech never reaches the
+                recognizer. No gating is done if None.
+            variants (list, optional): Alternative spellings or pronunciations that also count as the wake word.
+            use_grammar (bool, optional): If True, decode with a grammar restricted recognizer (default is False).
+            check_partial (bool, optional): If True, match partial results too, so detection does not have to wait
+                for the recognizer to finalize the utterance (default is True).
+
+        Raises:
+            ValueError: If the segment length or the hop is shorter than one sample.
+        """
+        # checked before a recognizer is leased, a segment or hop shorter than a sample would never fill up
+        hop_ms = segment_ms if hop_ms is None else hop_ms
+        if int(segment_ms * sample_rate / 1000) <= 0:
+            raise ValueError(f"The wake word segment length must be positive, got {segment_ms} ms.")
+        if int(hop_ms * sample_rate / 1000) <= 0:
+            raise ValueError(f"The wake word segment hop must be positive, got {hop_ms} ms.")
+
+        self.wake_word = wake_word
+        self.wake_word_detected = False
+        self.detected_at = None
+        self.sample_rate = sample_rate
+        self.wake_word_model = stt_model # Speech to text model recognizer
+        self.phrases = [self.tokenize(phrase) for phrase in [wake_word] + list(variants or [])]
+        self.phrases = [phrase for phrase in self.phrases if phrase]
+        self.grammar = stt_model.build_grammar([" ".join(phrase) for phrase in self.phrases]) if use_grammar else None
+        self.check_partial = check_partial
+        # wake word streams hold their recognizer for as long as they listen, so they lease from a pool of their own
+        self.recognizer_uuid = stt_model.setup_recognizer(sample_rate, grammar=self.grammar, pool_name="wake_word")
+        # sizes are in bytes of 16-bit mono audio, rounded to whole samples
+        self.segment_size = int(segment_ms * self.sample_rate / 1000) * 2
+        self.hop_size = min(int(hop_ms * self.sample_rate / 1000) * 2, self.segment_size)
+        self.overlapping = self.hop_size < self.segment_size
+        self.audio_buffer = AudioRingBuffer(self.segment_size)
+        self.next_segment_end = self.segment_size
+        self.vad = vad
+
+
+    def feed(self, audio_data):
+        """
+        Feed a chunk of 16-bit mono PCM audio into the engine.
+
+        Args:
+            audio_data (bytes-like): The audio chunk to process, it is not kept after the call.
+
+        Returns:
+            bool: True if the wake word has been detected, False otherwise.
+        """
+        if self.wake_word_detected:
+            return True
+
+        if self.vad is None:
+            return self.feed_segments(audio_data)
+
+        voiced_chunks, speech_ended = self.vad.process(audio_data)
+        for chunk in voiced_chunks:
+            if self.feed_segments(chunk):
+                return True
+
+        # the speaker paused, decode what is left of the utterance instead of waiting for more speech
+        if speech_ended:
+            return self.flush()
+
+        return False
+
+
+    def feed_segments(self, audio_data):
+        """
+        Split audio into segments through the ring buffer and process every complete segment.
+
+        Args:
+            audio_data (bytes-like): The audio chunk to process.
+
+        Returns:
+            bool: True if the wake word has been detected, False otherwise.
+        """
+        audio_data = memoryview(audio_data).cast("B")
+        offset = 0
+        while offset < len(audio_data):
+            # only write up to the end of the next segment, so the segment is still in the ring buffer when we read it
+            length = min(len(audio_data) - offset, self.next_segment_end - self.audio_buffer.write_pos)
+            self.audio_buffer.write(audio_data[offset:offset + length])
+            offset += length
+
+            if self.audio_buffer.write_pos == self.next_segment_end:
+                segment = self.audio_buffer.read(self.next_segment_end - self.segment_size, self.segment_size)
+                self.next_segment_end += self.hop_size
+                if self.process_audio_segment(segment):
+                    return True
+
+        return False
+
+
+    def process_audio_segment(self, segment):
+        """
+        Process an audio segment for wake word detection.
+
+        Args:
+            segment (memoryview): The audio segment to process.
+
+        Returns:
+            bool: True if the wake word was detected in the segment, False otherwise.
+        """
+        # Perform wake word detection on the segment, the view into the ring buffer is passed on without a copy
+        if self.overlapping:
+            # overlapping segments are decoded independently of each other
+            self.wake_word_model.init_recognition(self.recognizer_uuid, segment)
+            stt_result = self.wake_word_model.recognize(self.recognizer_uuid, final=True)
+        elif self.wake_word_model.init_recognition(self.recognizer_uuid, segment):
+            stt_result = self.wake_word_model.recognize(self.recognizer_uuid)
+        elif self.check_partial:
+            # the utterance is still going on, but the wake word may already be in the partial hypothesis
+            partial_result = self.wake_word_model.recognize(self.recognizer_uuid, partial=True)
+            stt_result = {"text": partial_result.get("partial", "")}
+        else:
+            return False
+
+        if not stt_result["text"]:
+            return False
+
+        print("STT Result: ", stt_result)
+        if self.match(stt_result["text"]):
+            self.wake_word_detected = True
+            self.detected_at = time.monotonic()
+            print("Wake word detected!")
+
+        return self.wake_word_detected
+
+
+    def flush(self):
+        """
+        Decode the audio received since the last complete segment and finalize the current utterance.
+
+        Returns:
+            bool: True if the wake word has been detected, False otherwise.
+        """
+        if self.overlapping:
+            window_start = max(self.audio_buffer.get_oldest_position(), self.audio_buffer.write_pos - self.segment_size)
+        else:
+            window_start = self.next_segment_end - self.segment_size
+        window = self.audio_buffer.read(window_start, self.audio_buffer.write_pos - window_start)
+
+        if len(window):
+            self.wake_word_model.init_recognition(self.recognizer_uuid, window)
+        stt_result = self.wake_word_model.recognize(self.recognizer_uuid, final=True)
+        self.next_segment_end = self.audio_buffer.write_pos + self.segment_size
+
+        if stt_result["text"]:
+            print("STT Result: ", stt_result)
+        if self.match(stt_result["text"]):
+            self.wake_word_detected = True
+            self.detected_at = time.monotonic()
+            print("Wake word detected!")
+
+        return self.wake_word_detected
+
+
+    def get_vad_stats(self):
+        """
+        Get the statistics of the voice activity gate.
+
+        Returns:
+            dict: The gate statistics, or None if no gate is used.
+        """
+        return self.vad.get_stats() if self.vad is not None else None
+
+
+    def tokenize(self, text):
+        """
+        Split text into lower case words, dropping the `[unk]` tokens of grammar restricted recognizers.
+
+        Args:
+            text (str): The text to split.
+
+        Returns:
+            list: The words of the text.
+        """
+        return [word for word in text.lower().split() if word != "[unk]"]
+
+
+    def match(self, text):
+        """
+        Check whether recognized text contains the wake word or one of its variants as a whole word sequence.
+
+        Unlike a substring check, this does not match the wake word inside a longer word.
+
+        Args:
+            text (str): The recognized text.
+
+        Returns:
+            bool: True if the text contains the wake word, False otherwise.
+        """
+        words = self.tokenize(text)
+        for phrase in self.phrases:
+            for start in range(len(words) - len(phrase) + 1):
+                if words[start:start + len(phrase)] == phrase:
+                    return True
+        return False
+
+
+    def strip_wake_word(self, text):
+        """
+        Remove the wake word, and anything before it, from recognized text. Used when a command was recorded
+        together with the wake word that preceded it.
+
+        The recording may start in the middle of the wake word, so if the text does not contain a whole wake word, a
+        trailing part of one at the start of the text is removed instead, e.g. "car set volume" for "hey car".
+
+        Args:
+            text (str): The recognized text.
+
+        Returns:
+            str: The text following the first occurrence of the wake word, the text following a leading partial wake
+                word, or the text unchanged if it contains neither.
+        """
+        words = text.split()
+        tokens = [word.lower() for word in words]
+        for start in range(len(tokens)):
+            for phrase in self.phrases:
+                if tokens[start:start + len(phrase)] == phrase:
+                    return " ".join(words[start + len(phrase):])
+
+        # the longest trailing part of a phrase wins, a whole phrase was already ruled out above
+        longest = 0
+        for phrase in self.phrases:
+            for length in range(len(phrase) - 1, longest, -1):
+                if tokens[:length] == phrase[-length:]:
+                    longest = length
+                    break
+        return " ".join(words[longest:]) if longest else text
+
+
+    def close(self):
+        """
+        Drop any buffered audio and return the recognizer to the STT model.
+        """
+        self.audio_buffer.clear()
+        self.next_segment_end = self.segment_size
+        if self.recognizer_uuid is not None:
+            self.wake_word_model.cleanup_recognizer(self.recognizer_uuid)
+            self.recognizer_uuid = None
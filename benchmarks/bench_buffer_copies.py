@@ -0,0 +1,196 @@
+# SPDX-License-Identifier: Apache-2.0
+#
+# Copyright (c) 2023 Malik Talha
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Compare the bytes copied and the CPU time per audio second of the wake word buffer path, from the appsink buffer to
+the recognizer, before and after the zero-copy handoff.
+
+"copy" is the previous path: the buffer is copied out of GStreamer with `extract_dup`, collected in the VAD with
+`bytearray.extend`, sliced into new `bytes` for analysis and for every voiced chunk, and every segment is copied
+again with `bytes(segment)` before `AcceptWaveform`. "zero-copy" is the current path: the mapped buffer is analyzed
+in place by `EnergyVAD.process` and segments are handed to Vosk as views of the ring buffer. Both paths write into
+the mirrored ring buffer, which always costs two copies.
+
+The VAD is configured to pass all audio, so both paths move the same amount of audio. Without `--model` the
+recognizer is left out to isolate the buffer handling, with `--model` every segment is decoded by Vosk.
+
+Usage:
+    python benchmarks/bench_buffer_copies.py --seconds 60 --chunk-ms 20
+    python benchmarks/bench_buffer_copies.py --input command.wav --model /usr/share/vosk/VOSK_WWD_MODEL_NAME/
+"""
+
+import os
+import sys
+import time
+import wave
+import argparse
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from agl_service_voiceagent.utils.vad import EnergyVAD
+from agl_service_voiceagent.utils.ring_buffer import AudioRingBuffer
+
+
+class CopyPath:
+    """
+    The previous buffer path, every copy is counted.
+    """
+
+    def __init__(self, sample_rate, segment_size, accept):
+        self.vad = EnergyVAD(sample_rate, threshold_ratio=0.0, min_rms=0.0, preroll_ms=0)
+        self.ring = AudioRingBuffer(segment_size)
+        self.segment_size = segment_size
+        self.next_segment_end = segment_size
+        self.pending = bytearray()
+        self.accept = accept
+        self.copied = 0
+
+    def feed(self, buffer):
+        data = bytes(buffer)  # extract_dup
+        self.copied += len(data)
+        self.pending.extend(data)
+        self.copied += len(data)
+        usable = len(self.pending) - len(self.pending) % self.vad.frame_size
+        if not usable:
+            return
+        block = bytes(self.pending[:usable])  # slice into a new bytearray, then into bytes
+        self.copied += 2 * usable
+        del self.pending[:usable]
+        voiced_chunks = []
+        self.vad.process_frames(memoryview(block), voiced_chunks)
+        for chunk in voiced_chunks:
+            chunk = bytes(chunk)  # voiced chunks were sliced out of the bytes block
+            self.copied += len(chunk)
+            self.write_segments(chunk)
+
+    def write_segments(self, chunk):
+        offset = 0
+        while offset < len(chunk):
+            length = min(len(chunk) - offset, self.next_segment_end - self.ring.write_pos)
+            self.ring.write(chunk[offset:offset + length])
+            self.copied += 2 * length  # mirrored ring buffer
+            offset += length
+            if self.ring.write_pos == self.next_segment_end:
+                segment = bytes(self.ring.read(self.next_segment_end - self.segment_size, self.segment_size))
+                self.copied += len(segment)
+                self.next_segment_end += self.segment_size
+                self.accept(segment)
+
+    def get_copied(self):
+        return self.copied
+
+
+class ZeroCopyPath(CopyPath):
+    """
+    The current buffer path, built from the service components.
+    """
+
+    def __init__(self, sample_rate, segment_size, accept, from_buffer):
+        super().__init__(sample_rate, segment_size, accept)
+        self.from_buffer = from_buffer
+
+    def feed(self, buffer):
+        voiced_chunks, _ = self.vad.process(memoryview(buffer))
+        for chunk in voiced_chunks:
+            self.write_segments(chunk)
+
+    def write_segments(self, chunk):
+        offset = 0
+        while offset < len(chunk):
+            length = min(len(chunk) - offset, self.next_segment_end - self.ring.write_pos)
+            self.ring.write(chunk[offset:offset + length])
+            self.copied += 2 * length  # mirrored ring buffer
+            offset += length
+            if self.ring.write_pos == self.next_segment_end:
+                segment = self.ring.read(self.next_segment_end - self.segment_size, self.segment_size)
+                if self.from_buffer is not None:
+                    segment = self.from_buffer(segment)
+                else:
+                    segment = bytes(segment)
+                    self.copied += len(segment)
+                self.next_segment_end += self.segment_size
+                self.accept(segment)
+
+    def get_copied(self):
+        return self.copied + self.vad.stats["bytes_copied"]
+
+
+def run_path(path, audio_data, chunk_size, repeats):
+    """
+    Feed the audio through a path `repeats` times and return the CPU seconds per run.
+    """
+    buffers = [audio_data[offset:offset + chunk_size] for offset in range(0, len(audio_data), chunk_size)]
+    start = time.process_time()
+    for _ in range(repeats):
+        for buffer in buffers:
+            path.feed(buffer)
+    return (time.process_time() - start) / repeats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the bytes copied between the appsink and the recognizer.")
+    parser.add_argument("--input", help="Mono 16-bit WAV, noise is generated if not given.")
+    parser.add_argument("--seconds", type=float, default=30, help="Length of the generated audio in seconds.")
+    parser.add_argument("--sample-rate", type=int, default=16000, help="Sample rate of the generated audio.")
+    parser.add_argument("--chunk-ms", type=int, default=20, help="Length of an appsink buffer in milliseconds.")
+    parser.add_argument("--segment-ms", type=int, default=500, help="Length of a wake word segment in milliseconds.")
+    parser.add_argument("--model", help="Path to a Vosk model, segments are decoded if given.")
+    parser.add_argument("--repeats", type=int, default=5, help="Number of runs averaged per path.")
+    args = parser.parse_args()
+
+    if args.input:
+        with wave.open(args.input, "rb") as wf:
+            if wf.getnchannels() != 1 or wf.getsampwidth() != 2:
+                sys.exit("Input must be a mono 16-bit WAV file.")
+            sample_rate = wf.getframerate()
+            audio_data = wf.readframes(wf.getnframes())
+    else:
+        sample_rate = args.sample_rate
+        samples = np.random.default_rng(0).normal(0, 2000, int(args.seconds * sample_rate))
+        audio_data = samples.astype(np.int16).tobytes()
+    audio_seconds = len(audio_data) / (sample_rate * 2)
+    chunk_size = sample_rate * args.chunk_ms // 1000 * 2
+    segment_size = sample_rate * args.segment_ms // 1000 * 2
+
+    from_buffer = None
+    accept = len
+    try:
+        import vosk
+        from_buffer = vosk._ffi.from_buffer
+        if args.model:
+            recognizer = vosk.KaldiRecognizer(vosk.Model(args.model), sample_rate)
+            accept = recognizer.AcceptWaveform
+    except ImportError:
+        if args.model:
+            sys.exit("Decoding requires the vosk package.")
+        print("vosk is not installed, segments are copied to bytes on the zero-copy path as well.")
+
+    paths = {
+        "copy": CopyPath(sample_rate, segment_size, accept),
+        "zero-copy": ZeroCopyPath(sample_rate, segment_size, accept, from_buffer),
+    }
+
+    audio_bytes = len(audio_data) * args.repeats
+    print(f"{audio_seconds:.1f} s of audio in {args.chunk_ms} ms buffers, {args.segment_ms} ms segments")
+    print(f"{'path':>10} {'bytes copied / audio byte':>26} {'CPU ms / audio s':>17}")
+    for name, path in paths.items():
+        cpu_seconds = run_path(path, audio_data, chunk_size, args.repeats)
+        print(f"{name:>10} {path.get_copied() / audio_bytes:>26.2f} {cpu_seconds * 1000 / audio_seconds:>17.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+# SPDX-License-Identifier: Apache-2.0
+#
+# Copyright (c) 2023 Malik Talha
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Measure S_RecognizeVoiceCommand throughput against a running Voice Agent server.
+
+For every concurrency level the same WAV file is streamed over that many parallel streams. The aggregate
+real-time factor (seconds of audio decoded per wall-clock second) divided by the number of server cores gives
+how many real-time streams one core can sustain.
+
+Usage:
+    python benchmarks/bench_stream_recognize.py --server 127.0.0.1:51053 --input command.wav --server-cores 4
+"""
+
+import os
+import sys
+import time
+import wave
+import argparse
+import threading
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(current_dir, ".."))
+sys.path.insert(0, os.path.join(current_dir, "..", "agl_service_voiceagent", "generated"))
+
+import grpc
+from agl_service_voiceagent.generated import voice_agent_pb2
+from agl_service_voiceagent.generated import voice_agent_pb2_grpc
+
+
+def load_wav(path):
+    """
+    Load a mono 16-bit WAV file and return its PCM data, sample rate and duration in seconds.
+    """
+    with wave.open(path, "rb") as wf:
+        if wf.getnchannels() != 1 or wf.getsampwidth() != 2:
+            raise ValueError("Input must be a mono 16-bit WAV file.")
+        data = wf.readframes(wf.getnframes())
+        return data, wf.getframerate(), wf.getnframes() / wf.getframerate()
+
+
+def request_iterator(audio_data, sample_rate, chunk_bytes, realtime):
+    """
+    Yield the S_RecognizeVoiceControl messages of one stream, optionally paced at real time.
+    """
+    bytes_per_second = sample_rate * 2
+    for offset in range(0, len(audio_data), chunk_bytes):
+        chunk = audio_data[offset:offset + chunk_bytes]
+        yield voice_agent_pb2.S_RecognizeVoiceControl(
+            audio_stream=voice_agent_pb2.VoiceAudio(audio_chunk=chunk, audio_format="pcm", sample_rate=sample_rate),
+            nlu_model=voice_agent_pb2.SNIPS
+        )
+        if realtime:
+            time.sleep(len(chunk) / bytes_per_second)
+
+
+def run_level(stub, concurrency, audio_data, sample_rate, chunk_bytes, realtime):
+    """
+    Run `concurrency` parallel streams and return the wall time and the latency of each stream.
+    """
+    latencies = [None] * concurrency
+
+    def worker(index):
+        start = time.perf_counter()
+        stub.S_RecognizeVoiceCommand(request_iterator(audio_data, sample_rate, chunk_bytes, realtime))
+        latencies[index] = time.perf_counter() - start
+
+    threads = [threading.Thread(target=worker, args=(index,)) for index in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark concurrent S_RecognizeVoiceCommand streams.")
+    parser.add_argument("--server", default="127.0.0.1:51053", help="Address of the Voice Agent server.")
+    parser.add_argument("--input", required=True, help="Mono 16-bit WAV file to stream.")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16], help="Parallel stream counts.")
+    parser.add_argument("--chunk-ms", type=int, default=100, help="Audio per message in milliseconds.")
+    parser.add_argument("--server-cores", type=int, default=os.cpu_count(), help="CPU cores available to the server.")
+    parser.add_argument("--realtime", action="store_true", help="Pace the audio at real time like a live microphone.")
+    args = parser.parse_args()
+
+    audio_data, sample_rate, duration = load_wav(args.input)
+    chunk_bytes = int(sample_rate * 2 * args.chunk_ms / 1000)
+
+    print(f"{'streams':>8} {'wall (s)':>10} {'p50 (s)':>9} {'max (s)':>9} {'audio s/s':>10} {'streams/core':>13}")
+    with grpc.insecure_channel(args.server) as channel:
+        stub = voice_agent_pb2_grpc.VoiceAgentServiceStub(channel)
+        for concurrency in args.concurrency:
+            wall_time, latencies = run_level(stub, concurrency, audio_data, sample_rate, chunk_bytes, args.realtime)
+            latencies.sort()
+            audio_per_second = duration * concurrency / wall_time
+            print(f"{concurrency:>8} {wall_time:>10.2f} {latencies[len(latencies) // 2]:>9.2f} {latencies[-1]:>9.2f} "
+                  f"{audio_per_second:>10.2f} {audio_per_second / args.server_cores:>13.2f}")
+
+
+if __name__ == "__main__":
+    main()
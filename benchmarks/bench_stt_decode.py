@@ -0,0 +1,147 @@
+# SPDX-License-Identifier: Apache-2.0
+#
+# Copyright (c) 2023 Malik Talha
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Compare peak RSS and decode time of the buffered (legacy) and streaming file decode paths.
+
+Each run is executed in a fresh subprocess so the peak RSS of one run does not leak into the next.
+
+Usage:
+    python benchmarks/bench_stt_decode.py --model /usr/share/vosk/VOSK_STT_MODEL_NAME/ [--input command.wav]
+"""
+
+import os
+import sys
+import json
+import time
+import wave
+import argparse
+import tempfile
+import subprocess
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+
+def read_proc_status(field):
+    """
+    Read a memory field (in kB) from /proc/self/status.
+    """
+    with open("/proc/self/status") as status_file:
+        for line in status_file:
+            if line.startswith(field + ":"):
+                return int(line.split()[1])
+    return 0
+
+
+def write_test_wav(path, seconds, sample_rate, source_wav=None):
+    """
+    Write a mono 16-bit WAV file of the given length, looping `source_wav` if provided or generating
+    low level noise otherwise.
+    """
+    if source_wav:
+        with wave.open(source_wav, "rb") as wf:
+            source = wf.readframes(wf.getnframes())
+    else:
+        source = os.urandom(sample_rate * 2)
+        # keep the noise quiet so it resembles cabin background rather than clipping
+        source = bytes(0 if i % 2 else b for i, b in enumerate(source))
+
+    total_bytes = seconds * sample_rate * 2
+    with wave.open(path, "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(sample_rate)
+        written = 0
+        while written < total_bytes:
+            data = source[:total_bytes - written]
+            wf.writeframes(data)
+            written += len(data)
+
+
+def legacy_recognize_from_file(stt_model, uuid, filename):
+    """
+    The previous implementation: concatenate every chunk and decode the whole buffer at once.
+    """
+    wf = wave.open(filename, "rb")
+    audio_data = b""
+    while True:
+        chunk = wf.readframes(stt_model.chunk_size)
+        if not chunk:
+            break
+        audio_data += chunk
+
+    if stt_model.init_recognition(uuid, audio_data):
+        return stt_model.recognize(uuid)["text"]
+    return stt_model.recognize(uuid, partial=True)["partial"]
+
+
+def run_single(model_path, sample_rate, wav_path, mode):
+    """
+    Decode `wav_path` once and print the measurements as JSON. Runs inside the worker subprocess.
+    """
+    from agl_service_voiceagent.utils.stt_model import STTModel
+
+    stt_model = STTModel(model_path, sample_rate, pool_min_size=1, pool_max_size=1)
+    uuid = stt_model.setup_recognizer()
+    baseline_kb = read_proc_status("VmRSS")
+
+    start = time.perf_counter()
+    if mode == "legacy":
+        legacy_recognize_from_file(stt_model, uuid, wav_path)
+    else:
+        stt_model.recognize_from_file(uuid, wav_path)
+    elapsed = time.perf_counter() - start
+
+    stt_model.cleanup_recognizer(uuid)
+    print(json.dumps({
+        "decode_seconds": elapsed,
+        "peak_rss_mb": read_proc_status("VmHWM") / 1024,
+        "rss_growth_mb": (read_proc_status("VmHWM") - baseline_kb) / 1024,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark buffered vs streaming STT file decoding.")
+    parser.add_argument("--model", required=True, help="Path to the Vosk model.")
+    parser.add_argument("--input", help="Optional mono 16-bit WAV to loop as test audio. Defaults to noise.")
+    parser.add_argument("--sample-rate", type=int, default=16000, help="Sample rate of the test audio.")
+    parser.add_argument("--durations", type=int, nargs="+", default=[5, 30, 120], help="Command lengths in seconds.")
+    parser.add_argument("--worker", nargs=2, metavar=("WAV", "MODE"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_single(args.model, args.sample_rate, args.worker[0], args.worker[1])
+        return
+
+    print(f"{'length':>8} {'mode':>10} {'decode (s)':>12} {'peak RSS (MB)':>14} {'RSS growth (MB)':>16}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for seconds in args.durations:
+            wav_path = os.path.join(tmp_dir, f"command_{seconds}s.wav")
+            write_test_wav(wav_path, seconds, args.sample_rate, args.input)
+
+            for mode in ["legacy", "streaming"]:
+                output = subprocess.run(
+                    [sys.executable, __file__, "--model", args.model, "--sample-rate", str(args.sample_rate),
+                     "--worker", wav_path, mode],
+                    check=True, capture_output=True, text=True
+                ).stdout
+                result = json.loads(output.strip().splitlines()[-1])
+                print(f"{seconds:>7}s {mode:>10} {result['decode_seconds']:>12.3f} "
+                      f"{result['peak_rss_mb']:>14.1f} {result['rss_growth_mb']:>16.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+# SPDX-License-Identifier: Apache-2.0
+#
+# Copyright (c) 2023 Malik Talha
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Compare the text command throughput of RecognizeTextCommand and S_RecognizeTextCommand against a running Voice Agent
+server.
+
+The same commands are sent once as concurrent unary calls, from a number of client threads, and once over a single
+S_RecognizeTextCommand stream. The results of both are checked to match, so the speedup is not bought by skipping
+work. Sequential unary calls (`--unary-threads 1`) mostly measure round trips, compare against a client that keeps
+as many unary calls in flight as the server admits, which is the default.
+
+Usage:
+    python benchmarks/bench_text_recognize.py --server 127.0.0.1:51053 --input utterances.txt --count 10000
+"""
+
+import os
+import sys
+import time
+import argparse
+import threading
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(current_dir, ".."))
+sys.path.insert(0, os.path.join(current_dir, "..", "agl_service_voiceagent", "generated"))
+
+import grpc
+from agl_service_voiceagent.generated import voice_agent_pb2
+from agl_service_voiceagent.generated import voice_agent_pb2_grpc
+
+
+DEFAULT_COMMANDS = [
+    "set the volume to twenty",
+    "increase the volume by five",
+    "turn the fan speed to fifty",
+    "decrease the temperature by two",
+    "set the temperature to twenty two",
+    "turn on the lights",
+]
+
+
+def load_commands(path, count):
+    """
+    Load one command per line from a file, or use a few built-in commands, and repeat them up to `count` commands.
+    """
+    commands = DEFAULT_COMMANDS
+    if path:
+        with open(path) as f:
+            commands = [line.strip() for line in f if line.strip()]
+    return [commands[index % len(commands)] for index in range(count)]
+
+
+def run_unary(stub, commands, nlu_model, threads):
+    """
+    Send every command as a RecognizeTextCommand call, split over a number of client threads, and return the wall
+    time, the results in the order of the commands and how many calls the server rejected as overloaded. Rejected
+    calls are retried, like a real client would.
+    """
+    results = [None] * len(commands)
+    rejected = [0] * threads
+
+    def worker(first):
+        for index in range(first, len(commands), threads):
+            request = voice_agent_pb2.RecognizeTextControl(text_command=commands[index], nlu_model=nlu_model)
+            while results[index] is None:
+                try:
+                    results[index] = stub.RecognizeTextCommand(request)
+                except grpc.RpcError as e:
+                    if e.code() != grpc.StatusCode.RESOURCE_EXHAUSTED:
+                        raise
+                    rejected[first] += 1
+                    time.sleep(0.001)
+
+    workers = [threading.Thread(target=worker, args=(first,)) for first in range(threads)]
+    start = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return time.perf_counter() - start, results, sum(rejected)
+
+
+def run_stream(stub, commands, nlu_model):
+    """
+    Send every command over one S_RecognizeTextCommand stream and return the wall time and the results.
+    """
+    requests = (voice_agent_pb2.RecognizeTextControl(text_command=command, nlu_model=nlu_model) for command in commands)
+    start = time.perf_counter()
+    results = list(stub.S_RecognizeTextCommand(requests))
+    return time.perf_counter() - start, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark RecognizeTextCommand against S_RecognizeTextCommand.")
+    parser.add_argument("--server", default="127.0.0.1:51053", help="Address of the Voice Agent server.")
+    parser.add_argument("--input", help="Text file with one command per line, built-in commands if not given.")
+    parser.add_argument("--count", type=int, default=2000, help="Number of commands to send.")
+    parser.add_argument("--nlu", choices=["snips", "rasa"], default="snips", help="NLU engine to use.")
+    parser.add_argument("--unary-threads", type=int, default=6,
+                        help="Client threads sending the unary calls, the default matches batch_workers + batch_queue "
+                             "of the default config, so the server admits every call in flight.")
+    parser.add_argument("--skip-unary", action="store_true", help="Only measure the stream.")
+    args = parser.parse_args()
+
+    commands = load_commands(args.input, args.count)
+    nlu_model = voice_agent_pb2.RASA if args.nlu == "rasa" else voice_agent_pb2.SNIPS
+
+    print(f"{'path':>8} {'commands':>9} {'wall (s)':>10} {'commands/s':>11}")
+    with grpc.insecure_channel(args.server) as channel:
+        stub = voice_agent_pb2_grpc.VoiceAgentServiceStub(channel)
+
+        stream_time, stream_results = run_stream(stub, commands, nlu_model)
+        print(f"{'stream':>8} {len(commands):>9} {stream_time:>10.2f} {len(commands) / stream_time:>11.1f}")
+        if args.skip_unary:
+            return
+
+        unary_time, unary_results, rejected = run_unary(stub, commands, nlu_model, args.unary_threads)
+        print(f"{'unary':>8} {len(commands):>9} {unary_time:>10.2f} {len(commands) / unary_time:>11.1f}")
+        print(f"Speedup over {args.unary_threads} concurrent unary clients: {unary_time / stream_time:.1f}x")
+        if rejected:
+            print(f"Warning: {rejected} unary calls were rejected and retried, lower --unary-threads.")
+
+    mismatches = sum(1 for unary, stream in zip(unary_results, stream_results)
+                     if (unary.intent, unary.status, list(unary.intent_slots)) !=
+                     (stream.intent, stream.status, list(stream.intent_slots)))
+    if len(stream_results) != len(commands) or mismatches:
+        print(f"Warning: {mismatches} results differ between the paths, {len(stream_results)} stream results.")
+
+
+if __name__ == "__main__":
+    main()
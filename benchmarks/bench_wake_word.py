@@ -0,0 +1,110 @@
+# SPDX-License-Identifier: Apache-2.0
+#
+# Copyright (c) 2023 Malik Talha
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Compare CPU time per audio second and detection latency of the wake word engine configurations.
+
+The input WAV should contain the wake word once, `--wake-word-end` is the position (in seconds) where it ends in the
+recording. Audio is fed in 100 ms chunks as fast as possible, the detection latency is the audio position at which
+the engine reported the wake word minus the end of the wake word.
+
+Usage:
+    python benchmarks/bench_wake_word.py --model /usr/share/vosk/VOSK_WWD_MODEL_NAME/ --wake-word "hey automotive" \\
+        --input wake_word.wav --wake-word-end 1.8
+"""
+
+import os
+import sys
+import time
+import wave
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+CONFIGURATIONS = {
+    "open vocabulary": {"use_grammar": False, "check_partial": False},
+    "open + partial": {"use_grammar": False, "check_partial": True},
+    "grammar + partial": {"use_grammar": True, "check_partial": True},
+}
+
+
+def run_configuration(stt_model, wake_word, audio_data, sample_rate, repeats, **engine_config):
+    """
+    Feed the audio through a fresh engine `repeats` times and return the CPU seconds spent and the audio position
+    (in seconds) of the first detection, or None if the wake word was not detected.
+    """
+    from agl_service_voiceagent.utils.wake_word_engine import WakeWordEngine
+
+    chunk_size = sample_rate // 10 * 2
+    cpu_seconds = 0.0
+    detected_at = None
+
+    for _ in range(repeats):
+        engine = WakeWordEngine(wake_word, stt_model, sample_rate, **engine_config)
+        start = time.process_time()
+        position = None
+        for offset in range(0, len(audio_data), chunk_size):
+            if engine.feed(audio_data[offset:offset + chunk_size]):
+                position = (offset + chunk_size) / (sample_rate * 2)
+                break
+        else:
+            if engine.flush():
+                position = len(audio_data) / (sample_rate * 2)
+        cpu_seconds += time.process_time() - start
+        engine.close()
+        detected_at = position
+
+    return cpu_seconds / repeats, detected_at
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark open vocabulary vs grammar restricted wake word spotting.")
+    parser.add_argument("--model", required=True, help="Path to the Vosk model.")
+    parser.add_argument("--wake-word", required=True, help="The wake word spoken in the input audio.")
+    parser.add_argument("--input", required=True, help="Mono 16-bit WAV containing the wake word.")
+    parser.add_argument("--wake-word-end", type=float, help="Position in seconds where the wake word ends.")
+    parser.add_argument("--variants", nargs="*", default=[], help="Alternative forms of the wake word.")
+    parser.add_argument("--segment-ms", type=int, default=500, help="Length of an audio segment in milliseconds.")
+    parser.add_argument("--repeats", type=int, default=5, help="Number of runs averaged per configuration.")
+    args = parser.parse_args()
+
+    from agl_service_voiceagent.utils.stt_model import STTModel
+
+    with wave.open(args.input, "rb") as wf:
+        if wf.getnchannels() != 1 or wf.getsampwidth() != 2:
+            sys.exit("Input must be a mono 16-bit WAV file.")
+        sample_rate = wf.getframerate()
+        audio_data = wf.readframes(wf.getnframes())
+    audio_seconds = len(audio_data) / (sample_rate * 2)
+
+    stt_model = STTModel(args.model, sample_rate, pool_min_size=0, pool_max_size=1)
+
+    print(f"{'configuration':>18} {'CPU ms / audio s':>17} {'detected at (s)':>16} {'latency (ms)':>13}")
+    for name, engine_config in CONFIGURATIONS.items():
+        cpu_seconds, detected_at = run_configuration(stt_model, args.wake_word, audio_data, sample_rate, args.repeats,
+                                                     variants=args.variants, segment_ms=args.segment_ms,
+                                                     **engine_config)
+        # detection stops feeding, so only the audio up to the detection was decoded
+        decoded_seconds = detected_at if detected_at is not None else audio_seconds
+        detected = f"{detected_at:.2f}" if detected_at is not None else "missed"
+        latency = "-"
+        if detected_at is not None and args.wake_word_end is not None:
+            latency = f"{(detected_at - args.wake_word_end) * 1000:.0f}"
+        print(f"{name:>18} {cpu_seconds * 1000 / decoded_seconds:>17.1f} {detected:>16} {latency:>13}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+# SPDX-License-Identifier: Apache-2.0
+#
+# Copyright (c) 2023 Malik Talha
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import time
+import wave
+import pytest
+
+pytest.importorskip("gi")
+
+from agl_service_voiceagent.utils.audio_recorder import AudioRecorder
+from agl_service_voiceagent.utils.audio_source import SharedAudioSource
+from agl_service_voiceagent.utils.audio_store import AudioStore
+
+
+class SlowSTTModel:
+    """
+    Stands in for STTModel, every chunk takes longer to decode than it takes to capture.
+    """
+
+    def __init__(self, delay):
+        self.delay = delay
+
+    def setup_recognizer(self, sample_rate=None):
+        return "recognizer"
+
+    def init_recognition(self, uuid, audio_data):
+        time.sleep(self.delay)
+        return False
+
+    def recognize(self, uuid, final=False):
+        return {"text": ""}
+
+    def cleanup_recognizer(self, uuid):
+        pass
+
+
+def test_slow_recognizer_does_not_cut_the_recording(tmp_path):
+    # the recognizer may fall behind by 100 ms, but is fed 2 s of audio faster than it can decode it
+    audio_source = SharedAudioSource(sample_rate=16000, subscriber_queue_ms=100)
+    audio_store = AudioStore(str(tmp_path), "tmpfs", str(tmp_path / "scratch"))
+    recorder = AudioRecorder(SlowSTTModel(delay=0.005), audio_store, sample_rate=16000, capture_mode="stream",
+                             store_audio=True, audio_source=audio_source)
+    recorder.set_pipeline_mode("manual")
+    audio_file = recorder.create_pipeline()
+    recorder.start_recording()
+
+    chunk = bytes(640)  # 20 ms of 16-bit mono audio at 16 kHz
+    chunks = 100
+    for _ in range(chunks):
+        audio_source.publish(chunk)
+    recorder.stop_recording()
+    recorder.finish_recognition()
+
+    with wave.open(audio_file, "rb") as wav_file:
+        assert wav_file.getnframes() * 2 == chunks * len(chunk)
+    queue_stats = recorder.get_queue_stats()
+    assert queue_stats["file"]["dropped_bytes"] == 0
+    assert queue_stats["stream"]["dropped_bytes"] > 0